@@ -5,7 +5,6 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
-load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -15,28 +14,56 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
-# Create the Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "moodmorph_secret_key_2024")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+def create_app():
+    """
+    Build and configure the Flask app
 
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///moodmorph.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+    Kept cheap on purpose: services (Gemini client, Giphy, GIF catalog) are
+    built on first use by the getters in services.py, and the schema is
+    created by `flask --app main init-db` rather than at import.
 
-# Initialize the app with the extension
-db.init_app(app)
+    Returns:
+        Flask: The configured app
+    """
+    load_dotenv()
 
-with app.app_context():
-    # Import models to ensure tables are created
-    import models
-    db.create_all()
+    # Create the Flask app
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "moodmorph_secret_key_2024")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
-# Import routes after app initialization
-import routes
+    # Configure the database
+    from sqlite_profile import sqlite_pragmas, sqlite_engine_options, install_pragmas
+    database_url = os.environ.get("DATABASE_URL", "sqlite:///moodmorph.db")
+    pragmas = sqlite_pragmas(database_url)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = sqlite_engine_options() if pragmas else {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+
+    # Initialize the app with the extension
+    db.init_app(app)
+    if pragmas:
+        with app.app_context():
+            install_pragmas(db.engine, pragmas)
+
+    # Import models so they are registered on db.metadata
+    import models  # noqa: F401
+
+    from routes import bp
+    app.register_blueprint(bp)
+
+    # Register CLI commands (flask --app main ...)
+    from commands import register_commands
+    register_commands(app)
+
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
+    from schema import init_db
+    with app.app_context():
+        init_db()
     app.run(host="0.0.0.0", port=5000, debug=True)
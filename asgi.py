@@ -0,0 +1,185 @@
+"""
+ASGI entrypoint for MoodMorph
+
+/api/chat is served by an asyncio-native pipeline (genai async client and an
+async httpx client in GiphyService), so a single process can keep hundreds of
+conversations waiting on Gemini and Giphy at once. Every other route is passed
+through to the regular Flask app.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import dump_cookie, parse_cookie
+
+from app import app
+from routes import _append_context, _conversation_context, _record_turn, _session_key
+from services import get_conversation_ai, get_giphy_service, get_record_writer, start_services
+
+flask_application = WsgiToAsgi(app)
+
+
+def _session_serializer():
+    """Signing serializer Flask uses for the session cookie"""
+    return app.session_interface.get_signing_serializer(app)
+
+
+def _load_session(headers):
+    """Decode the Flask session cookie from raw ASGI headers"""
+    cookie_header = headers.get(b'cookie', b'').decode('latin-1')
+    value = parse_cookie(cookie_header).get(app.config['SESSION_COOKIE_NAME'])
+    if not value:
+        return {}
+    try:
+        return _session_serializer().loads(value, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return {}
+
+
+def _session_cookie_header(session_data):
+    """Build a Set-Cookie header that Flask will accept on the next request"""
+    cookie = dump_cookie(
+        app.config['SESSION_COOKIE_NAME'],
+        _session_serializer().dumps(session_data),
+        path=app.config['SESSION_COOKIE_PATH'] or '/',
+        httponly=app.config['SESSION_COOKIE_HTTPONLY'],
+        secure=app.config['SESSION_COOKIE_SECURE'],
+        samesite=app.config['SESSION_COOKIE_SAMESITE']
+    )
+    return (b'set-cookie', cookie.encode('latin-1'))
+
+
+async def _read_body(receive):
+    """Read the full request body from the ASGI receive channel"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def _send_json(send, payload, status=200, extra_headers=None):
+    """Send a complete JSON response"""
+    body = json.dumps(payload).encode('utf-8')
+    headers = [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode('latin-1'))
+    ]
+    headers.extend(extra_headers or [])
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _start_services():
+    """Build the services at server startup rather than on the first request"""
+    with app.app_context():
+        start_services()
+
+
+def _load_context(session_key, session_data):
+    """Read the conversation context; the store may block on SQLite"""
+    with app.app_context():
+        return _conversation_context(session_key, session_data)
+
+
+def _save_context(session_key, user_input, ai_response):
+    """Append the turn to the conversation context store"""
+    with app.app_context():
+        _append_context(session_key, user_input, ai_response)
+
+
+def _store_turn(user_input, ai_result, gif_url, session_key):
+    """Queue the turn with the record writer; a backlog spools to disk (flock and fsync), so it runs in a thread"""
+    with app.app_context():
+        _record_turn(user_input, ai_result, gif_url, session_key)
+
+
+async def chat(scope, receive, send):
+    """
+    Async equivalent of routes.chat
+    """
+    try:
+        try:
+            data = json.loads(await _read_body(receive) or b'null')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or 'message' not in data:
+            return await _send_json(send, {'error': 'No message provided'}, 400)
+
+        user_input = data['message'].strip()
+        if not user_input:
+            return await _send_json(send, {'error': 'Empty message provided'}, 400)
+
+        session_data = _load_session(dict(scope['headers']))
+        # The cookie only changes when the session key is new or legacy context is migrated out of it
+        session_changed = 'session_key' not in session_data or 'conversation_context' in session_data
+        session_key = _session_key(session_data)
+        conversation_context = await asyncio.to_thread(_load_context, session_key, session_data)
+
+        conversation_ai = get_conversation_ai()
+        ai_result = await conversation_ai.analyze_emotion_and_respond_async(user_input, conversation_context)
+
+        best_gif_keyword = conversation_ai.get_contextual_gif_search(
+            ai_result['detected_emotion'], ai_result['gif_keywords'], ai_result['context']
+        )
+        gif_url = await get_giphy_service().search_contextual_gif_async(
+            best_gif_keyword, ai_result['detected_emotion'], ai_result['gif_keywords'], ai_result['context']
+        )
+
+        await asyncio.to_thread(_save_context, session_key, user_input, ai_result['response'])
+
+        await asyncio.to_thread(_store_turn, user_input, ai_result, gif_url, session_key)
+
+        logging.info(f"Gemini AI analysis (async): {ai_result['detected_emotion']} -> {ai_result['opposite_emotion']} (intensity: {ai_result['emotion_intensity']})")
+
+        await _send_json(send, {
+            'success': True,
+            'response': ai_result['response'],
+            'detected_emotion': ai_result['detected_emotion'],
+            'emotion_intensity': ai_result['emotion_intensity'],
+            'opposite_emotion': ai_result['opposite_emotion'],
+            'gif_url': gif_url,
+            'gif_keywords': ai_result['gif_keywords'],
+            'conversation_tone': ai_result['conversation_tone'],
+            'context': ai_result['context']
+        }, extra_headers=[_session_cookie_header(session_data)] if session_changed else [])
+
+    except Exception as e:
+        logging.error(f"Error in Gemini chat (async): {str(e)}")
+        await _send_json(send, {
+            'success': False,
+            'response': "I'm here for you, and I want to help. Could you try sharing that with me again?",
+            'error': str(e)
+        }, 500)
+
+
+async def _lifespan(receive, send):
+    """Handle ASGI startup and shutdown events"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.to_thread(_start_services)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await get_giphy_service().aclose()
+            # Write out queued EmotionRecords before the worker exits
+            await asyncio.to_thread(get_record_writer().close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI application: async /api/chat, everything else via Flask"""
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    if scope['type'] == 'http' and scope['path'] == '/api/chat' and scope['method'] == 'POST':
+        return await chat(scope, receive, send)
+
+    return await flask_application(scope, receive, send)
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import bindparam, select, update
+
+# Set in each worker process by _init_worker
+_analyzer = None
+
+
+def _init_worker(sentiment_engine):
+    """Build one EmotionAnalyzer per worker process"""
+    global _analyzer
+    from emotion_analyzer import EmotionAnalyzer
+    _analyzer = EmotionAnalyzer(sentiment_engine=sentiment_engine)
+    _analyzer.compile_keywords()
+
+
+def _analyze_chunk(rows):
+    """
+    Re-analyze one chunk in a worker process
+
+    Args:
+        rows (list): (id, user_input) tuples
+
+    Returns:
+        list: (id, detected_emotion) tuples
+    """
+    results = _analyzer.analyze_many(text for _, text in rows)
+    return [(row_id, result['emotion']) for (row_id, _), result in zip(rows, results)]
+
+
+def load_checkpoint(path):
+    """Saved progress, or None if there is no checkpoint"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, state):
+    """Write progress atomically, so a kill mid-write never leaves a corrupt file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class EmotionBackfill:
+    """
+    Re-score historical EmotionRecord rows with the current EmotionAnalyzer
+
+    Only detected_emotion and opposite_emotion are rewritten, the opposite
+    through the same map as live turns (gemini_conversation.get_opposite_emotion).
+    sentiment_score is left alone: live turns store Gemini's 0..1 emotion
+    intensity there, which the analytics rollups average, and
+    EmotionAnalyzer's -1..1 polarity is not comparable to it.
+
+    Rows are read in primary-key order, one chunk per query, and analyzed
+    across a process pool. Results are written back in submission order with
+    one executemany UPDATE per chunk (only rows whose values changed), and
+    the last written id is checkpointed after every chunk, so a killed run
+    resumes from the checkpoint with at most one chunk redone.
+    """
+
+    def __init__(self, session, checkpoint_path, workers=None, chunk_size=1000, sentiment_engine=None):
+        """
+        Args:
+            session: SQLAlchemy session bound to the app database
+            checkpoint_path (str): JSON file recording progress
+            workers (int): Worker processes, defaults to the CPU count
+            chunk_size (int): Rows per query, analysis task and UPDATE
+            sentiment_engine (str): EmotionAnalyzer sentiment engine for the workers
+        """
+        from models import EmotionRecord
+
+        self.session = session
+        self.table = EmotionRecord.__table__
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.sentiment_engine = sentiment_engine
+
+        self.state = {'last_id': 0, 'processed': 0, 'changed': 0}
+
+    def _chunks(self, last_id, end_id=None):
+        """Yield lists of (id, user_input, detected_emotion, opposite_emotion)"""
+        table = self.table
+        while True:
+            query = (
+                select(table.c.id, table.c.user_input, table.c.detected_emotion, table.c.opposite_emotion)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(self.chunk_size)
+            )
+            if end_id is not None:
+                query = query.where(table.c.id <= end_id)
+            rows = self.session.execute(query).all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def _write(self, current, results):
+        """Bulk-update the rows whose analysis changed; returns how many did"""
+        from gemini_conversation import get_opposite_emotion
+
+        table = self.table
+        changed = []
+        for (row_id, emotion), (_, _, old_emotion, old_opposite) in zip(results, current):
+            opposite = get_opposite_emotion(emotion)
+            if (emotion, opposite) != (old_emotion, old_opposite):
+                changed.append({'row_id': row_id, 'emotion': emotion, 'opposite': opposite})
+        if changed:
+            self.session.execute(
+                update(table)
+                .where(table.c.id == bindparam('row_id'))
+                .values(detected_emotion=bindparam('emotion'), opposite_emotion=bindparam('opposite'))
+                .execution_options(synchronize_session=False),
+                changed
+            )
+        self.session.commit()
+        return len(changed)
+
+    def run(self, resume=True, end_id=None, progress=None):
+        """
+        Run (or resume) the backfill
+
+        Args:
+            resume (bool): Continue from the checkpoint if there is one
+            end_id (int): Stop after this primary key
+            progress (callable): Called with the state dict after each chunk
+
+        Returns:
+            dict: Final state, including rows_per_sec for this run
+        """
+        saved = load_checkpoint(self.checkpoint_path) if resume else None
+        if saved:
+            self.state.update(saved)
+            self.state.pop('done', None)
+            logging.info(f"Resuming emotion backfill after id {self.state['last_id']}")
+
+        start_time = time.perf_counter()
+        processed_before = self.state['processed']
+        pending = deque()
+
+        def finish_oldest():
+            current, future = pending.popleft()
+            changed = self._write(current, future.result())
+            self.state['last_id'] = current[-1][0]
+            self.state['processed'] += len(current)
+            self.state['changed'] += changed
+            elapsed = time.perf_counter() - start_time
+            self.state['rows_per_sec'] = round((self.state['processed'] - processed_before) / elapsed, 1) if elapsed else 0.0
+            save_checkpoint(self.checkpoint_path, self.state)
+            if progress:
+                progress(self.state)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.sentiment_engine,)) as executor:
+            # Keep every worker busy while results are written back in order
+            for chunk in self._chunks(self.state['last_id'], end_id):
+                pending.append((chunk, executor.submit(_analyze_chunk, [(row[0], row[1]) for row in chunk])))
+                if len(pending) >= self.workers * 2:
+                    finish_oldest()
+            while pending:
+                finish_oldest()
+
+        self.state['done'] = True
+        save_checkpoint(self.checkpoint_path, self.state)
+        return self.state
@@ -0,0 +1,73 @@
+"""
+Benchmark the EmotionRecord backfill job at several worker counts
+
+Builds a throwaway SQLite database of synthetic records, then re-analyzes
+all of them with 1, 2, 4, ... worker processes and reports rows/sec.
+
+Usage:
+    python benchmarks/bench_backfill.py [--rows 20000] [--workers 1 2 4] [--engine lexicon]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = """
+i feel so sad today my boss is making me angry and i'm really anxious about the exam lonely tired
+exhausted confused lost happy great not very good bad day week friends work school home can't sleep
+worried stressed overwhelmed guilty let down disappointed okay fine alone nobody everything nothing
+""".split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--engine', choices=['textblob', 'lexicon'], default='textblob')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodmorph-backfill-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('GIF_WARMER_ENABLED', 'false')
+
+    from app import app, db
+    from backfill import EmotionBackfill
+    from models import EmotionRecord
+    from schema import init_db
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        init_db()
+        db.session.execute(EmotionRecord.__table__.insert(), [
+            {
+                'user_input': ' '.join(rng.choices(WORDS, k=rng.randint(4, 30))),
+                'detected_emotion': 'neutral',
+                'sentiment_score': 0.0,
+                'opposite_emotion': 'uplifted'
+            }
+            for _ in range(args.rows)
+        ])
+        db.session.commit()
+
+        print(f"{args.rows} rows, chunk size {args.chunk_size}, {args.engine} engine, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'rows/sec':>10} {'speedup':>8}")
+        baseline = None
+        for workers in args.workers:
+            # Reset the rows so every run writes the same updates
+            db.session.execute(EmotionRecord.__table__.update().values(
+                detected_emotion='neutral', sentiment_score=0.0, opposite_emotion='uplifted'))
+            db.session.commit()
+            job = EmotionBackfill(db.session, os.path.join(workdir, f'checkpoint-{workers}.json'),
+                                  workers=workers, chunk_size=args.chunk_size, sentiment_engine=args.engine)
+            state = job.run(resume=False)
+            baseline = baseline or state['rows_per_sec']
+            print(f"{workers:>8} {state['rows_per_sec']:>10.0f} {state['rows_per_sec'] / baseline:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark the server-side conversation context store against the cookie it replaced
+
+Part 1 compares bytes on the wire per chat turn, for a conversation holding
+10 messages of the given length:
+
+    cookie (old)   Cookie request header carrying the context in the signed session
+    cookie (new)   Cookie request header carrying only the session key
+    set-cookie     Set-Cookie response header; the old scheme re-sent it every turn,
+                   the new one only on the first turn
+
+Part 2 times one turn's get + append against each store backend, and checks
+that concurrent turns of one conversation from several threads all land
+(the per-conversation lock prevents lost updates).
+
+Usage:
+    python benchmarks/bench_context_store.py [--lengths 50 200 1000] [--turns 2000] [--threads 8]
+"""
+import argparse
+import os
+import random
+import secrets
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = """
+i feel so sad today my boss is making me angry and i'm really anxious about the exam lonely tired
+exhausted confused lost happy great not very good bad day week friends work school home can't sleep
+worried stressed overwhelmed guilty let down disappointed okay fine alone nobody everything nothing
+that sounds hard thank you for telling me it makes sense you would feel this way after such a long
+""".split()
+
+# Browsers drop cookies whose name, value and attributes exceed this
+COOKIE_LIMIT = 4096
+
+
+def cookie_sizes(app, length):
+    """Cookie header bytes for a 10-message context, old scheme vs new"""
+    serializer = app.session_interface.get_signing_serializer(app)
+    session_key = secrets.token_urlsafe(16)
+    # Varied text: Flask zlib-compresses the session, and repeated text would compress away
+    rng = random.Random(length)
+    old_context = [
+        {'sender': 'user' if i % 2 == 0 else 'bot',
+         'text': ' '.join(rng.choice(WORDS) for _ in range(length // 6))[:length], 'timestamp': 'now'}
+        for i in range(10)
+    ]
+    name = app.config['SESSION_COOKIE_NAME']
+    old = len(f"{name}={serializer.dumps({'conversation_context': old_context})}")
+    new = len(f"{name}={serializer.dumps({'session_key': session_key})}")
+    return old, new
+
+
+def time_store(store, turns):
+    """Microseconds per turn (one get + one append) over 100 conversations"""
+    began = time.perf_counter()
+    for i in range(turns):
+        conversation_id = f"conversation-{i % 100}"
+        store.get(conversation_id)
+        store.append(conversation_id, [{'sender': 'user', 'text': f'message {i}'},
+                                       {'sender': 'bot', 'text': f'reply {i}'}])
+    return (time.perf_counter() - began) / turns * 1e6
+
+
+def concurrent_turns(store, threads, turns_per_thread):
+    """Append from several threads to one conversation; returns the number of turns kept"""
+    store.max_messages = threads * turns_per_thread * 2
+
+    def worker(n):
+        for i in range(turns_per_thread):
+            store.append('shared', [{'sender': 'user', 'text': f'{n}-{i}'}, {'sender': 'bot', 'text': 'ok'}])
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return len(store.get('shared')) // 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--turns', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    os.environ.setdefault('GIF_WARMER_ENABLED', 'false')
+    import logging
+    from app import app
+    from context_store import MemoryContextStore, SqliteContextStore
+
+    logging.disable(logging.INFO)
+    print("Bytes per chat turn, 10 messages of context")
+    print(f"{'msg chars':>9} {'cookie (old)':>13} {'cookie (new)':>13} {'reduction':>10} {'set-cookie/turn old->new':>25}")
+    for length in args.lengths:
+        old, new = cookie_sizes(app, length)
+        note = '  (over the cookie limit, dropped by browsers)' if old > COOKIE_LIMIT else ''
+        print(f"{length:>9} {old:>13} {new:>13} {1 - new / old:>9.0%} {f'{old} -> 0':>25}{note}")
+
+    workdir = tempfile.mkdtemp(prefix='moodmorph-context-')
+    stores = [MemoryContextStore(10), SqliteContextStore(os.path.join(workdir, 'context.db'), 10)]
+    print()
+    print(f"{'backend':<8} {'us/turn':>8} {'concurrent turns kept':>22}")
+    for store in stores:
+        per_turn = time_store(store, args.turns)
+        kept = concurrent_turns(store, args.threads, 50)
+        print(f"{store.backend:<8} {per_turn:>8.1f} {f'{kept}/{args.threads * 50}':>22}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark EmotionAnalyzer keyword detection against the per-keyword substring scan
+
+Checks that the compiled matcher picks the same emotion as the original scan
+for every message, then reports the time per message at the current lexicon
+size and at larger synthetic lexicons.
+
+Usage:
+    python benchmarks/bench_emotion_keywords.py [--scales 1 100] [--messages 2000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_analyzer import EmotionAnalyzer  # noqa: E402
+
+FILLER = """
+i today just feel so really work school my boss friend mom the a and but it is was been have this week
+everything nothing again always never can't sleep call text home late meeting exam deadline rn lol ok
+""".split()
+
+
+def substring_scan(emotion_keywords, text):
+    """The original _detect_emotion_keywords: two substring scans per keyword"""
+    emotion_scores = {}
+    for emotion, keywords in emotion_keywords.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in text:
+                if f" {keyword} " in f" {text} ":
+                    score += 2
+                else:
+                    score += 1
+        emotion_scores[emotion] = score
+    if emotion_scores and max(emotion_scores.values()) > 0:
+        return max(emotion_scores, key=emotion_scores.get)
+    return 'neutral'
+
+
+def scaled_lexicon(base, scale, rng):
+    """Base lexicon plus (scale - 1) synthetic keywords per original keyword"""
+    lexicon = {}
+    for emotion, keywords in base.items():
+        extra = [
+            ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+            for _ in range(len(keywords) * (scale - 1))
+        ]
+        lexicon[emotion] = list(keywords) + extra
+    return lexicon
+
+
+def messages(lexicon, count, rng):
+    """Chat-sized messages mixing filler words with lexicon keywords and fragments"""
+    keywords = [keyword for words in lexicon.values() for keyword in words]
+    result = []
+    for _ in range(count):
+        words = rng.choices(FILLER, k=rng.randint(3, 25))
+        for _ in range(rng.randint(0, 3)):
+            keyword = rng.choice(keywords)
+            # Sometimes glue a keyword into a longer word for partial matches
+            words.insert(rng.randrange(len(words) + 1), keyword + rng.choice(['', '', 'ness', 'ly']))
+        result.append(' '.join(words))
+    return result
+
+
+def bench(scale, message_count, rng):
+    analyzer = EmotionAnalyzer()
+    analyzer.emotion_keywords = scaled_lexicon(analyzer.emotion_keywords, scale, rng)
+    keyword_count = sum(len(words) for words in analyzer.emotion_keywords.values())
+    texts = messages(analyzer.emotion_keywords, message_count, rng)
+
+    start = time.perf_counter()
+    analyzer.compile_keywords()
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    expected = [substring_scan(analyzer.emotion_keywords, text) for text in texts]
+    scan_us = (time.perf_counter() - start) / len(texts) * 1e6
+
+    start = time.perf_counter()
+    found = [analyzer._detect_emotion_keywords(text) for text in texts]
+    matcher_us = (time.perf_counter() - start) / len(texts) * 1e6
+
+    mismatches = sum(1 for a, b in zip(expected, found) if a != b)
+    return keyword_count, compile_ms, scan_us, matcher_us, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'scale':>6} {'keywords':>9} {'compile ms':>11} {'scan us':>9} {'matcher us':>11} {'speedup':>8} {'mismatch':>9}")
+    for scale in args.scales:
+        keywords, compile_ms, scan_us, matcher_us, mismatches = bench(scale, args.messages, rng)
+        print(f"{scale:>6} {keywords:>9} {compile_ms:>11.1f} {scan_us:>9.1f} {matcher_us:>11.1f} "
+              f"{scan_us / matcher_us:>7.1f}x {mismatches:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark GifSimilarityIndex build, incremental add and query latency
+
+Usage:
+    python benchmarks/bench_gif_index.py [--sizes 10000 100000 200000] [--queries 1000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gif_index import GifSimilarityIndex  # noqa: E402
+
+WORDS = """
+cute funny cat dog puppy kitten hug love happy smile laugh dance party celebrate calm zen peaceful ocean
+waves sunset nature forest rain cozy blanket sleep rest coffee tea breathe meditation yoga relax friends
+together support community heart warm sunshine rainbow hope dream bright future motivation power energy
+excited jump cheer win success strong brave courage gentle kind comfort healing recovery clarity lightbulb
+idea eureka solution understanding patience slow simple step forward tomorrow new beginning cartoon anime
+movie reaction wholesome baby panda bunny bird flower garden mountain sky stars moon music sing guitar
+""".split()
+EMOTIONS = ['sad', 'angry', 'anxious', 'lonely', 'tired', 'confused', 'disappointed', 'guilty', 'stressed', 'hurt']
+
+
+def synthetic_gifs(count, rng, start=0):
+    """Generate (gif_id, url, title, tags, emotions) tuples with a Zipf-ish word mix"""
+    weights = [1.0 / (rank + 1) for rank in range(len(WORDS))]
+    for i in range(start, start + count):
+        title = ' '.join(rng.choices(WORDS, weights=weights, k=rng.randint(2, 6)))
+        tags = [' '.join(rng.choices(WORDS, weights=weights, k=rng.randint(1, 2))) for _ in range(rng.randint(1, 5))]
+        emotions = rng.sample(EMOTIONS, rng.randint(0, 2))
+        yield (f"gif{i}", f"https://media.giphy.com/media/gif{i}/giphy.gif", title, tags, emotions)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench(size, query_count, rng):
+    index = GifSimilarityIndex()
+    gifs = list(synthetic_gifs(size, rng))
+    extra = list(synthetic_gifs(1000, rng, start=size))
+
+    start = time.perf_counter()
+    index.add_many(gifs)
+    build_s = time.perf_counter() - start
+
+    # Incremental adds, with a query every 10 GIFs the way harvesting interleaves
+    start = time.perf_counter()
+    for i, gif in enumerate(extra):
+        index.add(*gif)
+        if i % 10 == 9:
+            index.query(['cute'])
+    add_us = (time.perf_counter() - start) / len(extra) * 1e6
+
+    latencies = []
+    for _ in range(query_count):
+        keywords = rng.sample(WORDS, rng.randint(3, 5))
+        context = ' '.join(rng.sample(WORDS, 6))
+        emotion = rng.choice(EMOTIONS)
+        start = time.perf_counter()
+        index.query(keywords, context, emotion=emotion, k=10)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    stats = index.stats()
+    return {
+        'gifs': len(index),
+        'postings': stats['postings'],
+        'segments': stats['segments'],
+        'build_s': build_s,
+        'add_us': add_us,
+        'p50_ms': statistics.median(latencies),
+        'p99_ms': percentile(latencies, 99),
+        'qps': 1000 / statistics.mean(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 200000])
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'gifs':>8} {'postings':>10} {'segs':>5} {'build s':>8} {'add us':>8} {'p50 ms':>8} {'p99 ms':>8} {'qps':>8}")
+    for size in args.sizes:
+        r = bench(size, args.queries, rng)
+        print(f"{r['gifs']:>8} {r['postings']:>10} {r['segments']:>5} {r['build_s']:>8.2f} {r['add_us']:>8.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['qps']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark session-scoped history, analytics and export as the table grows
+
+Fills a throwaway SQLite database with records spread over many sessions,
+growing it in steps, and at each size times the per-session endpoints for
+one session through the Flask test client (median over --repeat requests):
+
+    history    GET /api/history?limit=20 (first page)
+    page 5     GET /api/history with the cursor of page 4
+    analytics  GET /api/analytics?scope=session&granularity=day
+    export     GET /api/export (whole session, JSON lines)
+
+With the (session_key, timestamp, id) index each of them is a range scan over
+one session's rows, so the timings should stay flat as the total grows.
+
+Usage:
+    python benchmarks/bench_history.py [--sizes 10000 100000 500000] [--per-session 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def median_ms(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        response = client.get(url)
+        response.get_data()
+        timings.append((time.perf_counter() - began) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--per-session', type=int, default=200, help='Records per session')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodmorph-history-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('GIF_WARMER_ENABLED', 'false')
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+
+    import logging
+    from app import app, db
+    from models import EmotionRecord
+    from schema import init_db
+
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+    emotions = ['sad', 'angry', 'anxious', 'lonely', 'tired', 'happy']
+    start_time = datetime.utcnow() - timedelta(days=30)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['session_key'] = 'session-0'
+
+    with app.app_context():
+        init_db()
+        print(f"{args.per_session} records per session, median of {args.repeat} requests")
+        print(f"{'records':>9} {'history':>9} {'page 5':>9} {'analytics':>10} {'export':>9}  (ms)")
+        inserted = 0
+        for size in args.sizes:
+            while inserted < size:
+                batch = min(20000, size - inserted)
+                db.session.execute(EmotionRecord.__table__.insert(), [
+                    {
+                        'session_key': f"session-{(inserted + i) // args.per_session}",
+                        'user_input': 'benchmark record',
+                        'detected_emotion': rng.choice(emotions),
+                        'sentiment_score': rng.random(),
+                        'opposite_emotion': 'calm',
+                        'timestamp': start_time + timedelta(seconds=rng.randrange(30 * 86400))
+                    }
+                    for i in range(batch)
+                ])
+                db.session.commit()
+                inserted += batch
+            db.session.execute(db.text('ANALYZE'))
+
+            cursor = None
+            for _ in range(4):
+                page = client.get('/api/history?limit=20' + (f'&cursor={cursor}' if cursor else '')).get_json()
+                cursor = page['next_cursor']
+            timings = [
+                median_ms(client, '/api/history?limit=20', args.repeat),
+                median_ms(client, f'/api/history?limit=20&cursor={cursor}', args.repeat),
+                median_ms(client, '/api/analytics?scope=session&granularity=day', args.repeat),
+                median_ms(client, '/api/export', args.repeat),
+            ]
+            print(f"{size:>9} {timings[0]:>9.2f} {timings[1]:>9.2f} {timings[2]:>10.2f} {timings[3]:>9.2f}")
+
+        plan = db.session.execute(db.text(
+            "EXPLAIN QUERY PLAN SELECT * FROM emotion_record WHERE session_key = 'session-0' "
+            "ORDER BY timestamp DESC, id DESC LIMIT 21"
+        )).all()
+        print("history query plan:", '; '.join(row[-1] for row in plan))
+
+
+if __name__ == '__main__':
+    main()
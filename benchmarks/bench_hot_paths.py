@@ -0,0 +1,291 @@
+"""
+Microbenchmarks of the in-process hot paths of a chat turn, checked against stored baselines
+
+Times the pure-Python work each request does (emotion analysis, GIF search
+term selection, opposite emotions, therapeutic tools and replies, and
+EmotionRecord serialization) on each message corpus in corpus.py: short,
+long, emoji-heavy and multi-emotion. For every case it reports ops/sec (the
+best of --repeats timed runs) and the bytes allocated per call (the mean
+tracemalloc peak above the memory in use when the call started, measured in
+a separate untimed pass).
+
+Results are compared with the baseline file; the run exits with status 1
+when a case's ops/sec falls, or its allocations grow, by more than
+--threshold, confirmed by re-measuring the regressed cases (--confirm
+times) so that one noisy measurement does not fail the run.
+--update-baseline writes the current results as the new baseline; record
+it with --runs 3 or more, so it is the median of several runs rather than
+one lucky one. Throughput only compares on the same machine and Python
+version; regenerate the baseline when either changes.
+
+Usage:
+    python benchmarks/bench_hot_paths.py [--filter analyze] [--threshold 0.25] [--runs 3 --update-baseline]
+        [--baseline benchmarks/baselines/hot_paths.json] [--output results.json]
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import CORPORA  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'hot_paths.json')
+
+# Keywords of the kind the Gemini emotion analysis suggests for GIF searches
+GIF_KEYWORDS = [
+    'cute', 'funny', 'adorable', 'heartwarming', 'comfort', 'calming', 'peaceful', 'zen', 'nature', 'breathe',
+    'meditation', 'friendship', 'love', 'connection', 'support', 'rest', 'cozy', 'gentle', 'puppy', 'celebrate',
+    'dance', 'sunshine', 'hug', 'cat'
+]
+
+
+def build_cases(messages, seed):
+    """
+    Benchmark cases for one corpus
+
+    Args:
+        messages (list): Corpus messages
+        seed (int): Seed for the generated inputs
+
+    Returns:
+        list: (name, function, list of argument tuples) per case
+    """
+    from emotion_analyzer import EmotionAnalyzer
+    from gemini_conversation import GeminiConversationAI
+    from models import EmotionRecord
+    from therapeutic_tools import TherapeuticTools
+
+    rng = random.Random(seed)
+    analyzer = EmotionAnalyzer()
+    lexicon_analyzer = EmotionAnalyzer(sentiment_engine='lexicon')
+    conversation_ai = GeminiConversationAI(single_call=False)
+    tools = TherapeuticTools()
+
+    analyses = [analyzer.analyze(message) for message in messages]
+    emotions = [analysis['emotion'] for analysis in analyses]
+    search_inputs = [
+        (emotion, rng.sample(GIF_KEYWORDS, rng.randint(2, 5)), ' '.join(messages[max(0, index - 3):index]))
+        for index, emotion in enumerate(emotions)
+    ]
+    records = []
+    for index, (message, analysis) in enumerate(zip(messages, analyses)):
+        record = EmotionRecord(message, analysis['emotion'], analysis['sentiment_score'], analysis['opposite_emotion'],
+                               gif_url=f"https://media.giphy.com/media/{index:08d}/giphy.gif",
+                               therapeutic_tool='Breathing Exercise', session_key='b' * 32)
+        record.id = index + 1
+        record.timestamp = datetime(2026, 1, 1, 12, 0, index % 60)
+        records.append(record)
+
+    return [
+        ('EmotionAnalyzer.analyze', analyzer.analyze, [(message,) for message in messages]),
+        ('EmotionAnalyzer.analyze[lexicon]', lexicon_analyzer.analyze, [(message,) for message in messages]),
+        ('GeminiConversationAI.get_contextual_gif_search', conversation_ai.get_contextual_gif_search, search_inputs),
+        ('GeminiConversationAI._get_opposite_emotion', conversation_ai._get_opposite_emotion,
+         [(emotion,) for emotion in emotions]),
+        ('TherapeuticTools.get_tool_for_emotion', tools.get_tool_for_emotion, [(emotion,) for emotion in emotions]),
+        ('TherapeuticTools.generate_chat_response', tools.generate_chat_response,
+         [(message, analysis['emotion'], analysis['opposite_emotion']) for message, analysis in zip(messages, analyses)]),
+        ('EmotionRecord.to_dict', lambda record: record.to_dict(), [(record,) for record in records]),
+    ]
+
+
+def ops_per_second(fn, inputs, repeats, min_time):
+    """
+    Best calls/sec over `repeats` runs, each looping over the inputs for at least min_time seconds
+
+    The garbage collector is off while timing, as in timeit.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _best_rate(fn, inputs, repeats, min_time)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _best_rate(fn, inputs, repeats, min_time):
+    passes = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(passes):
+            for args in inputs:
+                fn(*args)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        passes *= 2
+
+    best = passes * len(inputs) / elapsed
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(passes):
+            for args in inputs:
+                fn(*args)
+        best = max(best, passes * len(inputs) / (time.perf_counter() - started))
+    return best
+
+
+def bytes_per_call(fn, inputs):
+    """Mean tracemalloc peak per call above the memory traced when the call started"""
+    total = 0
+    tracemalloc.start()
+    try:
+        for args in inputs:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn(*args)
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / len(inputs)
+
+
+def run_suite(cases, args):
+    """Measure every case once; returns {case: {'ops_per_sec', 'bytes_per_call'}}"""
+    # Seeded, so the random template choices allocate the same from run to run
+    random.seed(args.seed)
+    results = {}
+    print(f"{'case':<62} {'ops/sec':>12} {'bytes/call':>11}")
+    for case, fn, inputs in cases:
+        for call_args in inputs:
+            fn(*call_args)
+        results[case] = {
+            'ops_per_sec': round(ops_per_second(fn, inputs, args.repeats, args.min_time), 1),
+            'bytes_per_call': round(bytes_per_call(fn, inputs), 1)
+        }
+        print(f"{case:<62} {results[case]['ops_per_sec']:>12,.0f} {results[case]['bytes_per_call']:>11,.0f}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    List the cases that regressed beyond the threshold
+
+    Returns:
+        list: (case, message) per regression
+
+    Allocations get 64 bytes of slack, so that a case allocating next to
+    nothing does not fail on a single extra object.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['ops_per_sec'] < base['ops_per_sec'] * (1 - threshold):
+            regressions.append((name, f"{result['ops_per_sec'] / base['ops_per_sec'] - 1:+.1%} ops/sec"))
+        if result['bytes_per_call'] > base['bytes_per_call'] * (1 + threshold) + 64:
+            regressions.append((name, f"{result['bytes_per_call'] - base['bytes_per_call']:+.0f} bytes/call"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--filter', help='only run cases whose name contains this text')
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--runs', type=int, default=1,
+                        help='measure the suite this many times and keep the median per case (use 3+ for baselines)')
+    parser.add_argument('--confirm', type=int, default=2,
+                        help='times to re-measure regressed cases before failing')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timed run')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression vs the baseline')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='write these results as the new baseline')
+    parser.add_argument('--output', help='also write the results as JSON to this file')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodmorph-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('GIF_WARMER_ENABLED', 'false')
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    os.environ.setdefault('RECORD_WRITER_SPOOL_PATH', os.path.join(workdir, 'emotion-records.spool.jsonl'))
+    os.environ.setdefault('CONTEXT_STORE_PATH', os.path.join(workdir, 'conversation-context.db'))
+    import app  # noqa: F401  (models need the app's db)
+
+    # The timed code still formats its log messages; only writing them to the terminal is skipped
+    logging.disable(logging.INFO)
+
+    cases = []
+    for kind, messages in CORPORA.items():
+        for name, fn, inputs in build_cases(messages, args.seed):
+            if not args.filter or args.filter in f"{name}/{kind}":
+                cases.append((f"{name}/{kind}", fn, inputs))
+
+    runs = []
+    for run in range(args.runs):
+        if args.runs > 1:
+            print(f"run {run + 1} of {args.runs}")
+        runs.append(run_suite(cases, args))
+    # The median run per case, so one unusually fast or slow run does not set the numbers
+    results = {
+        case: {metric: statistics.median(run[case][metric] for run in runs) for metric in runs[0][case]}
+        for case in runs[0]
+    }
+
+    report = {
+        'benchmark': 'bench_hot_paths',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'cases': results
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    if args.update_baseline:
+        baseline_cases = {}
+        if args.filter and os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                baseline_cases = json.load(baseline_file)['cases']
+        report['cases'] = {**baseline_cases, **results}
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+            baseline_file.write('\n')
+        print(f"wrote baseline {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get('host', {}).get('python') != platform.python_version():
+        print(f"warning: baseline was recorded on Python {baseline.get('host', {}).get('python')}; "
+              f"ops/sec may not be comparable")
+    missing = sorted(set(results) - set(baseline['cases']))
+    if missing:
+        print(f"not in the baseline: {', '.join(missing)}")
+    regressions = compare(results, baseline['cases'], args.threshold)
+    for _ in range(args.confirm):
+        if not regressions:
+            break
+        # A slowdown that does not reproduce is noise: re-measure the regressed cases, keeping their best numbers
+        suspects = {case for case, _ in regressions}
+        print(f"re-measuring {len(suspects)} regressed case(s)")
+        for case, measured in run_suite([entry for entry in cases if entry[0] in suspects], args).items():
+            results[case] = {'ops_per_sec': max(results[case]['ops_per_sec'], measured['ops_per_sec']),
+                             'bytes_per_call': min(results[case]['bytes_per_call'], measured['bytes_per_call'])}
+        regressions = compare(results, baseline['cases'], args.threshold)
+    if regressions:
+        print(f"regressions beyond {args.threshold:.0%}:\n  " +
+              "\n  ".join(f"{case}: {message}" for case, message in regressions))
+        sys.exit(1)
+    print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
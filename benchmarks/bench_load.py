@@ -0,0 +1,430 @@
+"""
+End-to-end load test of /api/chat against local stand-in upstreams
+
+Starts the fake Gemini and Giphy servers (fake_upstreams.py) and the real app
+under gunicorn (or uvicorn, for the ASGI pipeline) pointed at them, then
+drives /api/chat with closed-loop virtual users at each concurrency level.
+Every virtual user keeps its own session, so conversation context builds up
+as in real use. Messages are drawn from the shared corpus (corpus.py).
+
+Per level it reports latency percentiles, throughput, the error rate, the
+upstream calls made per turn and the resident memory of every worker
+process, and --output writes it all as JSON. With --compare BASELINE.json,
+levels are matched on concurrency and the run exits with status 1 when
+throughput drops, or p99 latency grows, by more than --tolerance.
+
+Runs are only comparable on the same machine with the same options; the
+load generator shares the machine with the app.
+
+Usage:
+    python benchmarks/bench_load.py [--concurrency 1,4,16,32] [--duration 15] [--server gunicorn]
+        [--workers 2] [--threads 8] [--stream] [--gemini-latency lognormal:0.8,0.4]
+        [--output results.json] [--compare baseline.json] [--tolerance 0.15]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from corpus import sample_messages
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values) + 0.5)) - 1))]
+
+
+def child_pids(pid):
+    """Direct children of a process, from /proc (empty where /proc is unavailable)"""
+    children = []
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # The command name may contain spaces; the fields after it do not
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def rss_mb(pid):
+    """Resident set size of a process in MB, or None"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemorySampler:
+    """Samples the RSS of the server's worker processes in the background, keeping each one's peak"""
+
+    def __init__(self, server_pid, interval=0.5):
+        self.server_pid = server_pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def workers(self):
+        """Worker pids: the server's children, or the server itself when it has none"""
+        return child_pids(self.server_pid) or [self.server_pid]
+
+    def sample(self):
+        for pid in self.workers():
+            rss = rss_mb(pid)
+            if rss is not None:
+                self.peaks[pid] = max(self.peaks.get(pid, 0.0), rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.peaks = {}
+        self._stop.clear()
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+        current = [rss_mb(pid) for pid in self.workers()]
+        current = [rss for rss in current if rss is not None]
+        if not current:
+            return None
+        return {
+            'workers': len(current),
+            'per_worker_mb': [round(rss, 1) for rss in sorted(current)],
+            'max_mb': round(max(current), 1),
+            'total_mb': round(sum(current), 1),
+            'peak_mb': round(max(self.peaks.values()), 1) if self.peaks else None
+        }
+
+
+def start_upstreams(args):
+    """Start fake_upstreams.py in its own process; returns (process, base URL env vars)"""
+    command = [
+        sys.executable, os.path.join(HERE, 'fake_upstreams.py'),
+        '--gemini-port', str(free_port()), '--giphy-port', str(free_port()),
+        '--gemini-latency', args.gemini_latency, '--giphy-latency', args.giphy_latency,
+        '--gemini-error-rate', str(args.gemini_error_rate), '--giphy-error-rate', str(args.giphy_error_rate),
+        '--seed', str(args.seed)
+    ]
+    if args.replay:
+        command += ['--replay', args.replay]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    return process, json.loads(process.stdout.readline())
+
+
+def upstream_stats(base_urls):
+    """Request counts of both fake upstreams"""
+    gemini = requests.get(base_urls['GEMINI_BASE_URL'].rstrip('/') + '/_stats', timeout=5).json()
+    giphy = requests.get(base_urls['GIPHY_BASE_URL'].split('/v1/')[0] + '/_stats', timeout=5).json()
+    return {'gemini': sum(gemini['requests'].values()), 'giphy': sum(giphy['requests'].values())}
+
+
+def start_app(args, env, port, log_file):
+    """Start the app server; returns the process once it answers requests"""
+    if args.server == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(args.workers), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'gunicorn', 'main:app', '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(args.workers), '--threads', str(args.threads), '--worker-class', 'gthread',
+                   '--timeout', '120', '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{args.server} exited with status {process.returncode}; see {log_file.name}")
+        try:
+            if requests.get(url + '/api/metrics', timeout=5).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"{args.server} did not become ready; see {log_file.name}")
+
+
+def chat_turn(session, url, message, stream):
+    """
+    Send one chat message
+
+    Returns:
+        tuple: (succeeded, seconds to first reply token or None)
+    """
+    started = time.perf_counter()
+    if not stream:
+        response = session.post(url + '/api/chat', json={'message': message}, timeout=120)
+        return response.status_code == 200 and bool(response.json().get('success')), None
+
+    first_token = None
+    done = False
+    with session.post(url + '/api/chat/stream', json={'message': message}, timeout=120, stream=True) as response:
+        if response.status_code != 200:
+            return False, None
+        for line in response.iter_lines(decode_unicode=True):
+            if line == 'event: token' and first_token is None:
+                first_token = time.perf_counter() - started
+            elif line == 'event: done':
+                done = True
+    return done, first_token
+
+
+def run_level(url, concurrency, duration, messages, stream, seed):
+    """
+    Closed-loop load: `concurrency` virtual users each sending their next message as soon as a reply arrives
+
+    Returns:
+        dict: Raw latencies (seconds), time-to-first-token values, error count and wall time
+    """
+    latencies, first_tokens = [], []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def virtual_user(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        own_latencies, own_first_tokens, own_errors = [], [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                succeeded, first_token = chat_turn(session, url, rng.choice(messages), stream)
+            except (requests.RequestException, ValueError):
+                succeeded, first_token = False, None
+            if succeeded:
+                own_latencies.append(time.perf_counter() - started)
+                if first_token is not None:
+                    own_first_tokens.append(first_token)
+            else:
+                own_errors += 1
+        session.close()
+        with lock:
+            latencies.extend(own_latencies)
+            first_tokens.extend(own_first_tokens)
+            errors[0] += own_errors
+
+    started = time.perf_counter()
+    users = [threading.Thread(target=virtual_user, args=(index,)) for index in range(concurrency)]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    return {'latencies': latencies, 'first_tokens': first_tokens, 'errors': errors[0],
+            'elapsed': time.perf_counter() - started}
+
+
+def summarize(concurrency, raw, memory, upstream_calls):
+    """Level result in the JSON output format"""
+    latencies = sorted(raw['latencies'])
+    completed = len(latencies)
+    total = completed + raw['errors']
+
+    def milliseconds(values):
+        values = sorted(values)
+        if not values:
+            return None
+        return {
+            'p50': round(percentile(values, 50) * 1000, 1),
+            'p90': round(percentile(values, 90) * 1000, 1),
+            'p99': round(percentile(values, 99) * 1000, 1),
+            'max': round(values[-1] * 1000, 1),
+            'mean': round(statistics.fmean(values) * 1000, 1)
+        }
+
+    level = {
+        'concurrency': concurrency,
+        'requests': total,
+        'completed': completed,
+        'errors': raw['errors'],
+        'error_rate': round(raw['errors'] / total, 4) if total else 0.0,
+        'throughput_rps': round(completed / raw['elapsed'], 2),
+        'latency_ms': milliseconds(latencies),
+        'worker_memory': memory,
+        'upstream_calls_per_turn': {name: round(calls / total, 2) if total else None
+                                    for name, calls in upstream_calls.items()}
+    }
+    if raw['first_tokens']:
+        level['first_token_ms'] = milliseconds(raw['first_tokens'])
+    return level
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print each level against the baseline and list the regressions
+
+    Returns:
+        list: One message per regression
+    """
+    if baseline.get('config') != results['config']:
+        print("warning: baseline was run with different options; numbers may not be comparable")
+    base_levels = {level['concurrency']: level for level in baseline.get('levels', [])}
+    regressions = []
+    print(f"\n{'vs baseline':<12} {'throughput':>12} {'p99':>12} {'error rate':>12}")
+    for level in results['levels']:
+        base = base_levels.get(level['concurrency'])
+        if not base or not base['throughput_rps'] or not base['latency_ms'] or not level['latency_ms']:
+            continue
+        throughput_change = level['throughput_rps'] / base['throughput_rps'] - 1
+        p99_change = level['latency_ms']['p99'] / base['latency_ms']['p99'] - 1
+        error_change = level['error_rate'] - base['error_rate']
+        print(f"c={level['concurrency']:<10} {throughput_change:>+11.1%} {p99_change:>+11.1%} {error_change:>+11.2%}")
+        if throughput_change < -tolerance:
+            regressions.append(f"c={level['concurrency']}: throughput {throughput_change:+.1%}")
+        if p99_change > tolerance:
+            regressions.append(f"c={level['concurrency']}: p99 latency {p99_change:+.1%}")
+        if error_change > 0.01:
+            regressions.append(f"c={level['concurrency']}: error rate {error_change:+.2%}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', default='1,4,16,32', help='comma-separated virtual user counts')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per level')
+    parser.add_argument('--warmup', type=float, default=3.0, help='seconds of unmeasured load before the first level')
+    parser.add_argument('--server', choices=('gunicorn', 'uvicorn'), default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--stream', action='store_true', help='load /api/chat/stream instead of /api/chat')
+    parser.add_argument('--single-call', action='store_true', help='run the app with GEMINI_SINGLE_CALL=true')
+    parser.add_argument('--gemini-latency', default='lognormal:0.8,0.4')
+    parser.add_argument('--giphy-latency', default='lognormal:0.15,0.5')
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--giphy-error-rate', type=float, default=0.0)
+    parser.add_argument('--replay', help='serve recorded upstream responses (see fake_upstreams.py --record)')
+    parser.add_argument('--database-url', help='default: a fresh SQLite file')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier --output run')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative regression vs the baseline')
+    args = parser.parse_args()
+
+    levels = [int(value) for value in args.concurrency.split(',')]
+    messages = sample_messages(random.Random(args.seed), 500)
+    config = {key: value for key, value in vars(args).items()
+              if key not in ('output', 'compare', 'tolerance', 'database_url')}
+
+    workdir = tempfile.mkdtemp(prefix='moodmorph-load-')
+    upstreams, base_urls = start_upstreams(args)
+    env = {
+        **os.environ, **base_urls,
+        'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(workdir, 'load.db')}",
+        'GEMINI_API_KEY': 'fake-key',
+        'GIPHY_API_KEY': 'fake-key',
+        'GIPHY_MODE': 'live',
+        'GIF_WARMER_ENABLED': 'false',
+        'GEMINI_SINGLE_CALL': 'true' if args.single_call else 'false',
+        'SESSION_SECRET': 'load-test',
+        'RECORD_WRITER_SPOOL_PATH': os.path.join(workdir, 'emotion-records.spool.jsonl'),
+        'CONTEXT_STORE_PATH': os.path.join(workdir, 'conversation-context.db'),
+    }
+    log_path = os.path.join(workdir, 'server.log')
+    server = None
+    try:
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'init-db'], cwd=ROOT, env=env,
+                       check=True, capture_output=True)
+        port = free_port()
+        with open(log_path, 'w') as log_file:
+            server = start_app(args, env, port, log_file)
+        url = f'http://127.0.0.1:{port}'
+        sampler = MemorySampler(server.pid)
+        print(f"{args.server}, {args.workers} workers, {'/api/chat/stream' if args.stream else '/api/chat'}, "
+              f"Gemini {args.gemini_latency}, Giphy {args.giphy_latency}; logs in {log_path}")
+
+        if args.warmup:
+            run_level(url, min(4, max(levels)), args.warmup, messages, args.stream, args.seed + 1)
+
+        results = {
+            'benchmark': 'bench_load',
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+            'config': config,
+            'levels': []
+        }
+        print(f"{'users':>6} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'errors':>7} {'worker RSS MB':>14}")
+        for concurrency in levels:
+            before = upstream_stats(base_urls)
+            sampler.start()
+            raw = run_level(url, concurrency, args.duration, messages, args.stream, args.seed)
+            memory = sampler.stop()
+            after = upstream_stats(base_urls)
+            level = summarize(concurrency, raw, memory, {name: after[name] - before[name] for name in after})
+            results['levels'].append(level)
+            latency = level['latency_ms'] or {}
+            print(f"{concurrency:>6} {level['throughput_rps']:>8.1f} {latency.get('p50', 0):>8.0f} "
+                  f"{latency.get('p90', 0):>8.0f} {latency.get('p99', 0):>8.0f} {level['errors']:>7} "
+                  f"{(memory or {}).get('max_mb', 0):>14.0f}")
+    finally:
+        for process in (server, upstreams):
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+        print(f"wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("regressions beyond the tolerance:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("no regressions beyond the tolerance")
+
+
+if __name__ == '__main__':
+    main()
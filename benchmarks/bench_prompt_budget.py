@@ -0,0 +1,100 @@
+"""
+Benchmark reply prompt size before and after token-budgeted assembly
+
+Replays synthetic conversations through the context store and compares, per
+turn, the estimated input tokens of the previous prompt (system prompt plus
+the last six raw messages plus the new message) with PromptBuilder's
+(summary plus the newest messages that fit the budget plus the clipped new
+message plus the system prompt). The system prompt is below the model's
+minimum context-cache size, so it is sent inline on every call; a
+context-cached row is only shown if it grows past that minimum.
+Message lengths follow a long-tailed mix: mostly short, some paragraphs,
+a few pasted walls of text.
+
+Usage:
+    python benchmarks/bench_prompt_budget.py [--conversations 200] [--turns 20] [--budget 1500]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = """
+i feel so sad today my boss is making me angry and i'm really anxious about the exam lonely tired
+exhausted confused lost happy great not very good bad day week friends work school home can't sleep
+worried stressed overwhelmed guilty let down disappointed okay fine alone nobody everything nothing
+that sounds hard thank you for telling me it makes sense you would feel this way after such a long
+""".split()
+
+
+def message(rng):
+    """Words for one message: 70% short, 25% a paragraph, 5% a wall of text"""
+    roll = rng.random()
+    count = rng.randint(3, 25) if roll < 0.7 else rng.randint(60, 200) if roll < 0.95 else rng.randint(800, 2500)
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def percentiles(values):
+    values = sorted(values)
+    return statistics.median(values), values[int(len(values) * 0.95)], values[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--budget', type=int, default=1500)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    from context_store import MemoryContextStore
+    from gemini_conversation import GeminiConversationAI
+    from prompt_builder import PromptBuilder, estimate_tokens
+
+    conversation_ai = GeminiConversationAI(single_call=False)
+    system_tokens = estimate_tokens(conversation_ai.system_prompt)
+    cacheable = conversation_ai.system_prompt_cache.cacheable(conversation_ai.system_prompt)
+    builder = PromptBuilder(budget_tokens=args.budget)
+    store = MemoryContextStore(10)
+    rng = random.Random(args.seed)
+
+    before, after, build_us = [], [], []
+    for conversation in range(args.conversations):
+        conversation_id = f"conversation-{conversation}"
+        for _ in range(args.turns):
+            user_message = message(rng)
+            context = store.get(conversation_id)
+            history = [m for m in context if m['sender'] != 'summary']
+            before.append(system_tokens + estimate_tokens(user_message)
+                          + sum(estimate_tokens(m['text']) for m in history[-6:]))
+            began = time.perf_counter()
+            _, estimated = builder.build(user_message, context)
+            build_us.append((time.perf_counter() - began) * 1e6)
+            after.append(estimated)
+            store.append(conversation_id, [{'sender': 'user', 'text': user_message},
+                                           {'sender': 'bot', 'text': message(rng)}])
+
+    print(f"{len(before)} turns, budget {args.budget} tokens, system prompt ~{system_tokens} tokens")
+    print(f"{'input tokens / turn':<36} {'median':>8} {'p95':>8} {'max':>8}")
+    rows = [
+        ('before (system + last 6 raw)', before),
+        ('after, system prompt inline', [tokens + system_tokens for tokens in after]),
+    ]
+    if cacheable:
+        rows.append(('after, system prompt context-cached', after))
+    for label, values in rows:
+        median, p95, peak = percentiles(values)
+        print(f"{label:<36} {median:>8.0f} {p95:>8.0f} {peak:>8.0f}")
+    if not cacheable:
+        print(f"(system prompt is below the {conversation_ai.system_prompt_cache.min_tokens}-token "
+              f"context-cache minimum, so it is always sent inline)")
+    print(f"prompt assembly: {statistics.median(build_us):.1f} us median per turn")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare the LexiconSentiment engine with TextBlob polarity: agreement and throughput
+
+Agreement is reported as Pearson correlation, mean absolute difference, the
+share of identical scores and the share of texts that land in the same
+negative / neutral / positive bucket EmotionAnalyzer uses (+-0.1).
+
+Usage:
+    python benchmarks/bench_sentiment.py [--texts 5000] [--file messages.txt]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentiment_engine import LexiconSentiment  # noqa: E402
+
+SUBJECTS = ["i", "i'm", "today i", "honestly i", "my boss says i", "everyone thinks i", "lately i"]
+VERBS = ["feel", "am", "was", "have been", "seem", "look", "got"]
+MODIFIERS = ["", "", "", "very", "really", "so", "extremely", "totally", "a bit", "terribly"]
+NEGATIONS = ["", "", "", "not", "never", "not really", "don't feel", "can't be"]
+TAILS = ["", "", "today", "at work", "about the exam", "with my friends", "and i don't know why", "lol", "rn"]
+ENDINGS = ["", "", "", "!", "!!", ".", "...", "?"]
+
+
+def synthetic_messages(engine, count, rng):
+    """Chat-like messages built from lexicon words with intensifiers, negation and punctuation"""
+    words = [word for word in engine.codes if word.isalpha() and len(word) > 2]
+    messages = []
+    for _ in range(count):
+        parts = [rng.choice(SUBJECTS), rng.choice(VERBS), rng.choice(NEGATIONS), rng.choice(MODIFIERS), rng.choice(words)]
+        if rng.random() < 0.4:
+            parts += ["and", rng.choice(MODIFIERS), rng.choice(words)]
+        parts.append(rng.choice(TAILS))
+        messages.append(' '.join(part for part in parts if part) + rng.choice(ENDINGS))
+    return messages
+
+
+def buckets(scores):
+    return np.where(scores < -0.1, -1, np.where(scores > 0.1, 1, 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--texts', type=int, default=5000)
+    parser.add_argument('--file', help="Score these messages (one per line) instead of synthetic ones")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = LexiconSentiment()
+    lexicon_load_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    from textblob import TextBlob
+    TextBlob("warm up").sentiment.polarity
+    textblob_load_ms = (time.perf_counter() - start) * 1000
+
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            texts = [line.strip().lower() for line in f if line.strip()]
+    else:
+        texts = [text.lower() for text in synthetic_messages(engine, args.texts, random.Random(args.seed))]
+
+    start = time.perf_counter()
+    expected = np.array([TextBlob(text).sentiment.polarity for text in texts])
+    textblob_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = np.array([engine.score(text) for text in texts])
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = engine.score_many(texts)
+    batch_s = time.perf_counter() - start
+    assert np.allclose(single, batch)
+
+    correlation = np.corrcoef(expected, batch)[0, 1] if expected.std() and batch.std() else float('nan')
+    print(f"texts: {len(texts)}")
+    print("agreement with TextBlob")
+    print(f"  pearson r            {correlation:.4f}")
+    print(f"  mean abs difference  {np.abs(expected - batch).mean():.4f}")
+    print(f"  identical scores     {np.mean(np.isclose(expected, batch)):.1%}")
+    print(f"  same +-0.1 bucket    {np.mean(buckets(expected) == buckets(batch)):.1%}")
+    print("throughput (texts/sec)")
+    print(f"  textblob             {len(texts) / textblob_s:>10.0f}")
+    print(f"  lexicon, one by one  {len(texts) / single_s:>10.0f}")
+    print(f"  lexicon, one batch   {len(texts) / batch_s:>10.0f}")
+    print("load (first use, ms)")
+    print(f"  textblob             {textblob_load_ms:>10.0f}")
+    print(f"  lexicon              {lexicon_load_ms:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark concurrent SQLite writers and readers with and without the production profile
+
+Starts N writer processes, each with its own app and connection pool the way
+gunicorn workers do, inserting EmotionRecords (one commit per --batch rows),
+plus reader processes running the /api/history query, all against the same
+database file for --seconds. Reported per profile:
+
+    writes/s     rows committed per second across all writers
+    reads/s      history queries per second across all readers
+    p50/p99 ms   commit latency seen by writers
+    locked       "database is locked" errors
+
+Usage:
+    python benchmarks/bench_sqlite_writers.py [--writers 1 4 8] [--readers 2] [--seconds 5] [--batch 1] [--json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _load_app(database_url, profile):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SQLITE_PROFILE'] = profile
+    os.environ['GIF_WARMER_ENABLED'] = 'false'
+    import logging
+    logging.disable(logging.CRITICAL)
+    from app import app, db
+    from models import EmotionRecord
+    return app, db, EmotionRecord
+
+
+def _setup(database_url, profile):
+    app, _, _ = _load_app(database_url, profile)
+    from schema import init_db
+    with app.app_context():
+        init_db()
+
+
+def _writer(database_url, profile, seconds, batch, start, results):
+    from sqlalchemy.exc import OperationalError
+
+    app, db, EmotionRecord = _load_app(database_url, profile)
+    rows, locked, latencies = 0, 0, []
+    with app.app_context():
+        start.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            began = time.perf_counter()
+            try:
+                db.session.execute(EmotionRecord.__table__.insert(), [{
+                    'user_input': 'I feel a bit anxious about tomorrow',
+                    'detected_emotion': 'anxious',
+                    'sentiment_score': -0.3,
+                    'opposite_emotion': 'calm',
+                } for _ in range(batch)])
+                db.session.commit()
+                rows += batch
+                latencies.append((time.perf_counter() - began) * 1000)
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e):
+                    raise
+                locked += 1
+    results.put({'role': 'writer', 'rows': rows, 'locked': locked, 'latencies': latencies})
+
+
+def _reader(database_url, profile, seconds, start, results):
+    from sqlalchemy.exc import OperationalError
+
+    app, db, EmotionRecord = _load_app(database_url, profile)
+    reads, locked = 0, 0
+    with app.app_context():
+        start.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            try:
+                EmotionRecord.query.order_by(EmotionRecord.timestamp.desc(), EmotionRecord.id.desc()).limit(10).all()
+                db.session.rollback()
+                reads += 1
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e):
+                    raise
+                locked += 1
+    results.put({'role': 'reader', 'reads': reads, 'locked': locked})
+
+
+def run(profile, writers, readers, seconds, batch):
+    ctx = multiprocessing.get_context('spawn')
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='moodmorph-sqlite-'), 'bench.db')}"
+    setup = ctx.Process(target=_setup, args=(database_url, profile))
+    setup.start()
+    setup.join()
+
+    start, results = ctx.Event(), ctx.Queue()
+    processes = [ctx.Process(target=_writer, args=(database_url, profile, seconds, batch, start, results))
+                 for _ in range(writers)]
+    processes += [ctx.Process(target=_reader, args=(database_url, profile, seconds, start, results))
+                  for _ in range(readers)]
+    for process in processes:
+        process.start()
+    # Let every process import the app before the clock starts
+    time.sleep(3 + 0.3 * len(processes))
+    start.set()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for report in reports for latency in report.get('latencies', []))
+    return {
+        'profile': profile,
+        'writers': writers,
+        'readers': readers,
+        'writes_per_sec': round(sum(report.get('rows', 0) for report in reports) / seconds, 1),
+        'reads_per_sec': round(sum(report.get('reads', 0) for report in reports) / seconds, 1),
+        'p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)], 2) if latencies else None,
+        'locked': sum(report['locked'] for report in reports),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--batch', type=int, default=1, help="Rows per commit (1 = one commit per chat turn)")
+    parser.add_argument('--profiles', nargs='+', default=['none', 'production'])
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = [run(profile, writers, args.readers, args.seconds, args.batch)
+               for writers in args.writers for profile in args.profiles]
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"{args.readers} readers, {args.batch} rows/commit, {args.seconds:g}s per run, {os.cpu_count()} CPUs")
+    print(f"{'profile':<11} {'writers':>7} {'writes/s':>9} {'reads/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'locked':>7}")
+    for result in results:
+        print(f"{result['profile']:<11} {result['writers']:>7} {result['writes_per_sec']:>9.1f} {result['reads_per_sec']:>9.1f} "
+              f"{result['p50_ms'] or 0:>8.2f} {result['p99_ms'] or 0:>8.2f} {result['locked']:>7}")
+
+
+if __name__ == '__main__':
+    main()
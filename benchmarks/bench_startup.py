@@ -0,0 +1,82 @@
+"""
+Benchmark cold startup: app import time and first-request latency
+
+Each repetition runs in a fresh interpreter, the way a gunicorn worker or a
+test run starts. Reported per phase (median over repetitions):
+
+    import     - `import app` (app factory, models, routes, CLI commands)
+    first /    - first GET / (template render, no services needed)
+    services   - first GET /api/metrics, which builds every lazy service
+                 (Gemini client, Giphy service, GIF catalog)
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, logging, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+logging.disable(logging.CRITICAL)
+client = app.test_client()
+client.get('/')
+first_page = time.perf_counter()
+client.get('/api/metrics')
+services = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_page_ms': (first_page - imported) * 1000,
+    'services_ms': (services - first_page) * 1000,
+}))
+"""
+
+
+def run_probe(env):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="Print the medians as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='moodmorph-startup-')
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    env.setdefault('GEMINI_API_KEY', 'benchmark')
+    env['GIF_WARMER_ENABLED'] = 'false'
+
+    # Create the schema once, outside the measured runs
+    subprocess.run([sys.executable, '-c', 'from app import app\nfrom schema import init_db\n'
+                    'with app.app_context(): init_db()'],
+                   cwd=ROOT, env=env, capture_output=True, check=True)
+
+    runs = [run_probe(env) for _ in range(args.repeat)]
+    medians = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+
+    if args.json:
+        print(json.dumps(medians))
+        return
+    print(f"{'phase':<10} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for key, label in (('import_ms', 'import'), ('first_page_ms', 'first /'), ('services_ms', 'services')):
+        values = [run[key] for run in runs]
+        print(f"{label:<10} {medians[key]:>10.1f} {min(values):>8.1f} {max(values):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
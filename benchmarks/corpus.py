@@ -0,0 +1,103 @@
+"""
+Chat message corpora shared by the benchmarks
+
+Four kinds of message, in roughly the mix seen in chat traffic: short
+check-ins, long venting paragraphs, emoji-heavy messages and messages that
+mix several emotions.
+"""
+SHORT = [
+    "hi",
+    "i'm tired",
+    "feeling kinda down today",
+    "ugh my boss is so annoying",
+    "can't sleep again",
+    "i'm so nervous about tomorrow",
+    "nobody texted me back",
+    "i'm confused about what to do",
+    "today was actually good!",
+    "i feel so alone",
+    "I'm really stressed about my exam",
+    "so frustrated right now",
+    "i miss my grandma",
+    "honestly just exhausted",
+    "why does everything go wrong",
+    "meh",
+    "i got the job!!",
+    "i'm worried about my mom",
+    "i feel guilty for snapping at my friend",
+    "kind of lost lately",
+]
+
+LONG = [
+    "So today started okay but then my manager pulled me into a meeting and basically told me that the project "
+    "I've been working on for three months is getting cancelled. I stayed late every night for this. I honestly "
+    "don't know what the point was, and I'm scared that this means my job is next. I came home and just sat in "
+    "the car for twenty minutes because I didn't want to talk to anyone.",
+    "I've been trying to make friends since I moved here but it feels impossible. Everyone already has their "
+    "groups and I keep getting invited to things once and then never again. I spend most weekends alone in my "
+    "apartment scrolling through my phone and seeing everyone back home having fun without me. I'm starting to "
+    "wonder if something is wrong with me.",
+    "My exams start next week and I haven't slept properly in days. Every time I sit down to study my heart "
+    "starts racing and I just stare at the page. My parents keep asking how it's going and I keep saying fine "
+    "but it's not fine. I'm terrified of failing and disappointing everyone who believed in me.",
+    "I had a huge argument with my sister about our dad's care. She thinks I'm not doing enough but she lives "
+    "four hours away and I'm the one driving him to every appointment. I said some things I regret, she said "
+    "some things that really hurt, and now neither of us is talking. I'm angry and sad and tired all at once.",
+    "I don't even know why I'm upset. Nothing bad happened today. I went to work, came home, made dinner. But "
+    "there's this heavy feeling that won't go away, like a grey cloud sitting on my chest. I used to enjoy "
+    "painting and now I can't even remember the last time I picked up a brush.",
+    "Okay so I finally did it, I told my friends I'm quitting my job to go back to school. Half of them were "
+    "super supportive and the other half looked at me like I was crazy. I'm excited but also terrified, and "
+    "I keep going back and forth on whether this was the dumbest decision of my life or the best one.",
+]
+
+EMOJI = [
+    "😭😭😭 worst day ever",
+    "im so tired 😴😴",
+    "🙃🙃 everything is fine 🙃",
+    "got the promotion!!! 🎉🎉🥳",
+    "😡😡 why do people do this",
+    "feeling 💔 tonight",
+    "😰 presentation in 10 min",
+    "🥺 nobody remembered my birthday",
+    "✨ trying to stay positive ✨ but 😩",
+    "🤯🤯🤯 so much homework",
+    "😔",
+    "lol 😂 my dog ate my homework for real",
+]
+
+MULTI_EMOTION = [
+    "I'm happy for my best friend getting engaged but also kind of sad and lonely because it feels like everyone is moving on without me",
+    "so angry at myself and anxious about what happens next, I really messed up the interview",
+    "excited about the trip but worried I can't afford it and guilty for even wanting to go",
+    "tired and frustrated and honestly a bit confused about why I keep doing this to myself",
+    "relieved the surgery went well but still scared and exhausted from the whole week",
+    "I love my job but I'm burnt out, overwhelmed and lonely working from home every day",
+]
+
+CORPORA = {
+    'short': SHORT,
+    'long': LONG,
+    'emoji': EMOJI,
+    'multi_emotion': MULTI_EMOTION,
+}
+
+# Share of each kind in sampled traffic
+MIX = (('short', 0.6), ('long', 0.15), ('emoji', 0.15), ('multi_emotion', 0.1))
+
+
+def sample_messages(rng, count, mix=MIX):
+    """
+    Draw messages in the given mix of kinds
+
+    Args:
+        rng (random.Random): Seeded generator, for repeatable runs
+        count (int): Number of messages
+        mix (tuple): (kind, weight) pairs
+
+    Returns:
+        list: Message strings
+    """
+    kinds = [kind for kind, _ in mix]
+    weights = [weight for _, weight in mix]
+    return [rng.choice(CORPORA[kind]) for kind in rng.choices(kinds, weights, k=count)]
@@ -0,0 +1,434 @@
+"""
+Local stand-ins for the Gemini and Giphy APIs, for load tests
+
+Serves the Gemini generateContent, streamGenerateContent and cachedContents
+endpoints and the Giphy search endpoint, with configurable latency
+distributions and error rates, so /api/chat can be load-tested without
+spending real quota. Point the app at them with GEMINI_BASE_URL and
+GIPHY_BASE_URL (bench_load.py does this itself).
+
+Responses are synthetic by default: the detected emotion follows keywords in
+the message, replies are a few sentences long and schema-constrained calls
+get valid EmotionAnalysis / ConversationResponse JSON. With --replay FILE,
+recorded responses are served instead, round-robin per kind of request.
+--record FILE turns the servers into proxies to the real APIs that save every
+response they relay, which makes such a file.
+
+Latency specs:
+    fixed:SECONDS, uniform:LOW,HIGH, lognormal:MEDIAN,SIGMA
+
+Usage:
+    python benchmarks/fake_upstreams.py [--gemini-port 8701] [--giphy-port 8702]
+        [--gemini-latency lognormal:0.8,0.4] [--giphy-latency lognormal:0.15,0.5]
+        [--gemini-error-rate 0.0] [--giphy-error-rate 0.0] [--replay FILE | --record FILE]
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+REAL_BASE_URLS = {
+    'gemini': 'https://generativelanguage.googleapis.com',
+    'giphy': 'https://api.giphy.com'
+}
+
+EMOTION_WORDS = {
+    'sad': ('sad', 'down', 'cry', 'depressed', 'miss'),
+    'angry': ('angry', 'mad', 'furious', 'annoyed', 'hate'),
+    'anxious': ('anxious', 'worried', 'nervous', 'panic', 'stress', 'exam'),
+    'lonely': ('lonely', 'alone', 'nobody', 'isolated'),
+    'tired': ('tired', 'exhausted', 'sleep', 'drained'),
+    'confused': ('confused', 'lost', "don't know", 'unsure'),
+    'happy': ('happy', 'great', 'excited', 'good news', 'promoted')
+}
+
+# The user message inside GeminiConversationAI's emotion analysis prompt
+_ANALYSIS_MESSAGE_RE = re.compile(r'emotional content: "(.*?)"\s*Based on the emotional state', re.S)
+
+GIF_KEYWORDS = {
+    'sad': ['cute', 'hug', 'heartwarming'],
+    'angry': ['calming', 'breathe', 'nature'],
+    'anxious': ['calming', 'peaceful', 'breathe'],
+    'lonely': ['friendship', 'support', 'love'],
+    'tired': ['cozy', 'rest', 'comfort'],
+    'confused': ['lightbulb', 'clarity', 'understanding'],
+    'happy': ['celebration', 'dance', 'joy'],
+    'neutral': ['uplifting', 'positive', 'smile']
+}
+
+REPLY_SENTENCES = [
+    "That sounds like a lot to carry right now.",
+    "I'm really glad you told me about it.",
+    "It makes complete sense that you'd feel this way.",
+    "You don't have to figure it all out tonight.",
+    "What part of it is weighing on you the most?",
+    "Sometimes just naming the feeling takes a little of its power away.",
+    "Have you been able to rest at all today?",
+    "I'm here, and I'm not going anywhere.",
+    "Small steps still count, even the tiny ones.",
+    "Want to talk through what happened?"
+]
+
+
+def latency_sampler(spec):
+    """
+    Parse a latency spec into a function returning one sampled delay in seconds
+
+    Args:
+        spec (str): fixed:SECONDS, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA
+
+    Returns:
+        callable: Sampler using the module's random generator
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',') if value]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'lognormal' and len(values) == 2:
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Bad latency spec {spec!r}; use fixed:S, uniform:LO,HI or lognormal:MEDIAN,SIGMA")
+
+
+class Upstream:
+    """Behaviour and counters of one fake upstream"""
+
+    def __init__(self, name, latency, error_rate=0.0, error_status=503, replay=None, record=None):
+        """
+        Args:
+            name (str): 'gemini' or 'giphy'
+            latency (str): Latency spec (see latency_sampler)
+            error_rate (float): Share of requests answered with error_status
+            error_status (int): HTTP status of injected errors
+            replay (dict): Recorded responses by request kind, served round-robin
+            record (Recorder): Proxy to the real API and save its responses
+        """
+        self.name = name
+        self.latency_spec = latency
+        self.sample_latency = latency_sampler(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.replay = replay or {}
+        self.record = record
+        self._replay_positions = {}
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.errors = 0
+
+    def count(self, kind, error=False):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.errors += error
+
+    def replayed(self, kind):
+        """Next recorded (status, content type, body) for a kind of request, or None"""
+        entries = self.replay.get(kind)
+        if not entries:
+            return None
+        with self._lock:
+            position = self._replay_positions.get(kind, 0)
+            self._replay_positions[kind] = position + 1
+        entry = entries[position % len(entries)]
+        return entry['status'], entry.get('content_type', 'application/json'), entry['body'].encode('utf-8')
+
+    def stats(self):
+        with self._lock:
+            return {'requests': dict(self.requests), 'errors': self.errors,
+                    'latency': self.latency_spec, 'error_rate': self.error_rate}
+
+
+class Recorder:
+    """Relays requests to the real APIs and appends each response to a JSONL file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def relay(self, upstream, kind, method, path, headers, body):
+        """Forward one request; returns (status, content type, body)"""
+        forwarded = {name: value for name, value in headers.items()
+                     if name.lower() in ('content-type', 'x-goog-api-key', 'accept')}
+        request = urllib.request.Request(REAL_BASE_URLS[upstream] + path, data=body, method=method, headers=forwarded)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, content_type, payload = response.status, response.headers.get('Content-Type'), response.read()
+        except urllib.error.HTTPError as e:
+            status, content_type, payload = e.code, e.headers.get('Content-Type'), e.read()
+        with self._lock, open(self.path, 'a') as recording:
+            recording.write(json.dumps({
+                'upstream': upstream, 'kind': kind, 'status': status,
+                'content_type': content_type or 'application/json', 'body': payload.decode('utf-8')
+            }) + '\n')
+        return status, content_type or 'application/json', payload
+
+
+def load_replay(path):
+    """Recorded responses from a --record file, as {upstream: {kind: [entries]}}"""
+    replay = {}
+    with open(path) as recording:
+        for line in recording:
+            if line.strip():
+                entry = json.loads(line)
+                replay.setdefault(entry['upstream'], {}).setdefault(entry['kind'], []).append(entry)
+    return replay
+
+
+def _detect_emotion(text):
+    text = text.lower()
+    for emotion, words in EMOTION_WORDS.items():
+        if any(word in text for word in words):
+            return emotion
+    return 'neutral'
+
+
+def _reply_text(seed):
+    rng = random.Random(seed)
+    return ' '.join(rng.sample(REPLY_SENTENCES, rng.randint(2, 5)))
+
+
+def _gemini_kind(path, request):
+    """Kind of a Gemini request, used to key recordings: stream, cache, analysis, single-call or reply"""
+    if 'cachedContents' in path:
+        return 'cache'
+    if ':streamGenerateContent' in path:
+        return 'stream'
+    config = request.get('generationConfig') or {}
+    schema = json.dumps(config.get('responseSchema') or config.get('responseJsonSchema') or {})
+    if config.get('responseMimeType') == 'application/json':
+        return 'single-call' if '"response"' in schema else 'analysis'
+    return 'reply'
+
+
+def _gemini_response(kind, request):
+    """Synthetic generateContent response body for a request"""
+    contents = request.get('contents') or [{}]
+    text = ' '.join(part.get('text', '') for part in (contents[-1].get('parts') or []))
+    prompt_tokens = sum(len(part.get('text', '')) for content in contents for part in content.get('parts') or []) // 4
+    if kind == 'analysis':
+        quoted = _ANALYSIS_MESSAGE_RE.search(text)
+        text = quoted.group(1) if quoted else text
+    emotion = _detect_emotion(text)
+    if kind in ('analysis', 'single-call'):
+        data = {
+            'emotion': emotion,
+            'intensity': 0.4 if emotion in ('neutral', 'happy') else 0.7,
+            'context': f"user shared something {emotion}",
+            'gif_keywords': GIF_KEYWORDS[emotion],
+            'conversation_tone': 'supportive'
+        }
+        if kind == 'single-call':
+            data = {'response': _reply_text(text), **data}
+        output = json.dumps(data)
+    else:
+        output = _reply_text(text)
+    return {
+        'candidates': [{'content': {'role': 'model', 'parts': [{'text': output}]}, 'finishReason': 'STOP', 'index': 0}],
+        'usageMetadata': {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': len(output) // 4,
+                          'totalTokenCount': prompt_tokens + len(output) // 4},
+        'modelVersion': 'gemini-2.5-flash'
+    }
+
+
+def _giphy_response(query):
+    """Synthetic Giphy search response; the same term always returns the same GIF ids"""
+    term = (query.get('q') or [''])[0]
+    limit = int((query.get('limit') or ['20'])[0])
+    gifs = []
+    for index in range(limit):
+        gif_id = hashlib.sha1(f"{term}:{index}".encode()).hexdigest()[:14]
+        url = f"https://media.giphy.example/media/{gif_id}/giphy.gif"
+        gifs.append({
+            'id': gif_id,
+            'title': f"{term} GIF {index}",
+            'tags': [term],
+            'images': {
+                'original': {'url': url, 'width': '480', 'height': '270', 'size': '1500000'},
+                'fixed_width': {'url': url.replace('giphy.gif', '200w.gif'), 'width': '200', 'height': '113', 'size': '300000'}
+            }
+        })
+    return {'data': gifs, 'pagination': {'total_count': limit, 'count': limit, 'offset': 0},
+            'meta': {'status': 200, 'msg': 'OK'}}
+
+
+def make_handler(upstream, stream_interval):
+    """Request handler class serving one fake upstream"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status, payload):
+            self._send(status, 'application/json', json.dumps(payload).encode('utf-8'))
+
+        def _send_sse(self, chunks):
+            """Stream events with chunked transfer encoding, stream_interval apart"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for index, chunk in enumerate(chunks):
+                if index:
+                    time.sleep(stream_interval)
+                data = f"data: {json.dumps(chunk)}\r\n\r\n".encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _error(self, kind):
+            upstream.count(kind, error=True)
+            if upstream.name == 'gemini':
+                self._send_json(upstream.error_status, {'error': {
+                    'code': upstream.error_status, 'message': 'The model is overloaded. Please try again later.',
+                    'status': 'UNAVAILABLE'
+                }})
+            else:
+                self._send_json(upstream.error_status, {'meta': {'status': upstream.error_status, 'msg': 'Internal error'}})
+
+        def _serve(self, kind, body, synthetic):
+            if upstream.record is not None:
+                upstream.count(kind)
+                status, content_type, payload = upstream.record.relay(
+                    upstream.name, kind, self.command, self.path, self.headers, body
+                )
+                return self._send(status, content_type, payload)
+
+            time.sleep(upstream.sample_latency())
+            if random.random() < upstream.error_rate:
+                return self._error(kind)
+            upstream.count(kind)
+            replayed = upstream.replayed(kind)
+            if replayed is not None:
+                return self._send(*replayed)
+            synthetic()
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if upstream.name != 'gemini':
+                return self._send_json(404, {'error': 'not found'})
+            try:
+                request = json.loads(body or b'{}')
+            except ValueError:
+                return self._send_json(400, {'error': {'code': 400, 'message': 'Invalid JSON', 'status': 'INVALID_ARGUMENT'}})
+            kind = _gemini_kind(self.path, request)
+
+            def synthetic():
+                if kind == 'cache':
+                    # Like the real API for a system prompt below the minimum cacheable size
+                    return self._send_json(400, {'error': {
+                        'code': 400, 'status': 'INVALID_ARGUMENT',
+                        'message': 'Cached content is too small. min_total_token_count=1024'
+                    }})
+                if kind == 'stream':
+                    response = _gemini_response('reply', request)
+                    words = response['candidates'][0]['content']['parts'][0]['text'].split(' ')
+                    chunks = []
+                    for start in range(0, len(words), 4):
+                        text = ' '.join(words[start:start + 4]) + (' ' if start + 4 < len(words) else '')
+                        chunks.append({'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'index': 0}]})
+                    chunks[-1]['candidates'][0]['finishReason'] = 'STOP'
+                    chunks[-1]['usageMetadata'] = response['usageMetadata']
+                    return self._send_sse(chunks)
+                self._send_json(200, _gemini_response(kind, request))
+
+            self._serve(kind, body, synthetic)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path == '/_stats':
+                return self._send_json(200, upstream.stats())
+            if upstream.name != 'giphy' or not parts.path.endswith('/search'):
+                return self._send_json(404, {'meta': {'status': 404, 'msg': 'Not found'}})
+            self._serve('search', None, lambda: self._send_json(200, _giphy_response(parse_qs(parts.query))))
+
+    return Handler
+
+
+def start_servers(gemini, giphy, gemini_port=8701, giphy_port=8702, host='127.0.0.1', stream_interval=0.03):
+    """
+    Start both fake upstreams in daemon threads
+
+    Args:
+        gemini (Upstream): Gemini behaviour
+        giphy (Upstream): Giphy behaviour
+        gemini_port (int): Port of the Gemini stand-in (0 picks a free one)
+        giphy_port (int): Port of the Giphy stand-in (0 picks a free one)
+        host (str): Interface to listen on
+        stream_interval (float): Seconds between streamed reply chunks
+
+    Returns:
+        tuple: (servers, {"GEMINI_BASE_URL": ..., "GIPHY_BASE_URL": ...})
+    """
+    servers = []
+    for upstream, port in ((gemini, gemini_port), (giphy, giphy_port)):
+        server = ThreadingHTTPServer((host, port), make_handler(upstream, stream_interval))
+        server.daemon_threads = True
+        server.request_queue_size = 512
+        threading.Thread(target=server.serve_forever, name=f"fake-{upstream.name}", daemon=True).start()
+        servers.append(server)
+    base_urls = {
+        'GEMINI_BASE_URL': f"http://{host}:{servers[0].server_address[1]}/",
+        'GIPHY_BASE_URL': f"http://{host}:{servers[1].server_address[1]}/v1/gifs"
+    }
+    return servers, base_urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--gemini-port', type=int, default=8701)
+    parser.add_argument('--giphy-port', type=int, default=8702)
+    parser.add_argument('--gemini-latency', default='lognormal:0.8,0.4')
+    parser.add_argument('--giphy-latency', default='lognormal:0.15,0.5')
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--giphy-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-error-status', type=int, default=503)
+    parser.add_argument('--giphy-error-status', type=int, default=500)
+    parser.add_argument('--stream-interval', type=float, default=0.03, help='seconds between streamed reply chunks')
+    parser.add_argument('--seed', type=int, default=None)
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument('--replay', help='JSONL of recorded responses to serve')
+    recording.add_argument('--record', help='proxy to the real APIs and append their responses to this JSONL file')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    replay = load_replay(args.replay) if args.replay else {}
+    recorder = Recorder(args.record) if args.record else None
+    gemini = Upstream('gemini', args.gemini_latency, args.gemini_error_rate, args.gemini_error_status,
+                      replay.get('gemini'), recorder)
+    giphy = Upstream('giphy', args.giphy_latency, args.giphy_error_rate, args.giphy_error_status,
+                     replay.get('giphy'), recorder)
+    servers, base_urls = start_servers(gemini, giphy, args.gemini_port, args.giphy_port, args.host, args.stream_interval)
+
+    # One line of JSON, so a parent process can read the URLs
+    print(json.dumps(base_urls), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+        print(json.dumps({'gemini': gemini.stats(), 'giphy': giphy.stats()}), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
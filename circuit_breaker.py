@@ -0,0 +1,305 @@
+"""
+Circuit breakers and jittered retries for the upstream APIs (Gemini, Giphy)
+
+A breaker watches the outcome of recent calls to one upstream. When too many
+of them failed, or took longer than slow_seconds, it opens: calls are refused
+at once with CircuitOpenError, and callers serve the turn from the local
+pipeline instead of queueing behind a sick upstream. After open_seconds it
+goes half-open and lets one probe call through; the probe's outcome closes
+the breaker again or re-opens it for another open_seconds.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe breaker driven by the error rate and slow-call rate of recent calls
+
+    The window holds the outcomes of the last `window` calls made within the
+    last window_seconds; it is judged once it holds at least min_calls.
+    """
+
+    def __init__(self, name, failure_rate=0.5, slow_seconds=10.0, slow_rate=0.5, window=20,
+                 min_calls=10, window_seconds=60.0, open_seconds=30.0, failed_result=None):
+        """
+        Args:
+            name (str): Upstream name, for logs and metrics
+            failure_rate (float): Share of failed calls that opens the breaker
+            slow_seconds (float): Calls taking at least this long count as slow
+            slow_rate (float): Share of slow calls that opens the breaker
+            window (int): Most recent calls judged
+            min_calls (int): Calls the window needs before it is judged
+            window_seconds (float): Outcomes older than this are dropped
+            open_seconds (float): Time open before a half-open probe is let through
+            failed_result (callable): Marks a returned result as failed, e.g. an HTTP 503 response
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.failed_result = failed_result
+
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (finished_at, failed, slow)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+
+    @classmethod
+    def from_env(cls, name, prefix, **defaults):
+        """
+        Build a breaker configured by <prefix>_BREAKER_* environment variables
+
+        FAILURE_RATE, SLOW_SECONDS, SLOW_RATE, WINDOW, MIN_CALLS and
+        OPEN_SECONDS override the matching constructor arguments.
+        """
+        settings = dict(defaults)
+        for setting, cast in (('failure_rate', float), ('slow_seconds', float), ('slow_rate', float),
+                              ('window', int), ('min_calls', int), ('open_seconds', float)):
+            value = os.environ.get(f"{prefix}_BREAKER_{setting.upper()}")
+            if value is not None:
+                settings[setting] = cast(value)
+        return cls(name, **settings)
+
+    def available(self):
+        """
+        Whether calls may be attempted now, without taking the half-open probe
+
+        Callers check this before starting work that needs the upstream, and
+        serve the request locally when it is False (counted as short-circuited).
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self._opened_at + self.open_seconds:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                return True
+            self.short_circuited += 1
+            return False
+
+    def closed(self):
+        """
+        Whether the breaker is closed, so concurrent calls will all be admitted
+
+        Outside CLOSED only one probe call goes through at a time; a caller
+        that would issue several calls at once should make them one by one.
+        """
+        with self._lock:
+            return self.state == CLOSED
+
+    def allow(self):
+        """Admit one call, taking the probe slot when half-open; False if the call must not be made"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() < self._opened_at + self.open_seconds:
+                    self.short_circuited += 1
+                    return False
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.short_circuited += 1
+                    return False
+                self._probing = True
+            return True
+
+    def record(self, elapsed, failed):
+        """
+        Record the outcome of a call admitted by allow()
+
+        Args:
+            elapsed (float): Call duration in seconds
+            failed (bool): Whether the call failed
+        """
+        failed = bool(failed)
+        slow = elapsed >= self.slow_seconds
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+            self.slow_calls += slow
+
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if failed or slow:
+                    self._open(now, 'probe failed' if failed else f"probe took {elapsed:.1f}s")
+                else:
+                    self._outcomes.clear()
+                    self._set_state(CLOSED)
+                return
+            if self.state == OPEN:
+                # Started before the breaker opened
+                return
+
+            self._outcomes.append((now, failed, slow))
+            while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+                self._outcomes.popleft()
+            count = len(self._outcomes)
+            if count < self.min_calls:
+                return
+            failures = sum(outcome[1] for outcome in self._outcomes)
+            slow_calls = sum(outcome[2] for outcome in self._outcomes)
+            if failures / count >= self.failure_rate:
+                self._open(now, f"{failures}/{count} recent calls failed")
+            elif slow_calls / count >= self.slow_rate:
+                self._open(now, f"{slow_calls}/{count} recent calls took over {self.slow_seconds:g}s")
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Call fn through the breaker
+
+        Raises:
+            CircuitOpenError: The breaker is open; fn was not called
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        start_time = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            self.record(time.perf_counter() - start_time, True)
+            raise
+        self.record(time.perf_counter() - start_time, self.failed_result is not None and self.failed_result(result))
+        return result
+
+    async def call_async(self, coroutine_fn, *args, **kwargs):
+        """Async version of call"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        start_time = time.perf_counter()
+        try:
+            result = await coroutine_fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # Cancelled by the caller (e.g. a losing hedge request): says nothing about the upstream
+            self._release()
+            raise
+        except BaseException:
+            self.record(time.perf_counter() - start_time, True)
+            raise
+        self.record(time.perf_counter() - start_time, self.failed_result is not None and self.failed_result(result))
+        return result
+
+    def _release(self):
+        """Give back an admitted call's probe slot without recording an outcome"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def _open(self, now, reason):
+        self._opened_at = now
+        self.times_opened += 1
+        self._set_state(OPEN)
+        logging.warning(f"{self.name} circuit opened for {self.open_seconds:g}s: {reason}")
+
+    def _set_state(self, state):
+        if state != self.state:
+            if state != OPEN:
+                logging.warning(f"{self.name} circuit {state.replace('_', '-')}")
+            self.state = state
+
+    def stats(self):
+        """Return the state, the recent error and slow-call rates and lifetime counters"""
+        with self._lock:
+            count = len(self._outcomes)
+            state = self.state
+            if state == OPEN and time.monotonic() >= self._opened_at + self.open_seconds:
+                state = HALF_OPEN
+            return {
+                'state': state,
+                'recent_calls': count,
+                'recent_failure_rate': round(sum(outcome[1] for outcome in self._outcomes) / count, 4) if count else 0.0,
+                'recent_slow_rate': round(sum(outcome[2] for outcome in self._outcomes) / count, 4) if count else 0.0,
+                'calls': self.calls,
+                'failures': self.failures,
+                'slow_calls': self.slow_calls,
+                'short_circuited': self.short_circuited,
+                'times_opened': self.times_opened
+            }
+
+
+class RetryPolicy:
+    """
+    Retries transient upstream errors with full-jitter exponential backoff
+
+    Attempt n waits a random time between 0 and min(max_delay,
+    base_delay * 2 ** n), so callers that failed together do not retry in
+    lockstep. Every attempt goes through the breaker, and an open breaker
+    ends the retries.
+    """
+
+    def __init__(self, attempts=2, base_delay=0.25, max_delay=2.0, retryable=None):
+        """
+        Args:
+            attempts (int): Total attempts, including the first
+            base_delay (float): Backoff cap of the first retry, in seconds
+            max_delay (float): Largest backoff, in seconds
+            retryable (callable): Decides whether an exception is worth retrying (default: all)
+        """
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable or (lambda error: True)
+        self.retries = 0
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number attempt (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _should_retry(self, attempt, error):
+        if isinstance(error, CircuitOpenError) or attempt + 1 >= self.attempts or not self.retryable(error):
+            return False
+        self.retries += 1
+        return True
+
+    def call(self, breaker, fn, *args, **kwargs):
+        """
+        Call fn through breaker, retrying transient errors
+
+        Raises:
+            CircuitOpenError: The breaker is (or became) open
+            Exception: fn's last error once retries are exhausted or not worth it
+        """
+        for attempt in range(self.attempts):
+            try:
+                return breaker.call(fn, *args, **kwargs)
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(f"{breaker.name} call failed, retrying in {delay * 1000:.0f} ms: {str(e)}")
+                time.sleep(delay)
+
+    async def call_async(self, breaker, coroutine_fn, *args, **kwargs):
+        """Async version of call"""
+        for attempt in range(self.attempts):
+            try:
+                return await breaker.call_async(coroutine_fn, *args, **kwargs)
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(f"{breaker.name} call failed, retrying in {delay * 1000:.0f} ms: {str(e)}")
+                await asyncio.sleep(delay)
@@ -0,0 +1,128 @@
+import json
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+gif_catalog_cli = AppGroup('gif-catalog', help="Manage the local GIF catalog")
+emotion_records_cli = AppGroup('emotion-records', help="Maintain stored EmotionRecord history")
+
+
+def register_commands(app):
+    """Attach the CLI commands to an app"""
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(gif_catalog_cli)
+    app.cli.add_command(emotion_records_cli)
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create missing tables, columns and indexes"""
+    from schema import init_db
+
+    changes = init_db()
+    for change in changes:
+        click.echo(f"  {change}")
+    click.echo(f"Database schema is up to date ({len(changes)} changes)")
+
+
+@gif_catalog_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--emotion', 'emotions', multiple=True, help='Emotion the GIFs map to (repeatable)')
+@click.option('--tag', 'tags', multiple=True, help='Extra tag for every GIF (repeatable)')
+def import_gifs(path, emotions, tags):
+    """
+    Import GIFs from a saved Giphy response (JSON)
+
+    PATH holds either a Giphy search response ({"data": [...]}) or a plain
+    list of GIF objects. GIF objects may carry their own "emotions" list.
+    """
+    from gif_catalog import parse_giphy_gif, upsert_gifs
+
+    with open(path) as f:
+        payload = json.load(f)
+    gifs = payload.get('data', []) if isinstance(payload, dict) else payload
+
+    entries = [
+        parse_giphy_gif(gif, tags=tags, emotions=list(emotions) + list(gif.get('emotions') or []))
+        for gif in gifs
+    ]
+    skipped = sum(1 for entry in entries if entry is None)
+    added = upsert_gifs(entries, source='import')
+
+    click.echo(f"Imported {len(gifs)} GIFs: {added} new, {len(gifs) - added - skipped} merged, {skipped} skipped")
+
+
+@gif_catalog_cli.command('stats')
+def catalog_stats():
+    """Show catalog size per emotion"""
+    from sqlalchemy import func
+    from app import db
+    from models import GifCatalog, GifEmotion
+
+    total = db.session.query(func.count(GifCatalog.id)).scalar()
+    click.echo(f"{total} GIFs")
+    rows = db.session.query(GifEmotion.emotion, func.count(GifEmotion.id)).group_by(GifEmotion.emotion).all()
+    for emotion, count in sorted(rows, key=lambda row: -row[1]):
+        click.echo(f"  {emotion}: {count}")
+
+
+@emotion_records_cli.command('backfill')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='Rows per query and bulk UPDATE')
+@click.option('--engine', 'sentiment_engine', type=click.Choice(['textblob', 'lexicon']), default=None,
+              help='Sentiment engine (default: SENTIMENT_ENGINE)')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default=None,
+              help='Progress file (default: emotion-backfill.json in the instance folder)')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and start from the first row')
+@click.option('--end-id', type=int, default=None, help='Stop after this record id')
+def backfill_emotions(workers, chunk_size, sentiment_engine, checkpoint, restart, end_id):
+    """
+    Re-run EmotionAnalyzer over stored records and update their emotion fields
+
+    Safe to interrupt: a rerun resumes after the last checkpointed chunk.
+    """
+    from app import db
+    from backfill import EmotionBackfill
+
+    if checkpoint is None:
+        os.makedirs(current_app.instance_path, exist_ok=True)
+        checkpoint = os.path.join(current_app.instance_path, 'emotion-backfill.json')
+
+    job = EmotionBackfill(db.session, checkpoint, workers=workers, chunk_size=chunk_size,
+                          sentiment_engine=sentiment_engine)
+    last_report = [0.0]
+
+    def report(state):
+        now = time.monotonic()
+        if now - last_report[0] >= 5:
+            last_report[0] = now
+            click.echo(f"  through id {state['last_id']}: {state['processed']} rows, "
+                       f"{state['changed']} changed, {state['rows_per_sec']} rows/sec")
+
+    state = job.run(resume=not restart, end_id=end_id, progress=report)
+    click.echo(f"Backfill done through id {state['last_id']}: {state['processed']} rows, "
+               f"{state['changed']} changed, {state.get('rows_per_sec', 0.0)} rows/sec with {job.workers} workers")
+    if state['changed']:
+        click.echo("Analytics rollups are now stale for the changed records; "
+                   "run `flask --app main emotion-records rebuild-rollups`")
+
+
+@emotion_records_cli.command('rebuild-rollups')
+@click.option('--start', type=click.DateTime(), default=None, help='First timestamp, UTC (default: oldest record)')
+@click.option('--end', type=click.DateTime(), default=None, help='Timestamp to stop before, UTC (default: now)')
+def rebuild_emotion_rollups(start, end):
+    """
+    Recompute the hourly and daily analytics rollups from stored records
+
+    The range is widened to whole days. Run it once after upgrading to fill
+    the rollups for existing records, and after a backfill.
+    """
+    from rollups import rebuild_rollups
+
+    result = rebuild_rollups(start, end)
+    click.echo(f"Rebuilt rollups {result['start']} - {result['end']}: "
+               f"{result['records']} records into {result['rows']} rollup rows")
@@ -0,0 +1,252 @@
+"""
+Server-side conversation context, keyed by the browser session key
+
+Recent messages used to live in the signed session cookie, which sent them
+back and forth on every request, hit the ~4 KB cookie limit with long
+messages, and let two tabs overwrite each other's context. The cookie now
+only carries the session key; the messages are kept here as compact
+{"sender", "text"} records, the last max_messages per conversation.
+
+Messages trimmed from a conversation are folded into a rolling summary,
+stored as a leading {"sender": "summary"} entry, which the prompt builder
+sends ahead of the verbatim messages.
+
+Appends are read-modify-write, so each one runs under a per-conversation
+lock (and, in the SQLite backend, in a BEGIN IMMEDIATE transaction so that
+other worker processes are excluded too). Concurrent turns of one
+conversation are each appended, in completion order; the lock is not held
+across the Gemini call, which would queue a user's tabs behind each other.
+"""
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from prompt_builder import SUMMARY_SENDER, fold_summary
+
+
+def compact_turn(message):
+    """Keep only what the prompt builder reads from a context message"""
+    return {'sender': 'user' if message.get('sender') == 'user' else 'bot', 'text': message.get('text', '')}
+
+
+class ContextStore:
+    """Base class: per-conversation locking and the get/append API backends share"""
+
+    def __init__(self, max_messages, summary_tokens=200):
+        """
+        Args:
+            max_messages (int): Messages kept per conversation
+            summary_tokens (int): Budget of the rolling summary of trimmed messages (0 disables it)
+        """
+        self.max_messages = max_messages
+        self.summary_tokens = summary_tokens
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.appends = 0
+        self.lock_waits = 0
+
+    @contextmanager
+    def lock(self, conversation_id):
+        """Hold the conversation's lock; the lock object lives only while someone uses it"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(conversation_id, [threading.Lock(), 0])
+            entry[1] += 1
+        if not entry[0].acquire(blocking=False):
+            # Counters are shared by every conversation, so they move under the guard, not the conversation's lock
+            with self._locks_guard:
+                self.lock_waits += 1
+            entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[conversation_id]
+
+    def get(self, conversation_id):
+        """
+        Recent messages of a conversation, oldest first
+
+        Args:
+            conversation_id (str): Session key
+
+        Returns:
+            list: {"sender", "text"} dicts, led by the summary entry if there is one
+        """
+        return self._load(conversation_id) or []
+
+    def append(self, conversation_id, messages):
+        """
+        Add messages to a conversation, keeping the last max_messages
+
+        Args:
+            conversation_id (str): Session key
+            messages (list): Context messages; only sender and text are kept
+
+        Returns:
+            list: The conversation's messages after the append
+        """
+        with self.lock(conversation_id):
+            with self._locks_guard:
+                self.appends += 1
+            return self._append(conversation_id, [compact_turn(message) for message in messages])
+
+    def seed(self, conversation_id, messages):
+        """Store messages for a conversation that has none yet, e.g. from a pre-upgrade session cookie"""
+        with self.lock(conversation_id):
+            if not self._load(conversation_id):
+                self._append(conversation_id, [compact_turn(message) for message in messages])
+
+    def _merge(self, stored, messages):
+        """Append messages to stored ones, folding what falls out of the window into the summary"""
+        summary = ''
+        if stored and stored[0].get('sender') == SUMMARY_SENDER:
+            summary, stored = stored[0]['text'], stored[1:]
+        merged = stored + messages
+        trimmed, merged = merged[:-self.max_messages], merged[-self.max_messages:]
+        if trimmed and self.summary_tokens:
+            summary = fold_summary(summary, trimmed, self.summary_tokens)
+        return ([{'sender': SUMMARY_SENDER, 'text': summary}] if summary else []) + merged
+
+    def stats(self):
+        return {'backend': self.backend, 'max_messages': self.max_messages,
+                'appends': self.appends, 'lock_waits': self.lock_waits}
+
+
+class MemoryContextStore(ContextStore):
+    """
+    In-process backend
+
+    Only suitable for a single worker process: other workers do not see the
+    context. Holds at most max_conversations, evicting the least recently used.
+    """
+    backend = 'memory'
+
+    def __init__(self, max_messages, max_conversations=10000, summary_tokens=200):
+        super().__init__(max_messages, summary_tokens)
+        self.max_conversations = max_conversations
+        self._conversations = OrderedDict()
+        self._guard = threading.Lock()
+        self.evictions = 0
+
+    def _load(self, conversation_id):
+        with self._guard:
+            messages = self._conversations.get(conversation_id)
+            if messages is not None:
+                self._conversations.move_to_end(conversation_id)
+            return list(messages) if messages else None
+
+    def _append(self, conversation_id, messages):
+        with self._guard:
+            stored = self._merge(self._conversations.get(conversation_id) or [], messages)
+            self._conversations[conversation_id] = stored
+            self._conversations.move_to_end(conversation_id)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+                self.evictions += 1
+            return list(stored)
+
+    def stats(self):
+        with self._guard:
+            return {**super().stats(), 'conversations': len(self._conversations), 'evictions': self.evictions}
+
+
+class SqliteContextStore(ContextStore):
+    """
+    SQLite backend shared by every worker process on the host
+
+    One row per conversation holding its messages as a JSON array, so a turn
+    costs one point read and one upsert. Conversations idle for longer than
+    ttl seconds are pruned now and then.
+    """
+    backend = 'sqlite'
+
+    PRUNE_EVERY = 500
+
+    def __init__(self, path, max_messages, ttl=7 * 86400, summary_tokens=200):
+        super().__init__(max_messages, summary_tokens)
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = itertools.count(1)  # atomic, unlike += on a shared counter
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS conversation_context ("
+            "conversation_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._connection().execute(
+            "CREATE INDEX IF NOT EXISTS ix_conversation_context_updated_at ON conversation_context (updated_at)"
+        )
+
+    def _connection(self):
+        """One connection per thread, in autocommit mode with explicit transactions"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _load(self, conversation_id):
+        row = self._connection().execute(
+            "SELECT messages FROM conversation_context WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _append(self, conversation_id, messages):
+        connection = self._connection()
+        # IMMEDIATE takes the write lock up front, so appends from other processes queue here
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            stored = self._merge(self._load(conversation_id) or [], messages)
+            connection.execute(
+                "INSERT INTO conversation_context (conversation_id, messages, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (conversation_id) DO UPDATE SET messages = excluded.messages, updated_at = excluded.updated_at",
+                (conversation_id, json.dumps(stored, separators=(',', ':')), time.time())
+            )
+            if next(self._writes) % self.PRUNE_EVERY == 0:
+                pruned = connection.execute(
+                    "DELETE FROM conversation_context WHERE updated_at < ?", (time.time() - self.ttl,)
+                ).rowcount
+                if pruned:
+                    logging.info(f"Pruned {pruned} idle conversation contexts")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return stored
+
+    def stats(self):
+        conversations = self._connection().execute("SELECT COUNT(*) FROM conversation_context").fetchone()[0]
+        return {**super().stats(), 'conversations': conversations}
+
+
+def create_context_store(instance_path):
+    """
+    Build the store selected by CONTEXT_STORE (`sqlite` or `memory`)
+
+    Args:
+        instance_path (str): App instance folder, home of the default SQLite file
+
+    Returns:
+        ContextStore: The configured backend
+    """
+    max_messages = int(os.environ.get("CONTEXT_MAX_MESSAGES", 10))
+    summary_tokens = int(os.environ.get("GEMINI_SUMMARY_TOKENS", 200))
+    backend = os.environ.get("CONTEXT_STORE", "sqlite").lower()
+    if backend == 'memory':
+        return MemoryContextStore(max_messages, int(os.environ.get("CONTEXT_STORE_MAX_CONVERSATIONS", 10000)),
+                                  summary_tokens=summary_tokens)
+    if backend != 'sqlite':
+        logging.warning(f"Unknown CONTEXT_STORE {backend}, using sqlite")
+    path = os.environ.get("CONTEXT_STORE_PATH") or os.path.join(instance_path, 'conversation-context.db')
+    return SqliteContextStore(path, max_messages, float(os.environ.get("CONTEXT_STORE_TTL", 7 * 86400)),
+                              summary_tokens=summary_tokens)
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict, deque
+
+
+class ConversationMemory:
+    """
+    Thread-safe per-conversation memory of recent turns
+
+    Each conversation keeps its last max_turns turns in a fixed-size ring
+    buffer (a deque with maxlen), so adding a turn never copies the history.
+    At most max_conversations are held; the least recently active one is
+    evicted to make room, which bounds total memory at
+    max_conversations * max_turns turns.
+    """
+
+    def __init__(self, max_turns=10, max_conversations=10000):
+        self.max_turns = max_turns
+        self.max_conversations = max_conversations
+        self._conversations = OrderedDict()  # conversation id -> deque of turns
+        self._lock = threading.Lock()
+        self._turns = 0  # turns held across all conversations
+
+        self.appends = 0
+        self.evictions = 0
+
+    def append(self, conversation_id, turn):
+        """
+        Record a turn, making the conversation the most recently active
+
+        Args:
+            conversation_id (str): Conversation (session) key
+            turn (dict): Turn to remember
+        """
+        with self._lock:
+            turns = self._conversations.get(conversation_id)
+            if turns is None:
+                turns = self._conversations[conversation_id] = deque(maxlen=self.max_turns)
+                while len(self._conversations) > self.max_conversations:
+                    _, evicted = self._conversations.popitem(last=False)
+                    self._turns -= len(evicted)
+                    self.evictions += 1
+            else:
+                self._conversations.move_to_end(conversation_id)
+            if len(turns) < self.max_turns:
+                self._turns += 1
+            turns.append(turn)
+            self.appends += 1
+
+    def get(self, conversation_id):
+        """
+        Recent turns of a conversation, oldest first
+
+        Args:
+            conversation_id (str): Conversation (session) key
+
+        Returns:
+            list: Copy of the remembered turns (empty if unknown or evicted)
+        """
+        with self._lock:
+            turns = self._conversations.get(conversation_id)
+            return list(turns) if turns is not None else []
+
+    def forget(self, conversation_id):
+        """Drop a conversation's turns"""
+        with self._lock:
+            turns = self._conversations.pop(conversation_id, None)
+            if turns is not None:
+                self._turns -= len(turns)
+
+    def __len__(self):
+        return len(self._conversations)
+
+    def stats(self):
+        """Return occupancy and eviction counters"""
+        with self._lock:
+            return {
+                'conversations': len(self._conversations),
+                'max_conversations': self.max_conversations,
+                'turns': self._turns,
+                'max_turns': self.max_turns,
+                'occupancy': round(self._turns / (self.max_conversations * self.max_turns), 4),
+                'appends': self.appends,
+                'evictions': self.evictions
+            }
@@ -1,13 +1,23 @@
-from textblob import TextBlob
+import os
 import re
 import logging
 
+from keyword_matcher import KeywordMatcher
+from sentiment_engine import default_sentiment
+
 class EmotionAnalyzer:
     """
-    Emotion detection and analysis using TextBlob and keyword matching
+    Emotion detection and analysis using sentiment scoring and keyword matching
     """
     
-    def __init__(self):
+    def __init__(self, sentiment_engine=None):
+        """
+        Args:
+            sentiment_engine (str): 'textblob' (default) or 'lexicon' for the
+                vectorized LexiconSentiment scorer (SENTIMENT_ENGINE)
+        """
+        self.sentiment_engine = (sentiment_engine or os.environ.get("SENTIMENT_ENGINE", "textblob")).lower()
+        
         # Define emotion keywords and their opposites
         self.emotion_keywords = {
             'sad': ['sad', 'depressed', 'down', 'blue', 'melancholy', 'gloomy', 'dejected', 'miserable'],
@@ -47,6 +57,10 @@ class EmotionAnalyzer:
             'positive': ['positive', 'good vibes', 'optimism', 'sunshine', 'rainbow'],
             'uplifted': ['uplifting', 'inspiration', 'motivation', 'encouragement']
         }
+        
+        # Built from emotion_keywords on first use; see compile_keywords
+        self._matcher = None
+        self._keyword_emotions = None
     
     def analyze(self, text):
         """
@@ -58,13 +72,56 @@ class EmotionAnalyzer:
         Returns:
             dict: Analysis results including emotion, sentiment score, and opposite emotion
         """
+        result = self._analyze(text)
+        logging.info(f"Emotion analysis: {result['emotion']} -> {result['opposite_emotion']} (sentiment: {result['sentiment_score']})")
+        return result
+    
+    def analyze_many(self, texts):
+        """
+        Analyze a batch of texts, e.g. for backfills or offline evaluation
+        
+        Args:
+            texts (iterable): User input texts
+            
+        Returns:
+            list: One analyze() result per text, in order
+        """
+        texts = list(texts)
+        try:
+            # One vectorized pass for the whole batch with the lexicon engine
+            scores = self.sentiment_scores([self._preprocess_text(text) for text in texts])
+        except Exception as e:
+            logging.error(f"Error in batch sentiment scoring: {str(e)}")
+            scores = [None] * len(texts)
+        results = [self._analyze(text, score) for text, score in zip(texts, scores)]
+        logging.info(f"Emotion analysis batch: {len(results)} texts")
+        return results
+    
+    def sentiment_scores(self, texts):
+        """
+        Sentiment polarity (-1.0 to 1.0) of preprocessed texts with the selected engine
+        
+        Args:
+            texts (list): Preprocessed texts
+            
+        Returns:
+            list: One float per text
+        """
+        if self.sentiment_engine == 'lexicon':
+            return default_sentiment().score_many(texts).tolist()
+        
+        # Imported here: TextBlob is slow to import and unused by the lexicon engine
+        from textblob import TextBlob
+        return [TextBlob(text).sentiment.polarity for text in texts]
+    
+    def _analyze(self, text, sentiment_score=None):
+        """analyze() without the per-call log line, optionally with a precomputed sentiment score"""
         try:
             # Clean and preprocess text
             cleaned_text = self._preprocess_text(text)
             
-            # Use TextBlob for sentiment analysis
-            blob = TextBlob(cleaned_text)
-            sentiment_score = blob.sentiment.polarity
+            if sentiment_score is None:
+                sentiment_score = self.sentiment_scores([cleaned_text])[0]
             
             # Detect specific emotion through keyword matching
             detected_emotion = self._detect_emotion_keywords(cleaned_text)
@@ -79,8 +136,6 @@ class EmotionAnalyzer:
             # Get opposite emotion
             opposite_emotion = self.opposite_emotions.get(detected_emotion, 'positive')
             
-            logging.info(f"Emotion analysis: {detected_emotion} -> {opposite_emotion} (sentiment: {sentiment_score})")
-            
             return {
                 'emotion': detected_emotion,
                 'sentiment_score': sentiment_score,
@@ -105,20 +160,33 @@ class EmotionAnalyzer:
         text = re.sub(r'\s+', ' ', text).strip()
         return text
     
-    def _detect_emotion_keywords(self, text):
-        """Detect emotion based on keyword matching"""
-        emotion_scores = {}
+    def compile_keywords(self):
+        """
+        Compile emotion_keywords into one multi-keyword automaton
         
+        Called automatically on first use; call again after changing
+        emotion_keywords.
+        """
+        keyword_emotions = {}
         for emotion, keywords in self.emotion_keywords.items():
-            score = 0
             for keyword in keywords:
-                if keyword in text:
-                    # Give higher weight to exact matches
-                    if f" {keyword} " in f" {text} ":
-                        score += 2
-                    else:
-                        score += 1
-            emotion_scores[emotion] = score
+                keyword_emotions.setdefault(keyword, []).append(emotion)
+        self._matcher = KeywordMatcher(keyword_emotions)
+        # Same order as the matcher's keyword indexes; an emotion listed twice
+        # for one keyword scores it twice
+        self._keyword_emotions = [keyword_emotions[keyword] for keyword in self._matcher.keywords]
+    
+    def _detect_emotion_keywords(self, text):
+        """Detect emotion based on keyword matching"""
+        if self._matcher is None:
+            self.compile_keywords()
+        
+        emotion_scores = dict.fromkeys(self.emotion_keywords, 0)
+        
+        # Give higher weight to exact (whole-word) matches
+        for index, score in self._matcher.match_scores(text).items():
+            for emotion in self._keyword_emotions[index]:
+                emotion_scores[emotion] += score
         
         # Return the emotion with the highest score
         if emotion_scores and max(emotion_scores.values()) > 0:
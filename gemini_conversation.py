@@ -1,12 +1,25 @@
+import asyncio
 import json
 import logging
 import os
-from typing import Dict, List, Optional, Tuple
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
+import httpx
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 from pydantic import BaseModel
 
+from circuit_breaker import CircuitBreaker, CircuitOpenError, RetryPolicy
+from conversation_memory import ConversationMemory
+from prompt_builder import PromptBuilder, SystemPromptCache
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
+
 
 class EmotionAnalysis(BaseModel):
     emotion: str
@@ -18,10 +31,85 @@ class EmotionAnalysis(BaseModel):
 
 class ConversationResponse(BaseModel):
     response: str
-    emotion_detected: str
-    supportive_tone: str
-    gif_search_terms: List[str]
-    conversation_continues: bool
+    emotion: str
+    intensity: float
+    context: str
+    gif_keywords: List[str]
+    conversation_tone: str
+
+
+DEFAULT_EMOTION_DATA = {
+    "emotion": "neutral",
+    "intensity": 0.5,
+    "context": "general conversation",
+    "gif_keywords": ["uplifting", "positive", "smile"],
+    "conversation_tone": "supportive"
+}
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+TRANSIENT_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+# HTTP statuses of a request whose cached_content is invalid, inaccessible or expired
+CACHE_ERROR_STATUS_CODES = (400, 403, 404)
+
+_APOSTROPHE_RE = re.compile(r"['\u2019]")
+
+
+def normalize_message(text: str) -> str:
+    """
+    Fold case, whitespace and punctuation so trivially different messages match
+    
+    "I'm tired!!" and "im  tired" both become "im tired". Only Unicode
+    punctuation (categories P*) is folded: emoji and other symbols carry
+    emotion, so "i'm tired 😂" and "i'm tired 😢" keep different keys.
+    Messages that are only punctuation keep it, so they do not all collapse
+    to the same key.
+    """
+    lowered = _APOSTROPHE_RE.sub("", text.lower())
+    folded = "".join(" " if unicodedata.category(char).startswith("P") else char for char in lowered)
+    return " ".join(folded.split()) or " ".join(text.lower().split())
+
+
+# Positive opposite of each detected emotion. Every path that stores a turn
+# (Gemini, the local fallback, the emotion backfill) maps through this, so
+# history and rollups use one vocabulary.
+OPPOSITE_EMOTIONS = {
+    'sad': 'joyful',
+    'angry': 'peaceful',
+    'anxious': 'calm',
+    'lonely': 'connected',
+    'tired': 'energized',
+    'confused': 'clear',
+    'frustrated': 'satisfied',
+    'disappointed': 'hopeful',
+    'overwhelmed': 'balanced',
+    'depressed': 'uplifted',
+    'stressed': 'relaxed',
+    'worried': 'confident',
+    'fearful': 'brave',
+    'guilty': 'forgiven',
+    'ashamed': 'proud',
+    'hurt': 'healing',
+    'rejected': 'accepted',
+    'helpless': 'empowered'
+}
+
+
+def get_opposite_emotion(emotion: str) -> str:
+    """Positive opposite of an emotion, 'positive' for ones without a mapping"""
+    return OPPOSITE_EMOTIONS.get(emotion.lower(), 'positive')
+
+
+def is_cache_error(error: Exception) -> bool:
+    """Whether a failed Gemini call was rejected over the context cache it referenced (bad, forbidden or expired)"""
+    return isinstance(error, errors.ClientError) and error.code in CACHE_ERROR_STATUS_CODES
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed Gemini call is worth retrying: timeouts, rate limits, server and connection errors"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in TRANSIENT_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
 
 
 class GeminiConversationAI:
@@ -29,11 +117,73 @@ class GeminiConversationAI:
     Advanced conversational AI using Gemini for emotional support and context-aware responses
     """
     
-    def __init__(self):
-        self.client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
-        self.conversation_history = []
+    def __init__(self, single_call: Optional[bool] = None):
+        self.client = genai.Client(
+            api_key=os.environ.get("GEMINI_API_KEY"),
+            http_options=types.HttpOptions(
+                timeout=int(float(os.environ.get("GEMINI_TIMEOUT_SECONDS", 30)) * 1000),
+                # e.g. the local stand-in in benchmarks/fake_upstreams.py
+                base_url=os.environ.get("GEMINI_BASE_URL") or None
+            )
+        )
+        
+        # Every Gemini call goes through a circuit breaker. While it is open,
+        # turns are answered at once by the local pipeline (EmotionAnalyzer
+        # and TherapeuticTools) instead of waiting on a failing upstream.
+        self.breaker = CircuitBreaker.from_env("gemini", "GEMINI", slow_seconds=10.0)
+        self.retry_policy = RetryPolicy(
+            attempts=int(os.environ.get("GEMINI_RETRY_ATTEMPTS", 2)),
+            retryable=is_transient_error
+        )
+        self._local_pipeline = None
+        self._local_lock = threading.Lock()
+        self.local_replies = 0
+        
+        # Single structured call per turn instead of reply + analysis calls.
+        # GEMINI_SINGLE_CALL lets the two modes be A/B tested per deployment.
+        if single_call is None:
+            single_call = os.environ.get("GEMINI_SINGLE_CALL", "false").lower() in ("1", "true", "yes")
+        self.single_call = single_call
+        
+        # Runs the emotion analysis alongside a streamed reply
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="gemini-analysis")
+        
+        # The EmotionAnalysis call runs at temperature 0.3, so repeats of short
+        # messages ("hi", "i'm tired") get the same answer; cache it per
+        # normalized message text
+        self.analysis_cache = TTLCache(
+            maxsize=int(os.environ.get("GEMINI_ANALYSIS_CACHE_SIZE", 4096)),
+            ttl=float(os.environ.get("GEMINI_ANALYSIS_CACHE_TTL", 21600))
+        )
+        self._analysis_latency = None  # moving average of uncached calls, seconds
+        self.analysis_saved_seconds = 0.0
+        self._analysis_stats_lock = threading.Lock()
+        # Identical messages analysed at the same moment share one uncached call
+        self.analysis_flight = SingleFlight()
+        # Recent turns per conversation, bounded by LRU eviction of idle ones
+        self.conversation_memory = ConversationMemory(
+            max_turns=int(os.environ.get("CONVERSATION_MEMORY_TURNS", 10)),
+            max_conversations=int(os.environ.get("CONVERSATION_MEMORY_MAX_CONVERSATIONS", 10000))
+        )
         self.user_context = {}
         
+        # Prior turns are sent within a token budget, older ones as a rolling summary
+        self.prompt_builder = PromptBuilder(
+            budget_tokens=int(os.environ.get("GEMINI_PROMPT_TOKEN_BUDGET", 1500)),
+            message_tokens=int(os.environ.get("GEMINI_MESSAGE_TOKEN_LIMIT", 600)),
+            summary_tokens=int(os.environ.get("GEMINI_SUMMARY_TOKENS", 200)),
+            max_messages=int(os.environ.get("GEMINI_CONTEXT_MESSAGES", 6))
+        )
+        
+        # The system prompts never change, so they go in an upstream context cache when the API allows it.
+        # gemini-2.5-flash only caches 1024+ tokens; the current prompts are shorter and are sent inline.
+        self.system_prompt_cache = SystemPromptCache(
+            model="gemini-2.5-flash",
+            ttl=float(os.environ.get("GEMINI_CONTEXT_CACHE_TTL", 3600)),
+            enabled=os.environ.get("GEMINI_CONTEXT_CACHE", "true").lower() in ("1", "true", "yes"),
+            min_tokens=int(os.environ.get("GEMINI_CONTEXT_CACHE_MIN_TOKENS", 1024))
+        )
+        
         # Emotional support system prompt
         self.system_prompt = """You are MoodMorph, a warm, empathetic AI companion designed to provide emotional support and help transform negative emotions into positive ones. Your personality is that of a caring friend who:
 
@@ -62,6 +212,19 @@ EMOTIONAL SUPPORT APPROACH:
 
 IMPORTANT: Always analyze the user's emotional state ."""
 
+        # Extra instructions for single-call mode, where the reply and the
+        # emotion analysis come back together as one ConversationResponse
+        self.single_call_instructions = """
+
+OUTPUT FORMAT:
+Respond only with valid JSON containing:
+- "response": your conversational reply to the user
+- "emotion": the user's primary emotion (sad, angry, anxious, lonely, tired, confused, happy, excited, neutral)
+- "intensity": emotion intensity from 0.0 to 1.0
+- "context": brief context of what they're dealing with
+- "gif_keywords": 3-5 specific keywords for finding helpful GIFs (be creative - think about what would genuinely help this person feel better)
+- "conversation_tone": overall conversation tone (supportive, encouraging, calming, energizing, etc.)"""
+
     def analyze_emotion_and_respond(self, user_message: str, conversation_context: Optional[List[Dict]] = None) -> Dict:
         """
         Analyze user emotion and generate a supportive conversational response
@@ -73,32 +236,273 @@ IMPORTANT: Always analyze the user's emotional state ."""
         Returns:
             Dict containing response, emotion analysis, and GIF keywords
         """
+        start_time = time.perf_counter()
+        mode = "single-call" if self.single_call else "two-call"
         try:
-            # Build conversation context
-            context_messages = []
-            if conversation_context:
-                for msg in conversation_context[-6:]:  # Last 6 messages for context
-                    role = "user" if msg.get("sender") == "user" else "model"
-                    context_messages.append(types.Content(role=role, parts=[types.Part(text=msg.get("text", ""))]))
-            
-            # Add current user message
-            context_messages.append(types.Content(role="user", parts=[types.Part(text=user_message)]))
-            
-            # First, analyze emotion and get response
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=context_messages,
-                config=types.GenerateContentConfig(
-                    system_instruction=self.system_prompt,
-                    temperature=0.8,
-                    max_output_tokens=1050
-                )
-            )
+            if not self.breaker.available():
+                mode = "local, Gemini circuit open"
+                return self._local_result(user_message)
             
-            conversational_response = response.text if response.text else "I'm here for you. Tell me more about what's on your mind."
+            context_messages, estimated_tokens = self.prompt_builder.build(user_message, conversation_context)
             
-            # Then analyze emotion and get GIF keywords
-            emotion_analysis_prompt = f"""
+            if self.single_call:
+                conversational_response, emotion_data = self._respond_single_call(context_messages, estimated_tokens)
+            else:
+                conversational_response, emotion_data = self._respond_two_calls(user_message, context_messages, estimated_tokens)
+            
+            return self._build_result(conversational_response, emotion_data)
+            
+        except Exception as e:
+            logging.error(f"Error in Gemini conversation: {str(e)}")
+            return self._local_result(user_message)
+        finally:
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            logging.info(f"Gemini turn ({mode}) took {elapsed_ms:.0f} ms")
+    
+    async def analyze_emotion_and_respond_async(self, user_message: str, conversation_context: Optional[List[Dict]] = None) -> Dict:
+        """
+        Async version of analyze_emotion_and_respond using the genai async client
+        
+        In two-call mode the reply and the emotion analysis do not depend on each
+        other, so both requests are issued concurrently while the breaker is
+        closed. Otherwise the reply goes first as the half-open probe, and the
+        analysis follows once it has closed the breaker.
+        
+        Args:
+            user_message: The user's current message
+            conversation_context: Previous messages for context
+            
+        Returns:
+            Dict containing response, emotion analysis, and GIF keywords
+        """
+        start_time = time.perf_counter()
+        mode = "single-call" if self.single_call else "two-call"
+        try:
+            if not self.breaker.available():
+                mode = "local, Gemini circuit open"
+                return await asyncio.to_thread(self._local_result, user_message)
+            
+            context_messages, estimated_tokens = self.prompt_builder.build(user_message, conversation_context)
+            
+            if self.single_call:
+                response = await self._generate_async(context_messages, self._single_call_config, self._single_call_instruction(), estimated_tokens)
+                conversational_response, emotion_data = self._parse_single_call(response)
+            else:
+                reply = self._generate_async(context_messages, self._reply_config, self.system_prompt, estimated_tokens)
+                if self.breaker.closed():
+                    response, emotion_data = await asyncio.gather(reply, self._analyze_emotion_async(user_message))
+                else:
+                    # A half-open breaker admits one probe; a second concurrent call would be refused
+                    response = await reply
+                    emotion_data = await self._analyze_emotion_async(user_message)
+                conversational_response = response.text if response.text else "I'm here for you. Tell me more about what's on your mind."
+            
+            return self._build_result(conversational_response, emotion_data)
+            
+        except Exception as e:
+            logging.error(f"Error in Gemini conversation (async): {str(e)}")
+            return await asyncio.to_thread(self._local_result, user_message)
+        finally:
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            logging.info(f"Gemini turn ({mode}, async) took {elapsed_ms:.0f} ms")
+    
+    def stream_emotion_and_respond(self, user_message: str, conversation_context: Optional[List[Dict]] = None) -> Iterator[Dict]:
+        """
+        Stream the conversational reply as it is generated, then the emotion analysis
+        
+        The reply always comes from a streamed free-text call; the EmotionAnalysis
+        call runs concurrently so it is usually ready when the reply finishes.
+        When the breaker is half-open the reply is the probe, and the analysis
+        only starts after it.
+        
+        Args:
+            user_message: The user's current message
+            conversation_context: Previous messages for context
+            
+        Yields:
+            {"type": "token", "text": ...} for each reply chunk, then one
+            {"type": "analysis", "result": ...} with the same dict that
+            analyze_emotion_and_respond returns
+        """
+        start_time = time.perf_counter()
+        first_token_ms = None
+        analysis_future = None
+        chunks = []
+        try:
+            if not self.breaker.available():
+                result = self._local_result(user_message)
+                yield {"type": "token", "text": result["response"]}
+                yield {"type": "analysis", "result": result}
+                return
+            
+            context_messages, estimated_tokens = self.prompt_builder.build(user_message, conversation_context)
+            if self.breaker.closed():
+                analysis_future = self._executor.submit(self._analyze_emotion, user_message)
+            
+            usage = None
+            for chunk in self._generate_stream(context_messages):
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.text:
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - start_time) * 1000
+                    chunks.append(chunk.text)
+                    yield {"type": "token", "text": chunk.text}
+            self._log_usage("reply (streaming)", usage, estimated_tokens, time.perf_counter() - start_time)
+            
+            conversational_response = "".join(chunks)
+            if not conversational_response:
+                conversational_response = "I'm here for you. Tell me more about what's on your mind."
+                yield {"type": "token", "text": conversational_response}
+            
+            emotion_data = analysis_future.result() if analysis_future is not None else self._analyze_emotion(user_message)
+            yield {"type": "analysis", "result": self._build_result(conversational_response, emotion_data)}
+            
+        except Exception as e:
+            logging.error(f"Error in Gemini streaming conversation: {str(e)}")
+            if analysis_future is not None:
+                analysis_future.cancel()
+            result = self._local_result(user_message)
+            if chunks:
+                result["response"] = "".join(chunks)
+            else:
+                yield {"type": "token", "text": result["response"]}
+            yield {"type": "analysis", "result": result}
+        finally:
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            first_token = f", first token after {first_token_ms:.0f} ms" if first_token_ms is not None else ""
+            logging.info(f"Gemini turn (streaming) took {elapsed_ms:.0f} ms{first_token}")
+    
+    def _single_call_instruction(self) -> str:
+        """System instruction of the combined reply + emotion analysis call"""
+        return self.system_prompt + self.single_call_instructions
+    
+    def _reply_config(self, cache_name: Optional[str] = None):
+        """Generation config for the free-text conversational reply"""
+        if cache_name:
+            return types.GenerateContentConfig(cached_content=cache_name, temperature=0.8, max_output_tokens=1050)
+        return types.GenerateContentConfig(
+            system_instruction=self.system_prompt,
+            temperature=0.8,
+            max_output_tokens=1050
+        )
+    
+    def _single_call_config(self, cache_name: Optional[str] = None):
+        """Generation config for the combined reply + emotion analysis call"""
+        return types.GenerateContentConfig(
+            **({"cached_content": cache_name} if cache_name else {"system_instruction": self._single_call_instruction()}),
+            response_mime_type="application/json",
+            response_schema=ConversationResponse,
+            temperature=0.8,
+            max_output_tokens=1200
+        )
+    
+    def _generate(self, contents: List, config_factory, instruction: str, estimated_tokens: int):
+        """
+        Reply call with the system prompt taken from the context cache when there is one
+        
+        A call rejected over the cache it references (400, 403 or 404) is
+        retried once with the system prompt inline, and the cache is dropped.
+        Other errors (timeouts, outages) say nothing about the cache and are
+        raised as they are.
+        """
+        start_time = time.perf_counter()
+        cache_name = self.system_prompt_cache.cache_name(self.client, instruction)
+        try:
+            response = self._call(
+                self.client.models.generate_content,
+                model="gemini-2.5-flash", contents=contents, config=config_factory(cache_name)
+            )
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if cache_name is None or not is_cache_error(e):
+                raise
+            logging.warning(f"Gemini call with cached system prompt rejected, retrying inline: {str(e)}")
+            self.system_prompt_cache.invalidate(cache_name)
+            response = self._call(
+                self.client.models.generate_content,
+                model="gemini-2.5-flash", contents=contents, config=config_factory(None)
+            )
+        self._log_usage("reply", getattr(response, "usage_metadata", None), estimated_tokens, time.perf_counter() - start_time)
+        return response
+    
+    async def _generate_async(self, contents: List, config_factory, instruction: str, estimated_tokens: int):
+        """Async version of _generate"""
+        start_time = time.perf_counter()
+        if self.system_prompt_cache.is_fresh(instruction):
+            cache_name = self.system_prompt_cache.cache_name(self.client, instruction)
+        else:
+            # Creating the cache is a blocking API call
+            cache_name = await asyncio.to_thread(self.system_prompt_cache.cache_name, self.client, instruction)
+        try:
+            response = await self._call_async(
+                self.client.aio.models.generate_content,
+                model="gemini-2.5-flash", contents=contents, config=config_factory(cache_name)
+            )
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if cache_name is None or not is_cache_error(e):
+                raise
+            logging.warning(f"Gemini call with cached system prompt rejected, retrying inline: {str(e)}")
+            self.system_prompt_cache.invalidate(cache_name)
+            response = await self._call_async(
+                self.client.aio.models.generate_content,
+                model="gemini-2.5-flash", contents=contents, config=config_factory(None)
+            )
+        self._log_usage("reply (async)", getattr(response, "usage_metadata", None), estimated_tokens, time.perf_counter() - start_time)
+        return response
+    
+    def _generate_stream(self, contents: List) -> Iterator:
+        """Streamed reply chunks; falls back to an inline system prompt if the cache is rejected before the first chunk"""
+        cache_name = self.system_prompt_cache.cache_name(self.client, self.system_prompt)
+        try:
+            stream, first_chunk = self._call(self._start_stream, contents, cache_name)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if cache_name is None or not is_cache_error(e):
+                raise
+            logging.warning(f"Gemini stream with cached system prompt rejected, retrying inline: {str(e)}")
+            self.system_prompt_cache.invalidate(cache_name)
+            stream, first_chunk = self._call(self._start_stream, contents, None)
+        if first_chunk is not None:
+            yield first_chunk
+            yield from stream
+    
+    def _start_stream(self, contents: List, cache_name: Optional[str]) -> Tuple[Iterator, object]:
+        """Open a reply stream and wait for its first chunk, so the breaker judges time to first token"""
+        stream = iter(self.client.models.generate_content_stream(
+            model="gemini-2.5-flash", contents=contents, config=self._reply_config(cache_name)
+        ))
+        return stream, next(stream, None)
+    
+    def _call(self, fn, *args, **kwargs):
+        """One Gemini API call through the circuit breaker, retrying transient errors with jittered backoff"""
+        return self.retry_policy.call(self.breaker, fn, *args, **kwargs)
+    
+    async def _call_async(self, coroutine_fn, *args, **kwargs):
+        """Async version of _call"""
+        return await self.retry_policy.call_async(self.breaker, coroutine_fn, *args, **kwargs)
+    
+    def _log_usage(self, label: str, usage, estimated_tokens: int, elapsed: float):
+        """Log the estimated and reported input tokens and the latency of one reply call"""
+        input_tokens = getattr(usage, "prompt_token_count", None)
+        cached_tokens = getattr(usage, "cached_content_token_count", None)
+        if input_tokens is not None:
+            self.prompt_builder.record_usage(input_tokens, cached_tokens)
+        logging.info(
+            f"Gemini {label}: ~{estimated_tokens} prompt tokens besides the system prompt, "
+            f"{input_tokens} input tokens reported ({cached_tokens or 0} cached), {elapsed * 1000:.0f} ms"
+        )
+    
+    def prompt_stats(self) -> Dict:
+        """Prompt budget and system prompt cache counters"""
+        return {**self.prompt_builder.stats(), "system_prompt_cache": self.system_prompt_cache.stats()}
+    
+    def _emotion_analysis_request(self, user_message: str) -> Tuple[List, types.GenerateContentConfig]:
+        """Contents and config for the standalone EmotionAnalysis call"""
+        emotion_analysis_prompt = f"""
             Analyze this message for emotional content: "{user_message}"
             
             Based on the emotional state, provide:
@@ -117,73 +521,200 @@ IMPORTANT: Always analyze the user's emotional state ."""
                 "conversation_tone": "tone"
             }}
             """
+        contents = [types.Content(role="user", parts=[types.Part(text=emotion_analysis_prompt)])]
+        config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=EmotionAnalysis,
+            temperature=0.3
+        )
+        return contents, config
+    
+    def _respond_two_calls(self, user_message: str, context_messages: List, estimated_tokens: int) -> Tuple[str, Dict]:
+        """Original path: one call for the reply, a second for the emotion analysis"""
+        response = self._generate(context_messages, self._reply_config, self.system_prompt, estimated_tokens)
+        
+        conversational_response = response.text if response.text else "I'm here for you. Tell me more about what's on your mind."
+        
+        emotion_data = self._analyze_emotion(user_message)
+        return conversational_response, emotion_data
+    
+    def _analyze_emotion(self, user_message: str) -> Dict:
+        """Run the standalone EmotionAnalysis call for one message, using the cache"""
+        cached = self._cached_analysis(user_message)
+        if cached is not None:
+            return cached
+        
+        emotion_data = self.analysis_flight.do(normalize_message(user_message), self._request_analysis, user_message)
+        # Coalesced callers share one result; give each its own copy
+        return {**emotion_data, "gif_keywords": list(emotion_data["gif_keywords"])}
+    
+    def _request_analysis(self, user_message: str) -> Dict:
+        """The uncached EmotionAnalysis call behind _analyze_emotion"""
+        start_time = time.perf_counter()
+        contents, config = self._emotion_analysis_request(user_message)
+        emotion_response = self._call(
+            self.client.models.generate_content,
+            model="gemini-2.5-flash",
+            contents=contents,
+            config=config
+        )
+        return self._remember_analysis(user_message, emotion_response.text, time.perf_counter() - start_time)
+    
+    async def _analyze_emotion_async(self, user_message: str) -> Dict:
+        """Async version of _analyze_emotion"""
+        cached = self._cached_analysis(user_message)
+        if cached is not None:
+            return cached
+        
+        emotion_data = await self.analysis_flight.do_async(normalize_message(user_message), self._request_analysis_async, user_message)
+        return {**emotion_data, "gif_keywords": list(emotion_data["gif_keywords"])}
+    
+    async def _request_analysis_async(self, user_message: str) -> Dict:
+        """The uncached EmotionAnalysis call behind _analyze_emotion_async"""
+        start_time = time.perf_counter()
+        contents, config = self._emotion_analysis_request(user_message)
+        emotion_response = await self._call_async(
+            self.client.aio.models.generate_content,
+            model="gemini-2.5-flash",
+            contents=contents,
+            config=config
+        )
+        return self._remember_analysis(user_message, emotion_response.text, time.perf_counter() - start_time)
+    
+    def _cached_analysis(self, user_message: str) -> Optional[Dict]:
+        """Cached emotion data for a message, crediting the latency it saved"""
+        emotion_data = self.analysis_cache.get(normalize_message(user_message))
+        if emotion_data is None:
+            return None
+        
+        with self._analysis_stats_lock:
+            self.analysis_saved_seconds += self._analysis_latency or 0.0
+        # Copy so callers cannot mutate the cached entry
+        return {**emotion_data, "gif_keywords": list(emotion_data["gif_keywords"])}
+    
+    def _remember_analysis(self, user_message: str, response_text: Optional[str], elapsed: float) -> Dict:
+        """Parse an EmotionAnalysis response, caching it and recording its latency"""
+        with self._analysis_stats_lock:
+            if self._analysis_latency is None:
+                self._analysis_latency = elapsed
+            else:
+                self._analysis_latency += 0.1 * (elapsed - self._analysis_latency)
+        
+        if not response_text:
+            return dict(DEFAULT_EMOTION_DATA)
+        
+        emotion_data = {**DEFAULT_EMOTION_DATA, **json.loads(response_text)}
+        self.analysis_cache.set(normalize_message(user_message), {
+            **emotion_data, "gif_keywords": list(emotion_data["gif_keywords"])
+        })
+        return emotion_data
+    
+    def analysis_cache_stats(self) -> Dict:
+        """
+        Emotion analysis cache counters plus the latency the cache saved
+        
+        Saved latency is estimated as one average uncached analysis call per
+        hit. Single-call mode gets its analysis from the reply call, so it
+        does not use this cache.
+        """
+        stats = self.analysis_cache.stats()
+        stats["single_flight"] = self.analysis_flight.stats()
+        with self._analysis_stats_lock:
+            stats["avg_analysis_ms"] = round(self._analysis_latency * 1000, 1) if self._analysis_latency is not None else None
+            stats["saved_seconds"] = round(self.analysis_saved_seconds, 3)
+        return stats
+    
+    def _respond_single_call(self, context_messages: List, estimated_tokens: int) -> Tuple[str, Dict]:
+        """Get the reply and the emotion analysis from one schema-constrained call"""
+        response = self._generate(context_messages, self._single_call_config, self._single_call_instruction(), estimated_tokens)
+        return self._parse_single_call(response)
+    
+    def _parse_single_call(self, response) -> Tuple[str, Dict]:
+        """Split a ConversationResponse into the reply text and the emotion data"""
+        data = json.loads(response.text) if response.text else {}
+        conversational_response = data.pop("response", None) or "I'm here for you. Tell me more about what's on your mind."
+        emotion_data = {**DEFAULT_EMOTION_DATA, **data}
+        return conversational_response, emotion_data
+    
+    def _build_result(self, conversational_response: str, emotion_data: Dict) -> Dict:
+        """Shape the reply and emotion analysis into the dict the routes expect"""
+        # Determine opposite emotion for mood transformation
+        opposite_emotion = self._get_opposite_emotion(emotion_data["emotion"])
+        
+        return {
+            "response": conversational_response,
+            "detected_emotion": emotion_data["emotion"],
+            "emotion_intensity": emotion_data["intensity"],
+            "context": emotion_data["context"],
+            "opposite_emotion": opposite_emotion,
+            "gif_keywords": emotion_data["gif_keywords"],
+            "conversation_tone": emotion_data["conversation_tone"]
+        }
+    
+    def _fallback_result(self) -> Dict:
+        """Canned result used when neither Gemini nor the local pipeline could answer"""
+        return {
+            "response": "I'm here to listen and support you. What's been on your mind lately?",
+            "detected_emotion": "neutral",
+            "emotion_intensity": 0.5,
+            "context": "fallback response",
+            "opposite_emotion": "positive",
+            "gif_keywords": ["supportive", "caring", "comfort"],
+            "conversation_tone": "supportive"
+        }
+    
+    def _local_result(self, user_message: str) -> Dict:
+        """
+        Result from the local pipeline, used while Gemini is failing or its circuit is open
+        
+        EmotionAnalyzer detects the emotion and TherapeuticTools writes the
+        reply and a casual suggestion, so the turn needs no upstream call.
+        """
+        try:
+            analyzer, tools = self._get_local_pipeline()
+            analysis = analyzer.analyze(user_message)
+            emotion = analysis["emotion"]
+            # Same vocabulary as the Gemini path, so rollups and GIF choices do not depend on which path answered
+            opposite_emotion = self._get_opposite_emotion(emotion)
             
-            emotion_response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[types.Content(role="user", parts=[types.Part(text=emotion_analysis_prompt)])],
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json",
-                    response_schema=EmotionAnalysis,
-                    temperature=0.3
-                )
-            )
-            
-            emotion_data = json.loads(emotion_response.text) if emotion_response.text else {
-                "emotion": "neutral",
-                "intensity": 0.5,
-                "context": "general conversation",
-                "gif_keywords": ["uplifting", "positive", "smile"],
-                "conversation_tone": "supportive"
-            }
-            
-            # Determine opposite emotion for mood transformation
-            opposite_emotion = self._get_opposite_emotion(emotion_data["emotion"])
+            response = tools.generate_chat_response(user_message, emotion, opposite_emotion)
+            suggestion = tools.get_casual_suggestion(emotion)
+            if suggestion:
+                response = f"{response} {suggestion}"
             
+            with self._local_lock:
+                self.local_replies += 1
             return {
-                "response": conversational_response,
-                "detected_emotion": emotion_data["emotion"],
-                "emotion_intensity": emotion_data["intensity"],
-                "context": emotion_data["context"],
+                "response": response,
+                "detected_emotion": emotion,
+                "emotion_intensity": round(min(1.0, analysis["confidence"]), 2),
+                "context": "local analysis",
                 "opposite_emotion": opposite_emotion,
-                "gif_keywords": emotion_data["gif_keywords"],
-                "conversation_tone": emotion_data["conversation_tone"]
-            }
-            
-        except Exception as e:
-            logging.error(f"Error in Gemini conversation: {str(e)}")
-            return {
-                "response": "I'm here to listen and support you. What's been on your mind lately?",
-                "detected_emotion": "neutral",
-                "emotion_intensity": 0.5,
-                "context": "fallback response",
-                "opposite_emotion": "positive",
-                "gif_keywords": ["supportive", "caring", "comfort"],
+                "gif_keywords": analyzer.get_giphy_search_terms(analysis["opposite_emotion"])[:3],
                 "conversation_tone": "supportive"
             }
+        except Exception as e:
+            logging.error(f"Error in local fallback pipeline: {str(e)}")
+            return self._fallback_result()
+    
+    def _get_local_pipeline(self) -> Tuple:
+        """EmotionAnalyzer and TherapeuticTools, built on first use"""
+        if self._local_pipeline is None:
+            with self._local_lock:
+                if self._local_pipeline is None:
+                    # Imported here: the sentiment engines are slow to import and most turns never need them
+                    from emotion_analyzer import EmotionAnalyzer
+                    from therapeutic_tools import TherapeuticTools
+                    self._local_pipeline = (EmotionAnalyzer(), TherapeuticTools())
+        return self._local_pipeline
+    
+    def breaker_stats(self) -> Dict:
+        """Circuit breaker state and counters, plus retries and locally answered turns"""
+        return {**self.breaker.stats(), "retries": self.retry_policy.retries, "local_replies": self.local_replies}
     
     def _get_opposite_emotion(self, emotion: str) -> str:
         """Map emotions to their positive opposites"""
-        emotion_map = {
-            'sad': 'joyful',
-            'angry': 'peaceful',
-            'anxious': 'calm',
-            'lonely': 'connected',
-            'tired': 'energized',
-            'confused': 'clear',
-            'frustrated': 'satisfied',
-            'disappointed': 'hopeful',
-            'overwhelmed': 'balanced',
-            'depressed': 'uplifted',
-            'stressed': 'relaxed',
-            'worried': 'confident',
-            'fearful': 'brave',
-            'guilty': 'forgiven',
-            'ashamed': 'proud',
-            'hurt': 'healing',
-            'rejected': 'accepted',
-            'helpless': 'empowered'
-        }
-        return emotion_map.get(emotion.lower(), 'positive')
+        return get_opposite_emotion(emotion)
     
     def get_contextual_gif_search(self, emotion: str, keywords: List[str], context: str) -> str:
         """
@@ -219,19 +750,15 @@ IMPORTANT: Always analyze the user's emotional state ."""
             logging.error(f"Error in contextual GIF search: {str(e)}")
             return 'positive'
     
-    def save_conversation_context(self, user_message: str, ai_response: str, emotion_data: Dict):
-        """Save conversation for context in future messages"""
-        self.conversation_history.append({
+    def save_conversation_context(self, conversation_id: str, user_message: str, ai_response: str, emotion_data: Dict):
+        """Save a turn in the conversation's memory for context in future messages"""
+        self.conversation_memory.append(conversation_id, {
             "user_message": user_message,
             "ai_response": ai_response,
             "emotion": emotion_data.get("detected_emotion"),
-            "timestamp": "now"  # You could add proper timestamps
+            "timestamp": time.time()
         })
-        
-        # Keep only last 10 exchanges for context
-        if len(self.conversation_history) > 10:
-            self.conversation_history = self.conversation_history[-10:]
     
-    def get_conversation_history(self) -> List[Dict]:
-        """Get recent conversation history for context"""
-        return self.conversation_history
\ No newline at end of file
+    def get_conversation_history(self, conversation_id: str) -> List[Dict]:
+        """Get a conversation's recent turns, oldest first"""
+        return self.conversation_memory.get(conversation_id)
\ No newline at end of file
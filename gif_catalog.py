@@ -0,0 +1,378 @@
+import logging
+import os
+import random
+import threading
+import time
+
+from gif_index import GifSimilarityIndex
+
+# Giphy renditions worth keeping besides the original
+RENDITIONS = ('fixed_height', 'fixed_width', 'downsized', 'preview_gif')
+
+
+def _to_int(value):
+    """Giphy sends sizes as strings; store them as ints"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize(term):
+    return ' '.join(term.lower().split())
+
+
+def parse_giphy_gif(gif, tags=(), emotions=()):
+    """
+    Convert a Giphy API GIF object into a catalog entry
+
+    Args:
+        gif (dict): One item from a Giphy search response's `data` list
+        tags (iterable): Extra tags, e.g. the search term that found it
+        emotions (iterable): Emotions the GIF maps to
+
+    Returns:
+        dict: Catalog entry, or None if the object has no usable original rendition
+    """
+    images = gif.get('images') or {}
+    original = images.get('original') or {}
+    if not gif.get('id') or not original.get('url'):
+        return None
+
+    renditions = {}
+    for name in RENDITIONS:
+        rendition = images.get(name)
+        if rendition and rendition.get('url'):
+            renditions[name] = {
+                'url': rendition['url'],
+                'width': _to_int(rendition.get('width')),
+                'height': _to_int(rendition.get('height')),
+                'size': _to_int(rendition.get('size'))
+            }
+
+    all_tags = [_normalize(tag) for tag in list(gif.get('tags') or []) + list(tags) if tag]
+    return {
+        'id': gif['id'],
+        'title': (gif.get('title') or '')[:300],
+        'tags': list(dict.fromkeys(all_tags)),
+        'original_url': original['url'],
+        'original_width': _to_int(original.get('width')),
+        'original_height': _to_int(original.get('height')),
+        'original_size': _to_int(original.get('size')),
+        'renditions': renditions,
+        'emotions': list(dict.fromkeys(emotion.lower() for emotion in emotions))
+    }
+
+
+def _insert_ignoring_conflicts(session, table, rows):
+    """Insert rows, skipping those whose key already exists (e.g. written by another worker)"""
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name in ('sqlite', 'postgresql'):
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        session.execute(dialect_insert(table).on_conflict_do_nothing(), rows)
+    elif dialect_name in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        session.execute(dialect_insert(table).prefix_with('IGNORE'), rows)
+    else:
+        # No upsert: a concurrent insert fails the transaction and the caller retries
+        session.execute(table.insert(), rows)
+
+
+def upsert_gifs(entries, source='import'):
+    """
+    Insert or merge catalog entries; the caller must provide an app context
+
+    Existing GIFs keep their data and gain any new tags and emotions. Rows
+    are inserted with a dialect upsert that skips GIFs and emotion mappings
+    already present, so workers harvesting the same GIFs at the same time
+    do not fail each other's batches.
+
+    Args:
+        entries (list): Catalog entries from parse_giphy_gif
+        source (str): 'import' or 'harvest'
+
+    Returns:
+        int: Number of new GIFs added (approximate when other workers write the same GIFs)
+    """
+    from app import db
+    from models import GifCatalog, GifEmotion
+
+    merged = {}
+    for entry in entries:
+        if entry is None:
+            continue
+        existing = merged.get(entry['id'])
+        if existing:
+            existing['tags'] = list(dict.fromkeys(existing['tags'] + entry['tags']))
+            existing['emotions'] = list(dict.fromkeys(existing['emotions'] + entry['emotions']))
+        else:
+            merged[entry['id']] = dict(entry)
+    if not merged:
+        return 0
+
+    catalog = GifCatalog.__table__
+    found = dict(db.session.execute(
+        db.select(catalog.c.id, catalog.c.tags).where(catalog.c.id.in_(list(merged)))
+    ).all())
+
+    new_rows = [
+        {
+            'id': gif_id,
+            'title': entry['title'],
+            'tags': entry['tags'],
+            'original_url': entry['original_url'],
+            'original_width': entry['original_width'],
+            'original_height': entry['original_height'],
+            'original_size': entry['original_size'],
+            'renditions': entry['renditions'],
+            'source': source
+        }
+        for gif_id, entry in merged.items() if gif_id not in found
+    ]
+    if new_rows:
+        _insert_ignoring_conflicts(db.session, catalog, new_rows)
+
+    for gif_id, tags in found.items():
+        new_tags = [tag for tag in merged[gif_id]['tags'] if tag not in (tags or [])]
+        if new_tags:
+            db.session.execute(catalog.update().where(catalog.c.id == gif_id).values(tags=(tags or []) + new_tags))
+
+    emotion_rows = [{'gif_id': gif_id, 'emotion': emotion}
+                    for gif_id, entry in merged.items() for emotion in entry['emotions']]
+    if emotion_rows:
+        _insert_ignoring_conflicts(db.session, GifEmotion.__table__, emotion_rows)
+
+    db.session.commit()
+    return len(new_rows)
+
+
+class LocalGifCatalog:
+    """
+    In-memory index over the GifCatalog table
+
+    Selection is a dict lookup plus random.choice, so picking a GIF takes
+    microseconds and needs no network. A GifSimilarityIndex over titles, tags
+    and emotions ranks GIFs against a turn's keywords and context. GIFs
+    harvested from live Giphy responses are queued and written to the table
+    by a background thread.
+    """
+
+    def __init__(self, app, reload_interval=None):
+        """
+        Args:
+            app (Flask): App whose database holds the catalog
+            reload_interval (float): Seconds between index reloads, which pick
+                up GIFs added by other workers (GIF_CATALOG_RELOAD_SECONDS)
+        """
+        self.app = app
+        self.reload_interval = reload_interval or float(os.environ.get("GIF_CATALOG_RELOAD_SECONDS", 300))
+
+        self.by_emotion = {}
+        self.by_tag = {}
+        self.index = GifSimilarityIndex()
+        self.size = 0
+        self._known_ids = set()
+        self._loaded = False
+
+        self._pending = []
+        # Batches taken by flush() and not yet committed; a load() may snapshot the table before they land
+        self._flushing = []
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = None
+
+    def load(self):
+        """(Re)build the in-memory index from the GifCatalog table"""
+        from models import GifCatalog
+
+        by_emotion = {}
+        by_tag = {}
+        known_ids = set()
+        documents = []
+        with self.app.app_context():
+            gifs = GifCatalog.query.all()
+            for gif in gifs:
+                known_ids.add(gif.id)
+                emotions = [mapping.emotion for mapping in gif.emotions]
+                for emotion in emotions:
+                    by_emotion.setdefault(emotion, []).append(gif.original_url)
+                for tag in gif.tags or []:
+                    by_tag.setdefault(tag, []).append(gif.original_url)
+                documents.append((gif.id, gif.original_url, gif.title, gif.tags, emotions))
+
+        index = GifSimilarityIndex()
+        index.add_many(documents)
+
+        with self._lock:
+            self.by_emotion = by_emotion
+            self.by_tag = by_tag
+            self.index = index
+            # Keep GIFs harvested here that the snapshot may not include yet: queued, or being written
+            unsaved = [entry for batch in self._flushing for entry in batch if entry['id'] not in known_ids]
+            unsaved.extend(self._pending)
+            for entry in unsaved:
+                self._add_to_indexes(entry)
+            self._known_ids = known_ids | {entry['id'] for entry in unsaved}
+            self.size = len(self._known_ids)
+            self._loaded = True
+        logging.info(f"Loaded local GIF catalog: {len(gifs)} GIFs, {len(by_emotion)} emotions")
+
+    @property
+    def loaded(self):
+        """False until the index is first built; until then a lookup reads the whole table"""
+        return self._loaded
+
+    def _add_to_indexes(self, entry):
+        """Make a catalog entry selectable; the caller holds _lock"""
+        for emotion in entry['emotions']:
+            self.by_emotion.setdefault(emotion, []).append(entry['original_url'])
+        for tag in entry['tags']:
+            self.by_tag.setdefault(tag, []).append(entry['original_url'])
+        self.index.add(entry['id'], entry['original_url'], entry['title'], entry['tags'], entry['emotions'])
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._load_lock:
+                if self._loaded:
+                    return
+                try:
+                    self.load()
+                except Exception as e:
+                    logging.error(f"Error loading local GIF catalog: {str(e)}")
+                    self._loaded = True
+
+    def start(self):
+        """Load the catalog and start the harvest flusher in the background, e.g. at worker boot"""
+        self._start_flusher()
+
+    def pick(self, keyword=None, emotion=None):
+        """
+        Pick a random catalog GIF matching a keyword tag, else an emotion
+
+        Args:
+            keyword (str): Search keyword, matched against tags
+            emotion (str): Emotion to fall back to
+
+        Returns:
+            str: GIF URL, or None if the catalog has nothing suitable
+        """
+        self._ensure_loaded()
+        if keyword:
+            urls = self.by_tag.get(_normalize(keyword))
+            if urls:
+                return random.choice(urls)
+        if emotion:
+            urls = self.by_emotion.get(emotion.lower())
+            if urls:
+                return random.choice(urls)
+        return None
+
+    def best_match(self, keywords=(), context='', emotion=None, k=5):
+        """
+        Pick one of the k catalog GIFs most similar to a turn's keywords and context
+
+        Args:
+            keywords (list): AI-generated GIF keywords
+            context (str): What the user is dealing with
+            emotion (str): Detected emotion
+            k (int): How many top matches to choose from, for variety
+
+        Returns:
+            str: GIF URL, or None if nothing in the catalog matches
+        """
+        self._ensure_loaded()
+        matches = self.index.query(keywords, context, emotion=emotion, k=k)
+        if not matches:
+            return None
+        return random.choice(matches)[1]
+
+    def harvest(self, gifs, term, emotions=()):
+        """
+        Queue GIFs from a live Giphy response for the catalog
+
+        GIFs already in the catalog are skipped, so refreshing the same
+        result pool does not rewrite rows. Never loads the catalog itself:
+        it runs on the Giphy response path, and on the event loop under ASGI,
+        so the load happens on the flusher thread instead.
+
+        Args:
+            gifs (list): The `data` list of a Giphy search response
+            term (str): Search term that found them, stored as a tag
+            emotions (iterable): Emotions the search term maps to
+        """
+        entries = [parse_giphy_gif(gif, tags=[term], emotions=emotions) for gif in gifs]
+
+        with self._lock:
+            entries = [entry for entry in entries if entry and entry['id'] not in self._known_ids]
+            if not entries:
+                return
+            self._pending.extend(entries)
+            self._known_ids.update(entry['id'] for entry in entries)
+            self.size = len(self._known_ids)
+
+            # Make harvested GIFs selectable right away in this worker
+            for entry in entries:
+                self._add_to_indexes(entry)
+        self._start_flusher()
+        self._wakeup.set()
+
+    def flush(self):
+        """Write queued harvested GIFs to the database; a batch that fails is queued again"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            self._flushing.append(pending)
+
+        try:
+            with self.app.app_context():
+                try:
+                    return upsert_gifs(pending, source='harvest')
+                except Exception as e:
+                    from app import db
+                    db.session.rollback()
+                    with self._lock:
+                        self._pending = pending + self._pending
+                    logging.error(f"Error saving {len(pending)} harvested GIFs, will retry: {str(e)}")
+                    return 0
+        finally:
+            with self._lock:
+                self._flushing = [batch for batch in self._flushing if batch is not pending]
+
+    def _start_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            with self._lock:
+                if self._flusher is not None and self._flusher.is_alive():
+                    return
+                self._flusher = threading.Thread(target=self._run_flusher, name="gif-catalog", daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self):
+        self._ensure_loaded()
+        last_reload = time.monotonic()
+        while True:
+            self._wakeup.wait(timeout=self.reload_interval)
+            self._wakeup.clear()
+            self.flush()
+            if time.monotonic() - last_reload >= self.reload_interval:
+                try:
+                    self.load()
+                except Exception as e:
+                    logging.error(f"Error reloading local GIF catalog: {str(e)}")
+                last_reload = time.monotonic()
+
+    def stats(self):
+        """Catalog size and pending harvest queue length"""
+        with self._lock:
+            return {
+                'loaded': self._loaded,
+                'gifs': self.size,
+                'emotions': len(self.by_emotion),
+                'tags': len(self.by_tag),
+                'pending_harvest': len(self._pending),
+                'index': self.index.stats()
+            }
@@ -0,0 +1,279 @@
+import re
+import threading
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have i in is it its me my of on or our so that the their them they
+this to was were with you your about feeling feels feel being very really just
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class _Segment:
+    """Immutable block of postings sorted by feature"""
+
+    __slots__ = ('features', 'offsets', 'doc_ids', 'weights')
+
+    def __init__(self, doc_ids, features, weights):
+        order = np.argsort(features, kind='stable')
+        features = features[order]
+        self.doc_ids = doc_ids[order]
+        self.weights = weights[order]
+        self.features, starts = np.unique(features, return_index=True)
+        self.offsets = np.append(starts, len(features)).astype(np.int64)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def postings(self, query_features):
+        """Doc ids, weights and query positions of postings for the given features"""
+        idx = np.searchsorted(self.features, query_features)
+        idx = np.minimum(idx, len(self.features) - 1)
+        hit = self.features[idx] == query_features
+        if not hit.any():
+            return None
+
+        starts = self.offsets[idx[hit]]
+        lengths = self.offsets[idx[hit] + 1] - starts
+        # Expand the [start, start + length) ranges into one index array
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        query_slots = np.repeat(np.flatnonzero(hit), lengths)
+        return self.doc_ids[positions], self.weights[positions], query_slots
+
+
+class GifSimilarityIndex:
+    """
+    In-memory hashed TF-IDF index over GIF titles, tags and emotions
+
+    Terms (words and word bigrams) are hashed into a fixed feature space, and
+    postings are stored as NumPy arrays in segments sorted by feature, like a
+    small search engine. Adding GIFs only appends a new segment; segments are
+    merged once there are too many. IDF is applied at query time, so existing
+    postings never need reweighting as the collection grows.
+
+    A query gathers the postings for its features from every segment,
+    accumulates scores with one np.bincount and takes the top k with
+    np.argpartition.
+    """
+
+    def __init__(self, n_features=2 ** 20, segment_size=4096, max_segments=8):
+        self.n_features = n_features
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+
+        self.gif_ids = []
+        self.urls = []
+        self._positions = {}  # gif_id -> doc id
+        self.doc_freq = np.zeros(n_features, dtype=np.int32)
+
+        self._segments = []
+        self._pending_docs = []
+        self._pending_features = []
+        self._pending_weights = []
+        self._pending_count = 0
+        self._pending_doc_count = 0
+
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.gif_ids)
+
+    def _hash(self, term):
+        return hash(term) & (self.n_features - 1)
+
+    def _features(self, tokens, weight=1.0):
+        """Hashed unigram and bigram features with their summed weights"""
+        mask = self.n_features - 1
+        counts = {}
+        for term in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            feature = hash(term) & mask
+            counts[feature] = counts.get(feature, 0.0) + weight
+        return counts
+
+    def _doc_features(self, title, tags, emotions):
+        counts = self._features(tokenize(title or ''))
+        for tag in tags or []:
+            for feature, count in self._features(tokenize(tag), 2.0).items():
+                counts[feature] = counts.get(feature, 0.0) + count
+        for emotion in emotions or []:
+            feature = self._hash(f"emotion:{emotion.lower()}")
+            counts[feature] = counts.get(feature, 0.0) + 1.0
+        return counts
+
+    def add(self, gif_id, url, title='', tags=(), emotions=()):
+        """
+        Add one GIF; re-adding a known gif_id is ignored
+
+        Args:
+            gif_id (str): Unique GIF id
+            url (str): URL returned by queries
+            title (str): GIF title
+            tags (iterable): Tags, weighted above title words
+            emotions (iterable): Emotions the GIF maps to
+        """
+        self._add_batch([(gif_id, url, title, tags, emotions)])
+
+    def add_many(self, gifs):
+        """Add (gif_id, url, title, tags, emotions) tuples in one vectorized batch"""
+        self._add_batch(gifs)
+        with self._lock:
+            self._flush_pending()
+
+    def _add_batch(self, gifs):
+        documents = []
+        for gif_id, url, title, tags, emotions in gifs:
+            counts = self._doc_features(title, tags, emotions)
+            if counts:
+                documents.append((gif_id, url, counts))
+
+        with self._lock:
+            doc_ids, features, counts = [], [], []
+            for gif_id, url, doc_counts in documents:
+                if gif_id in self._positions:
+                    continue
+                doc_id = len(self.gif_ids)
+                self._positions[gif_id] = doc_id
+                self.gif_ids.append(gif_id)
+                self.urls.append(url)
+                doc_ids.extend([doc_id] * len(doc_counts))
+                features.extend(doc_counts.keys())
+                counts.extend(doc_counts.values())
+            if not doc_ids:
+                return
+
+            doc_ids = np.array(doc_ids, dtype=np.int32)
+            features = np.array(features, dtype=np.int32)
+            tf = 1.0 + np.log(np.array(counts, dtype=np.float32))
+            # Features are unique within a document, so this counts documents
+            if len(features) * 64 < self.n_features:
+                np.add.at(self.doc_freq, features, 1)
+            else:
+                self.doc_freq += np.bincount(features, minlength=self.n_features).astype(np.int32)
+
+            # Normalize with the IDF known right now; stays close as the collection grows
+            idf = self._idf(features)
+            first_doc = doc_ids[0]
+            norms = np.sqrt(np.bincount(doc_ids - first_doc, weights=(tf * idf) ** 2))
+            weights = tf / np.maximum(norms[doc_ids - first_doc], 1e-9)
+
+            self._pending_docs.append(doc_ids)
+            self._pending_features.append(features)
+            self._pending_weights.append(weights.astype(np.float32))
+            self._pending_count += len(doc_ids)
+            self._pending_doc_count += len(documents)
+            if self._pending_doc_count >= self.segment_size:
+                self._flush_pending()
+
+    def _idf(self, features):
+        n_docs = max(len(self.gif_ids), 1)
+        return np.log((1.0 + n_docs) / (1.0 + self.doc_freq[features])).astype(np.float32) + 1.0
+
+    def _flush_pending(self):
+        """Turn pending postings into a segment, merging segments when there are too many"""
+        if not self._pending_docs:
+            return
+        self._segments.append(_Segment(
+            np.concatenate(self._pending_docs),
+            np.concatenate(self._pending_features),
+            np.concatenate(self._pending_weights)
+        ))
+        self._pending_docs, self._pending_features, self._pending_weights = [], [], []
+        self._pending_count = 0
+        self._pending_doc_count = 0
+
+        if len(self._segments) > self.max_segments:
+            # Fold the small segments together; only rewrite the largest one
+            # when the rest have grown comparable to it
+            self._segments.sort(key=len, reverse=True)
+            largest, rest = self._segments[0], self._segments[1:]
+            if sum(len(segment) for segment in rest) * 2 < len(largest):
+                self._segments = [largest, self._merge(rest)]
+            else:
+                self._segments = [self._merge(self._segments)]
+
+    def _merge(self, segments):
+        return _Segment(
+            np.concatenate([segment.doc_ids for segment in segments]),
+            np.concatenate([np.repeat(segment.features, np.diff(segment.offsets)) for segment in segments]),
+            np.concatenate([segment.weights for segment in segments])
+        )
+
+    def query(self, keywords=(), context='', emotion=None, k=10):
+        """
+        Rank GIFs against a turn's GIF keywords and context
+
+        Args:
+            keywords (list): AI-generated GIF keywords (full weight)
+            context (str): Short description of what the user is dealing with (half weight)
+            emotion (str): Detected emotion, matched against GIF emotions
+            k (int): Number of results
+
+        Returns:
+            list: (gif_id, url, score) tuples, best first. Only GIFs sharing
+                at least one keyword or context term are returned; the emotion
+                raises their score but does not make a match on its own.
+        """
+        counts = {}
+        for keyword in keywords or []:
+            for feature, count in self._features(tokenize(keyword)).items():
+                counts[feature] = counts.get(feature, 0.0) + count
+        for feature, count in self._features(tokenize(context or ''), 0.5).items():
+            counts[feature] = counts.get(feature, 0.0) + count
+        if not counts:
+            return []
+        emotion_feature = -1
+        if emotion:
+            emotion_feature = self._hash(f"emotion:{emotion.lower()}")
+            counts[emotion_feature] = counts.get(emotion_feature, 0.0) + 0.5
+
+        with self._lock:
+            self._flush_pending()
+            segments = list(self._segments)
+            n_docs = len(self.gif_ids)
+            if not n_docs:
+                return []
+
+            query_features = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+            query_weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            # Document-side IDF is applied here too, so postings stay unweighted
+            query_weights *= self._idf(query_features) ** 2
+            order = np.argsort(query_features)
+            query_features, query_weights = query_features[order], query_weights[order]
+            is_term = query_features != emotion_feature
+
+        scores = np.zeros(n_docs, dtype=np.float32)
+        term_hits = np.zeros(n_docs, dtype=np.float32)
+        for segment in segments:
+            found = segment.postings(query_features)
+            if found is None:
+                continue
+            doc_ids, weights, query_slots = found
+            scores += np.bincount(doc_ids, weights=weights * query_weights[query_slots], minlength=n_docs)[:n_docs].astype(np.float32)
+            term_hits += np.bincount(doc_ids, weights=is_term[query_slots], minlength=n_docs)[:n_docs].astype(np.float32)
+        # A GIF that only shares the emotion is not a match
+        scores[term_hits == 0] = 0
+
+        k = min(k, n_docs)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self.gif_ids[doc_id], self.urls[doc_id], float(scores[doc_id]))
+            for doc_id in top if scores[doc_id] > 0
+        ]
+
+    def stats(self):
+        """Index size and segment layout"""
+        with self._lock:
+            return {
+                'gifs': len(self.gif_ids),
+                'segments': len(self._segments),
+                'postings': int(sum(len(segment) for segment in self._segments)) + self._pending_count,
+                'pending_docs': self._pending_doc_count
+            }
@@ -0,0 +1,185 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class GifPoolWarmer:
+    """
+    Background warmer that keeps GiphyService result pools cached
+
+    Every emotion search term the app can ask for is known up front, so the
+    warmer fetches all of their pools at startup and re-fetches each one
+    shortly before it expires. The hot path then almost never waits on Giphy.
+    """
+
+    def __init__(self, giphy_service, concurrency=None, hourly_budget=None, refresh_margin=None, interval=None):
+        """
+        Args:
+            giphy_service (GiphyService): Service whose search cache is warmed
+            concurrency (int): Parallel refresh requests (GIF_WARMER_CONCURRENCY)
+            hourly_budget (int): Max Giphy requests per hour (GIF_WARMER_HOURLY_BUDGET)
+            refresh_margin (float): Refresh pools expiring within this many
+                seconds (GIF_WARMER_REFRESH_MARGIN)
+            interval (float): Seconds between refresh cycles (GIF_WARMER_INTERVAL)
+        """
+        self.giphy_service = giphy_service
+        self.concurrency = concurrency or int(os.environ.get("GIF_WARMER_CONCURRENCY", 4))
+        self.hourly_budget = hourly_budget or int(os.environ.get("GIF_WARMER_HOURLY_BUDGET", 300))
+        self.refresh_margin = refresh_margin or float(os.environ.get("GIF_WARMER_REFRESH_MARGIN", 300))
+        self.interval = interval or float(os.environ.get("GIF_WARMER_INTERVAL", 60))
+
+        # Token bucket for the hourly request budget
+        self._tokens = float(self.hourly_budget)
+        self._last_refill = time.monotonic()
+
+        self._targets = None
+
+        # Terms that came back empty are left alone for an hour
+        self._empty_until = {}
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.refreshed = 0
+        self.failures = 0
+        self.skipped_for_budget = 0
+        self.cycles = 0
+
+    def targets(self):
+        """
+        Every (term, limit) pair the GIF lookups can request
+
+        Returns:
+            list: Unique (term, limit) tuples
+        """
+        if self._targets is not None:
+            return self._targets
+
+        # Imported here so building the warmer stays cheap
+        from emotion_analyzer import EmotionAnalyzer
+
+        service = self.giphy_service
+        targets = []
+        for terms in service.emotion_search_terms.values():
+            targets.extend((term, service.limit) for term in terms)
+        for terms in EmotionAnalyzer().giphy_terms.values():
+            targets.extend((term, service.limit) for term in terms)
+        for terms in service.emotion_gif_terms.values():
+            targets.extend((term, 15) for term in terms)
+
+        # Same normalization as the cache key, first occurrence wins
+        unique = {}
+        for term, limit in targets:
+            unique.setdefault((term.strip().lower(), limit), (term, limit))
+        self._targets = list(unique.values())
+        return self._targets
+
+    def due_targets(self):
+        """Targets that are missing from the cache or expire within the refresh margin"""
+        now = time.monotonic()
+        due = []
+        for term, limit in self.targets():
+            if self._empty_until.get((term, limit), 0) > now:
+                continue
+            expires_in = self.giphy_service.pool_expires_in(term, limit)
+            if expires_in is None or expires_in < self.refresh_margin:
+                due.append((expires_in or 0, term, limit))
+
+        # Missing pools first, then the ones closest to expiring
+        due.sort(key=lambda item: item[0])
+        return [(term, limit) for _, term, limit in due]
+
+    def _take_token(self):
+        """Consume one request from the hourly budget, if any is left"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self.hourly_budget),
+                self._tokens + (now - self._last_refill) * self.hourly_budget / 3600
+            )
+            self._last_refill = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _refresh(self, term, limit):
+        """Refresh one pool, recording the outcome"""
+        try:
+            urls = self.giphy_service.refresh_pool(term, limit)
+        except Exception as e:
+            logging.warning(f"GIF warmer failed for term '{term}': {str(e)}")
+            urls = None
+
+        with self._lock:
+            if urls is None:
+                self.failures += 1
+            else:
+                self.refreshed += 1
+                if not urls:
+                    self._empty_until[(term, limit)] = time.monotonic() + 3600
+
+    def run_once(self):
+        """
+        Refresh every due pool, within the concurrency and hourly budget limits
+
+        Returns:
+            int: Number of refresh requests issued
+        """
+        issued = 0
+        if not self.giphy_service.breaker.available():
+            # Giphy is failing; leave it alone until the breaker lets a probe through
+            self.cycles += 1
+            return issued
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="gif-warmer") as executor:
+            for term, limit in self.due_targets():
+                if self._stop.is_set():
+                    break
+                if not self._take_token():
+                    self.skipped_for_budget += 1
+                    continue
+                executor.submit(self._refresh, term, limit)
+                issued += 1
+
+        self.cycles += 1
+        if issued:
+            logging.info(f"GIF warmer refreshed {issued} result pools")
+        return issued
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Error in GIF warmer: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start warming in a daemon thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gif-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the warmer after the current cycle"""
+        self._stop.set()
+
+    def stats(self):
+        """Refresh counters and remaining hourly budget"""
+        targets = self.targets()
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'targets': len(targets),
+                'refreshed': self.refreshed,
+                'failures': self.failures,
+                'skipped_for_budget': self.skipped_for_budget,
+                'cycles': self.cycles,
+                'budget_remaining': int(self._tokens),
+                'hourly_budget': self.hourly_budget,
+                'concurrency': self.concurrency
+            }
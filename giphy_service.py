@@ -1,20 +1,47 @@
 import requests
+import asyncio
 import os
 import random
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
 
 class GiphyService:
     """
     Service for fetching GIFs from Giphy API based on emotions
     """
     
-    def __init__(self):
+    def __init__(self, catalog=None):
         self.api_key = os.environ.get("GIPHY_API_KEY", "demo_api_key")
-        self.base_url = "https://api.giphy.com/v1/gifs"
+        self.base_url = os.environ.get("GIPHY_BASE_URL", "https://api.giphy.com/v1/gifs").rstrip("/")
+        
+        # Optional LocalGifCatalog: live results are harvested into it. In
+        # "offline" mode GIFs are picked from it without any network call; in
+        # "hybrid" mode a good catalog match is used before searching Giphy.
+        self.catalog = catalog
+        self.mode = os.environ.get("GIPHY_MODE", "live").lower()
         
         # Content filtering settings
         self.rating = "g"  # Only family-friendly content
         self.limit = 20    # Number of GIFs to fetch for randomization
+        self.lang = "en"
+        
+        # Whole result pools keyed on (query, rating, limit, lang), so repeat
+        # keywords pick a random GIF without another round trip
+        self.search_cache = TTLCache(
+            maxsize=int(os.environ.get("GIPHY_CACHE_SIZE", 1024)),
+            ttl=float(os.environ.get("GIPHY_CACHE_TTL", 3600))
+        )
+        # Empty result pools are cached too, but only briefly
+        self.empty_result_ttl = 60
+        
+        # Identical searches that are already in flight are joined, not repeated
+        self.single_flight = SingleFlight()
         
         # Fallback GIFs for when API is unavailable (using Giphy's public GIFs)
         self.fallback_gifs = {
@@ -29,6 +56,98 @@ class GiphyService:
             'positive': 'https://media.giphy.com/media/l0MYC0LajbaPoEADu/giphy.gif',
             'uplifted': 'https://media.giphy.com/media/3o7TKTDn976rzVgky4/giphy.gif'
         }
+        
+        # Search terms for opposite emotions
+        self.emotion_search_terms = {
+            'happy': ['happy', 'joy', 'smile', 'celebration', 'laughter', 'fun'],
+            'calm': ['calm', 'peaceful', 'zen', 'meditation', 'tranquil'],
+            'relaxed': ['relaxed', 'chill', 'peaceful', 'breathing', 'zen'],
+            'connected': ['friendship', 'love', 'together', 'hug', 'connection'],
+            'energized': ['energy', 'excited', 'pumped up', 'motivation', 'power'],
+            'clear': ['clarity', 'understanding', 'lightbulb', 'solution', 'eureka'],
+            'hopeful': ['hope', 'optimism', 'bright future', 'dreams', 'possibility'],
+            'forgiven': ['forgiveness', 'peace', 'self love', 'acceptance'],
+            'positive': ['positive', 'good vibes', 'optimism', 'sunshine'],
+            'uplifted': ['uplifting', 'inspiration', 'motivation', 'encouragement']
+        }
+        
+        # Emotion-specific search terms that actually help
+        self.emotion_gif_terms = {
+            'sad': ['cute animals', 'funny cats', 'heartwarming', 'comfort', 'virtual hug'],
+            'angry': ['zen', 'peaceful nature', 'calming', 'breathe', 'meditation'],
+            'anxious': ['calm', 'peaceful', 'breathe slowly', 'relaxing', 'gentle'],
+            'lonely': ['friendship', 'community', 'love', 'connection', 'support'],
+            'tired': ['rest', 'cozy', 'peaceful sleep', 'gentle', 'comfort'],
+            'confused': ['clarity', 'lightbulb moment', 'understanding', 'clear path'],
+            'frustrated': ['zen', 'patience', 'calm down', 'peace'],
+            'worried': ['reassuring', 'its okay', 'calm', 'support'],
+            'stressed': ['relax', 'breathe', 'peaceful', 'zen garden'],
+            'disappointed': ['hope', 'tomorrow', 'new beginnings', 'encouragement'],
+            'overwhelmed': ['one step', 'slow down', 'breathe', 'simple'],
+            'hurt': ['healing', 'comfort', 'gentle care', 'recovery'],
+            'fearful': ['brave', 'courage', 'strong', 'you got this'],
+            'rejected': ['self love', 'worth', 'acceptance', 'valuable'],
+            'guilty': ['forgiveness', 'its okay', 'move forward', 'self compassion'],
+            'helpless': ['strength', 'you can do it', 'empowerment', 'capable']
+        }
+        
+        # Which emotions each search term serves, for tagging harvested GIFs
+        self.term_emotions = {}
+        for emotion_table in (self.emotion_search_terms, self.emotion_gif_terms):
+            for emotion, terms in emotion_table.items():
+                for term in terms:
+                    self.term_emotions.setdefault(term, []).append(emotion)
+        
+        # Keep-alive connection pool shared by every sync request
+        self.pool_size = int(os.environ.get("GIPHY_POOL_SIZE", 20))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # One deadline covers a whole GIF lookup. Candidate terms are tried
+        # concurrently: a hedge request for the next term starts whenever the
+        # current ones are slow or come back empty.
+        self.deadline_budget = float(os.environ.get("GIPHY_DEADLINE_SECONDS", 3.0))
+        self.hedge_delay = float(os.environ.get("GIPHY_HEDGE_DELAY", 0.4))
+        self.max_in_flight = int(os.environ.get("GIPHY_MAX_IN_FLIGHT", 3))
+        self.request_timeout = 5
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="giphy")
+        
+        # Created on first use so it binds to the running event loop
+        self._async_client = None
+        
+        # Searches go through a circuit breaker. While it is open, lookups are
+        # served from cached pools, the local catalog or the fallback GIFs.
+        self.breaker = CircuitBreaker.from_env(
+            "giphy", "GIPHY", slow_seconds=2.0,
+            failed_result=lambda response: response.status_code == 429 or response.status_code >= 500
+        )
+        self.local_gifs = 0
+        self._counter_lock = threading.Lock()
+    
+    @property
+    def offline(self):
+        """True when GIFs come only from the local catalog"""
+        return self.mode == "offline" and self.catalog is not None
+    
+    def _catalog_match(self, keyword, detected_emotion, keywords, context):
+        """Best local catalog match for a turn in offline/hybrid mode, or None"""
+        if self.catalog is None or self.mode not in ("offline", "hybrid"):
+            return None
+        search_keywords = [keyword] + [kw for kw in keywords or [] if kw != keyword]
+        return self.catalog.best_match(search_keywords, context or '', detected_emotion)
+    
+    async def _catalog_async(self, fn, *args):
+        """
+        Run a catalog lookup from the event loop
+        
+        The first lookup builds the catalog index from the database, so until
+        the catalog is loaded lookups run in a worker thread.
+        """
+        if self.catalog is not None and not self.catalog.loaded:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
     
     def get_opposite_emotion_gif(self, opposite_emotion):
         """
@@ -41,6 +160,10 @@ class GiphyService:
             str: URL of the selected GIF
         """
         try:
+            if self.offline:
+                gif_url = self.catalog.pick(emotion=opposite_emotion)
+                return gif_url or self.fallback_gifs.get(opposite_emotion, self.fallback_gifs['positive'])
+            
             # Define search terms for the opposite emotion
             search_terms = self._get_search_terms(opposite_emotion)
             
@@ -57,42 +180,268 @@ class GiphyService:
             logging.error(f"Error fetching GIF: {str(e)}")
             return self.fallback_gifs.get(opposite_emotion, self.fallback_gifs['positive'])
     
-    def _fetch_from_giphy(self, search_terms):
+    def _fetch_from_giphy(self, search_terms, deadline=None):
         """
         Fetch GIF from Giphy API
         
         Args:
             search_terms (list): List of search terms to try
+            deadline (float): time.monotonic() deadline for the whole lookup
             
         Returns:
             str: GIF URL or None if failed
         """
+        results = self._hedged_search(search_terms, self.limit, deadline or self._new_deadline())
+        if results:
+            # Randomly select a GIF from the results
+            return self._pick_gif_url(results)
+        return None
+    
+    def _new_deadline(self):
+        """Deadline for a lookup starting now"""
+        return time.monotonic() + self.deadline_budget
+    
+    def _cached_pool(self, search_terms, limit):
+        """
+        Split search terms into a cached result pool and the terms still to fetch
+        
+        Returns:
+            tuple: (first non-empty cached pool or None, terms that were not cached)
+        """
+        uncached = []
         for term in search_terms:
-            try:
-                url = f"{self.base_url}/search"
-                params = {
-                    'api_key': self.api_key,
-                    'q': term,
-                    'limit': self.limit,
-                    'rating': self.rating,
-                    'lang': 'en'
-                }
+            urls = self.search_cache.get(self._cache_key(term, limit))
+            if urls:
+                return urls, []
+            if urls is None:
+                uncached.append(term)
+        return None, uncached
+    
+    def _hedged_search(self, search_terms, limit, deadline):
+        """
+        Search several terms concurrently and return the first non-empty result pool
+        
+        Terms are launched in order: the next one starts after hedge_delay, or as
+        soon as an earlier request fails or comes back empty, with at most
+        max_in_flight requests running at once. Requests that have not started
+        when a result arrives are cancelled; ones already on the wire finish in
+        the background and still fill the cache. Nothing is requested while the
+        Giphy circuit is open.
+        
+        Args:
+            search_terms (list): Candidate search terms in order of preference
+            limit (int): Number of results to request per term
+            deadline (float): time.monotonic() deadline for the whole lookup
+            
+        Returns:
+            tuple: GIF URLs, or None if nothing was found before the deadline
+        """
+        urls, pending = self._cached_pool(search_terms, limit)
+        if urls:
+            return urls
+        if pending and not self.breaker.available():
+            return None
+        
+        running = {}
+        next_launch = time.monotonic()
+        try:
+            while pending or running:
+                now = time.monotonic()
+                remaining = deadline - now
+                if remaining <= 0:
+                    logging.warning(f"Giphy lookup ran out of its {self.deadline_budget}s budget")
+                    return None
                 
-                response = requests.get(url, params=params, timeout=5)
+                if pending and len(running) < self.max_in_flight and (not running or now >= next_launch):
+                    term = pending.pop(0)
+                    future = self._executor.submit(self._fetch_pool, term, limit, min(self.request_timeout, remaining))
+                    running[future] = term
+                    next_launch = now + self.hedge_delay
+                    continue
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    if data['data']:
-                        # Randomly select a GIF from the results
-                        gif = random.choice(data['data'])
-                        return gif['images']['original']['url']
-                        
-            except requests.RequestException as e:
-                logging.warning(f"Giphy API request failed for term '{term}': {str(e)}")
-                continue
+                timeout = remaining
+                if pending and len(running) < self.max_in_flight:
+                    timeout = min(timeout, max(next_launch - now, 0))
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    term = running.pop(future)
+                    try:
+                        urls = future.result()
+                    except CircuitOpenError:
+                        # Opened by an earlier failure of this lookup; the other terms would fail the same way
+                        return None
+                    except Exception as e:
+                        logging.warning(f"Giphy API request failed for term '{term}': {str(e)}")
+                        urls = None
+                    if urls:
+                        return urls
+                    # Failed or empty: the next term may start right away
+                    next_launch = time.monotonic()
+            return None
+        finally:
+            for future in running:
+                future.cancel()
+    
+    async def _hedged_search_async(self, search_terms, limit, deadline):
+        """Async version of _hedged_search; losing requests are cancelled outright"""
+        urls, pending = self._cached_pool(search_terms, limit)
+        if urls:
+            return urls
+        if pending and not self.breaker.available():
+            return None
         
+        running = {}
+        next_launch = time.monotonic()
+        try:
+            while pending or running:
+                now = time.monotonic()
+                remaining = deadline - now
+                if remaining <= 0:
+                    logging.warning(f"Giphy lookup ran out of its {self.deadline_budget}s budget")
+                    return None
+                
+                if pending and len(running) < self.max_in_flight and (not running or now >= next_launch):
+                    term = pending.pop(0)
+                    task = asyncio.ensure_future(self._fetch_pool_async(term, limit, min(self.request_timeout, remaining)))
+                    running[task] = term
+                    next_launch = now + self.hedge_delay
+                    continue
+                
+                timeout = remaining
+                if pending and len(running) < self.max_in_flight:
+                    timeout = min(timeout, max(next_launch - now, 0))
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    term = running.pop(task)
+                    try:
+                        urls = task.result()
+                    except CircuitOpenError:
+                        return None
+                    except Exception as e:
+                        logging.warning(f"Giphy API request failed for term '{term}': {str(e)}")
+                        urls = None
+                    if urls:
+                        return urls
+                    # Failed or empty: the next term may start right away
+                    next_launch = time.monotonic()
+            return None
+        finally:
+            for task in running:
+                task.cancel()
+    
+    def _search_params(self, term, limit):
+        """Query parameters for a Giphy search request"""
+        return {
+            'api_key': self.api_key,
+            'q': term,
+            'limit': limit,
+            'rating': self.rating,
+            'lang': self.lang
+        }
+    
+    def _cache_key(self, term, limit):
+        """Search cache key for a query"""
+        return (term.strip().lower(), self.rating, limit, self.lang)
+    
+    def _store_results(self, key, data):
+        """Cache the GIF URLs from a search response, harvest them and return them"""
+        if self.catalog is not None and data:
+            try:
+                self.catalog.harvest(data, key[0], self.term_emotions.get(key[0], ()))
+            except Exception as e:
+                logging.warning(f"Error harvesting GIFs into the local catalog: {str(e)}")
+        urls = tuple(gif['images']['original']['url'] for gif in data or [])
+        self.search_cache.set(key, urls, ttl=None if urls else self.empty_result_ttl)
+        return urls
+    
+    def _fetch_pool(self, term, limit, timeout):
+        """
+        Run one Giphy search over the pooled session and cache the result pool
+        
+        Concurrent searches for the same query share one request.
+        
+        Args:
+            term (str): Search query
+            limit (int): Number of results to request
+            timeout (float): Request timeout in seconds
+            
+        Returns:
+            tuple: GIF URLs from the response (empty if none), or None on an API error
+        """
+        return self.single_flight.do(self._cache_key(term, limit), self._request_pool, term, limit, timeout)
+    
+    def _request_pool(self, term, limit, timeout):
+        """The Giphy search request behind _fetch_pool"""
+        response = self.breaker.call(
+            self.session.get, f"{self.base_url}/search", params=self._search_params(term, limit), timeout=timeout
+        )
+        
+        if response.status_code == 200:
+            return self._store_results(self._cache_key(term, limit), response.json().get('data'))
         return None
     
+    async def _fetch_pool_async(self, term, limit, timeout):
+        """Async version of _fetch_pool using the shared httpx client"""
+        return await self.single_flight.do_async(self._cache_key(term, limit), self._request_pool_async, term, limit, timeout)
+    
+    async def _request_pool_async(self, term, limit, timeout):
+        """The Giphy search request behind _fetch_pool_async"""
+        response = await self.breaker.call_async(
+            self._get_async_client().get, f"{self.base_url}/search", params=self._search_params(term, limit), timeout=timeout
+        )
+        
+        if response.status_code == 200:
+            return self._store_results(self._cache_key(term, limit), response.json().get('data'))
+        return None
+    
+    def _get_async_client(self):
+        """Return the keep-alive httpx client used by the async methods"""
+        if self._async_client is None:
+            # Imported here so WSGI workers, which never use it, skip the import
+            import httpx
+            self._async_client = httpx.AsyncClient(
+                timeout=self.request_timeout,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=self.pool_size)
+            )
+        return self._async_client
+    
+    async def aclose(self):
+        """Close the async HTTP client"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+    
+    def _pick_gif_url(self, results):
+        """Randomly select one GIF URL from a result pool"""
+        return random.choice(results)
+    
+    def pool_expires_in(self, term, limit):
+        """Seconds until the cached result pool for a query expires, or None if not cached"""
+        return self.search_cache.expires_in(self._cache_key(term, limit))
+    
+    def refresh_pool(self, term, limit):
+        """
+        Fetch a query's result pool from Giphy and replace the cached copy
+        
+        Args:
+            term (str): Search query
+            limit (int): Number of results to request
+            
+        Returns:
+            tuple: GIF URLs (empty if none), or None on an API error
+        """
+        return self._fetch_pool(term, limit, self.request_timeout)
+    
+    def breaker_stats(self):
+        """Circuit breaker state and counters, plus lookups served without Giphy"""
+        return {**self.breaker.stats(), 'local_gifs': self.local_gifs}
+    
+    def cache_stats(self):
+        """Occupancy and hit/miss/eviction counters for the search cache, plus coalesced searches"""
+        return {**self.search_cache.stats(), 'single_flight': self.single_flight.stats()}
+    
     def _get_search_terms(self, emotion):
         """
         Get search terms for a specific emotion
@@ -103,28 +452,20 @@ class GiphyService:
         Returns:
             list: List of search terms
         """
-        emotion_terms = {
-            'happy': ['happy', 'joy', 'smile', 'celebration', 'laughter', 'fun'],
-            'calm': ['calm', 'peaceful', 'zen', 'meditation', 'tranquil'],
-            'relaxed': ['relaxed', 'chill', 'peaceful', 'breathing', 'zen'],
-            'connected': ['friendship', 'love', 'together', 'hug', 'connection'],
-            'energized': ['energy', 'excited', 'pumped up', 'motivation', 'power'],
-            'clear': ['clarity', 'understanding', 'lightbulb', 'solution', 'eureka'],
-            'hopeful': ['hope', 'optimism', 'bright future', 'dreams', 'possibility'],
-            'forgiven': ['forgiveness', 'peace', 'self love', 'acceptance'],
-            'positive': ['positive', 'good vibes', 'optimism', 'sunshine'],
-            'uplifted': ['uplifting', 'inspiration', 'motivation', 'encouragement']
-        }
-        
-        return emotion_terms.get(emotion, ['happy', 'positive', 'good vibes'])
+        return self.emotion_search_terms.get(emotion, ['happy', 'positive', 'good vibes'])
     
-    def search_contextual_gif(self, keyword, detected_emotion):
+    def search_contextual_gif(self, keyword, detected_emotion, keywords=None, context=None):
         """
         Search for contextually relevant GIFs using AI-generated keywords
         
+        The keyword is tried first, with the detected emotion's search terms as
+        hedges, all within one deadline budget.
+        
         Args:
             keyword (str): AI-generated keyword for GIF search
             detected_emotion (str): The user's detected emotion for context
+            keywords (list): All AI-generated GIF keywords for the turn
+            context (str): AI summary of what the user is dealing with
             
         Returns:
             str: URL of the GIF or fallback GIF
@@ -132,33 +473,27 @@ class GiphyService:
         try:
             logging.info(f"Contextual GIF search: keyword='{keyword}', emotion='{detected_emotion}'")
             
-            # Search for GIFs with the AI-generated keyword
-            url = f"{self.base_url}/search"
-            params = {
-                'api_key': self.api_key,
-                'q': keyword,
-                'limit': 15,
-                'rating': 'g',
-                'lang': 'en'
-            }
-            
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('data'):
-                    # Get a random GIF from results
-                    gif = random.choice(data['data'])
-                    gif_url = gif['images']['original']['url']
-                    logging.info(f"Found contextual GIF: {gif_url}")
-                    return gif_url
-            
-            # Fallback search with emotion-specific terms
-            return self.get_emotion_appropriate_gif(detected_emotion)
+            gif_url = self._catalog_match(keyword, detected_emotion, keywords, context)
+            if gif_url:
+                logging.info(f"Found catalog GIF: {gif_url}")
+                return gif_url
+            if self.offline:
+                return self._pick_offline(keyword, detected_emotion)
+            
+            search_terms = [keyword] + self._emotion_search_terms(detected_emotion)
+            results = self._hedged_search(search_terms, 15, self._new_deadline())
+            
+            if results:
+                # Get a random GIF from results
+                gif_url = self._pick_gif_url(results)
+                logging.info(f"Found contextual GIF: {gif_url}")
+                return gif_url
+            
+            return self._local_gif(keyword, detected_emotion)
             
         except Exception as e:
             logging.error(f"Error fetching contextual GIF: {str(e)}")
-            return self.get_emotion_appropriate_gif(detected_emotion)
+            return self.fallback_gifs.get('positive', 'https://media.giphy.com/media/l0MYC0LajbaPoEADu/giphy.gif')
     
     def get_emotion_appropriate_gif(self, emotion):
         """
@@ -171,48 +506,100 @@ class GiphyService:
             str: URL of the GIF
         """
         try:
-            # Emotion-specific search terms that actually help
-            emotion_gifs = {
-                'sad': ['cute animals', 'funny cats', 'heartwarming', 'comfort', 'virtual hug'],
-                'angry': ['zen', 'peaceful nature', 'calming', 'breathe', 'meditation'],
-                'anxious': ['calm', 'peaceful', 'breathe slowly', 'relaxing', 'gentle'],
-                'lonely': ['friendship', 'community', 'love', 'connection', 'support'],
-                'tired': ['rest', 'cozy', 'peaceful sleep', 'gentle', 'comfort'],
-                'confused': ['clarity', 'lightbulb moment', 'understanding', 'clear path'],
-                'frustrated': ['zen', 'patience', 'calm down', 'peace'],
-                'worried': ['reassuring', 'its okay', 'calm', 'support'],
-                'stressed': ['relax', 'breathe', 'peaceful', 'zen garden'],
-                'disappointed': ['hope', 'tomorrow', 'new beginnings', 'encouragement'],
-                'overwhelmed': ['one step', 'slow down', 'breathe', 'simple'],
-                'hurt': ['healing', 'comfort', 'gentle care', 'recovery'],
-                'fearful': ['brave', 'courage', 'strong', 'you got this'],
-                'rejected': ['self love', 'worth', 'acceptance', 'valuable'],
-                'guilty': ['forgiveness', 'its okay', 'move forward', 'self compassion'],
-                'helpless': ['strength', 'you can do it', 'empowerment', 'capable']
-            }
-            
-            # Get appropriate search terms
-            search_terms = emotion_gifs.get(emotion.lower(), ['uplifting', 'positive', 'smile'])
-            selected_term = random.choice(search_terms)
-            
-            url = f"{self.base_url}/search"
-            params = {
-                'api_key': self.api_key,
-                'q': selected_term,
-                'limit': 15,
-                'rating': 'g',
-                'lang': 'en'
-            }
-            
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('data'):
-                    gif = random.choice(data['data'])
-                    return gif['images']['original']['url']
+            if self.offline:
+                return self._pick_offline(None, emotion)
+            
+            results = self._hedged_search(self._emotion_search_terms(emotion), 15, self._new_deadline())
+            if results:
+                return self._pick_gif_url(results)
+            
+            return self._local_gif(None, emotion)
             
+        except Exception as e:
+            logging.error(f"Error in emotion-appropriate GIF: {str(e)}")
             return self.fallback_gifs.get('positive', 'https://media.giphy.com/media/l0MYC0LajbaPoEADu/giphy.gif')
+
+    def _local_gif(self, keyword, detected_emotion):
+        """GIF for a lookup Giphy could not serve: a local catalog pick, else the fallback GIF"""
+        with self._counter_lock:
+            self.local_gifs += 1
+        if self.catalog is not None:
+            return self._pick_offline(keyword, detected_emotion)
+        return self.fallback_gifs.get('positive', 'https://media.giphy.com/media/l0MYC0LajbaPoEADu/giphy.gif')
+    
+    def _pick_offline(self, keyword, detected_emotion):
+        """Pick a GIF from the local catalog: keyword tag, then the emotion's terms, then the emotion"""
+        gif_url = self.catalog.pick(keyword=keyword)
+        if gif_url:
+            return gif_url
+        for term in self._emotion_search_terms(detected_emotion):
+            gif_url = self.catalog.pick(keyword=term)
+            if gif_url:
+                return gif_url
+        gif_url = self.catalog.pick(emotion=detected_emotion)
+        return gif_url or self.fallback_gifs.get('positive', 'https://media.giphy.com/media/l0MYC0LajbaPoEADu/giphy.gif')
+    
+    def _emotion_search_terms(self, emotion):
+        """Search terms for a detected emotion, shuffled for variety"""
+        search_terms = list(self.emotion_gif_terms.get(emotion.lower(), ['uplifting', 'positive', 'smile']))
+        random.shuffle(search_terms)
+        return search_terms
+    
+    async def search_contextual_gif_async(self, keyword, detected_emotion, keywords=None, context=None):
+        """
+        Async version of search_contextual_gif for the ASGI chat pipeline
+        
+        Args:
+            keyword (str): AI-generated keyword for GIF search
+            detected_emotion (str): The user's detected emotion for context
+            keywords (list): All AI-generated GIF keywords for the turn
+            context (str): AI summary of what the user is dealing with
+            
+        Returns:
+            str: URL of the GIF or fallback GIF
+        """
+        try:
+            logging.info(f"Contextual GIF search (async): keyword='{keyword}', emotion='{detected_emotion}'")
+            
+            gif_url = await self._catalog_async(self._catalog_match, keyword, detected_emotion, keywords, context)
+            if gif_url:
+                logging.info(f"Found catalog GIF: {gif_url}")
+                return gif_url
+            if self.offline:
+                return await self._catalog_async(self._pick_offline, keyword, detected_emotion)
+            
+            search_terms = [keyword] + self._emotion_search_terms(detected_emotion)
+            results = await self._hedged_search_async(search_terms, 15, self._new_deadline())
+            if results:
+                gif_url = self._pick_gif_url(results)
+                logging.info(f"Found contextual GIF: {gif_url}")
+                return gif_url
+            
+            return await self._catalog_async(self._local_gif, keyword, detected_emotion)
+            
+        except Exception as e:
+            logging.error(f"Error fetching contextual GIF: {str(e)}")
+            return self.fallback_gifs.get('positive', 'https://media.giphy.com/media/l0MYC0LajbaPoEADu/giphy.gif')
+    
+    async def get_emotion_appropriate_gif_async(self, emotion):
+        """
+        Async version of get_emotion_appropriate_gif
+        
+        Args:
+            emotion (str): The detected emotion
+            
+        Returns:
+            str: URL of the GIF
+        """
+        try:
+            if self.offline:
+                return await self._catalog_async(self._pick_offline, None, emotion)
+            
+            results = await self._hedged_search_async(self._emotion_search_terms(emotion), 15, self._new_deadline())
+            if results:
+                return self._pick_gif_url(results)
+            
+            return await self._catalog_async(self._local_gif, None, emotion)
             
         except Exception as e:
             logging.error(f"Error in emotion-appropriate GIF: {str(e)}")
@@ -229,7 +616,7 @@ class GiphyService:
             bool: True if URL is valid and accessible
         """
         try:
-            response = requests.head(url, timeout=3)
+            response = self.session.head(url, timeout=3)
             return response.status_code == 200
         except:
             return False
@@ -0,0 +1,103 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton that finds every occurrence of many keywords in one pass
+
+    Scanning costs one transition per character of text, however many
+    keywords there are, and overlapping matches ("let down" and "down") are
+    all reported.
+    """
+
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords (iterable): Keywords to match; duplicates are dropped
+        """
+        self.keywords = list(dict.fromkeys(keyword for keyword in keywords if keyword))
+
+        # Trie: goto[state] maps a character to the next state
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [()]  # (keyword index, keyword length) ending at each state
+
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append(())
+                state = next_state
+            self._outputs[state] += ((index, len(keyword)),)
+
+        # Failure links in breadth-first order; each state also inherits the
+        # outputs of its failure state so a scan never walks the chain
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] += self._outputs[self._fail[next_state]]
+                queue.append(next_state)
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def find_all(self, text):
+        """
+        Every keyword occurrence in the text
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            list: (keyword index, start, end) tuples in order of their end position
+        """
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        root = goto[0]
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            if state:
+                next_state = goto[state].get(char)
+                while next_state is None:
+                    state = fail[state]
+                    next_state = goto[state].get(char) if state else root.get(char, 0)
+                state = next_state
+            else:
+                state = root.get(char, 0)
+            if outputs[state]:
+                end = position + 1
+                matches.extend((index, end - length, end) for index, length in outputs[state])
+        return matches
+
+    def match_scores(self, text, separator=' '):
+        """
+        Score each keyword found in the text: 2 for a whole-word match, else 1
+
+        A whole-word match is bounded by the separator or the ends of the text,
+        the same as checking f" {keyword} " in f" {text} ".
+
+        Args:
+            text (str): Text to scan
+            separator (str): Word separator
+
+        Returns:
+            dict: keyword index -> 1 or 2
+        """
+        scores = {}
+        last = len(text)
+        for index, start, end in self.find_all(text):
+            if scores.get(index) == 2:
+                continue
+            exact = (start == 0 or text[start - 1] == separator) and (end == last or text[end] == separator)
+            scores[index] = 2 if exact else 1
+        return scores
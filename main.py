@@ -1,4 +1,8 @@
 from app import app
 
 if __name__ == "__main__":
+    # The dev server creates missing tables; deployments run `flask --app main init-db`
+    from schema import init_db
+    with app.app_context():
+        init_db()
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -3,6 +3,13 @@ from datetime import datetime
 
 class EmotionRecord(db.Model):
     """Model to store user emotion records and interactions"""
+    # Serve newest-first history and its (timestamp, id) keyset pagination,
+    # across all records and within one session
+    __table_args__ = (
+        db.Index('ix_emotion_record_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_emotion_record_session_timestamp_id', 'session_key', 'timestamp', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_input = db.Column(db.Text, nullable=False)
     detected_emotion = db.Column(db.String(50), nullable=False)
@@ -11,14 +18,16 @@ class EmotionRecord(db.Model):
     gif_url = db.Column(db.String(500))
     therapeutic_tool = db.Column(db.String(100))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    session_key = db.Column(db.String(64))  # Browser session that recorded the turn
     
-    def __init__(self, user_input, detected_emotion, sentiment_score, opposite_emotion, gif_url=None, therapeutic_tool=None):
+    def __init__(self, user_input, detected_emotion, sentiment_score, opposite_emotion, gif_url=None, therapeutic_tool=None, session_key=None):
         self.user_input = user_input
         self.detected_emotion = detected_emotion
         self.sentiment_score = sentiment_score
         self.opposite_emotion = opposite_emotion
         self.gif_url = gif_url
         self.therapeutic_tool = therapeutic_tool
+        self.session_key = session_key
     
     def to_dict(self):
         return {
@@ -48,3 +57,53 @@ class ContentTemplate(db.Model):
             'content': self.content,
             'is_active': self.is_active
         }
+
+class GifCatalog(db.Model):
+    """Model to store GIFs for local, network-free selection"""
+    id = db.Column(db.String(64), primary_key=True)  # Giphy GIF id
+    title = db.Column(db.String(300))
+    tags = db.Column(db.JSON, default=list)
+    original_url = db.Column(db.String(500), nullable=False)
+    original_width = db.Column(db.Integer)
+    original_height = db.Column(db.Integer)
+    original_size = db.Column(db.Integer)
+    renditions = db.Column(db.JSON, default=dict)  # name -> {'url', 'width', 'height', 'size'}
+    source = db.Column(db.String(20), default='import')  # 'import' or 'harvest'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    emotions = db.relationship('GifEmotion', backref='gif', cascade='all, delete-orphan', lazy='selectin')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'tags': self.tags or [],
+            'original_url': self.original_url,
+            'original_width': self.original_width,
+            'original_height': self.original_height,
+            'original_size': self.original_size,
+            'renditions': self.renditions or {},
+            'emotions': [mapping.emotion for mapping in self.emotions],
+            'source': self.source
+        }
+
+class GifEmotion(db.Model):
+    """Model mapping catalog GIFs to the emotions they suit"""
+    __table_args__ = (db.UniqueConstraint('gif_id', 'emotion'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    gif_id = db.Column(db.String(64), db.ForeignKey('gif_catalog.id'), nullable=False, index=True)
+    emotion = db.Column(db.String(50), nullable=False, index=True)
+
+class EmotionRollup(db.Model):
+    """Model storing per-hour and per-day EmotionRecord counts for analytics"""
+    # One row per (granularity, bucket, emotion pair); also the upsert conflict target
+    __table_args__ = (db.UniqueConstraint('granularity', 'bucket', 'detected_emotion', 'opposite_emotion',
+                                          name='uq_emotion_rollup_bucket'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # 'hour' or 'day'
+    bucket = db.Column(db.DateTime, nullable=False)  # Start of the hour/day, UTC
+    detected_emotion = db.Column(db.String(50), nullable=False)
+    opposite_emotion = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    intensity_sum = db.Column(db.Float, nullable=False, default=0.0)
@@ -0,0 +1,280 @@
+"""
+Token-budgeted prompt assembly for GeminiConversationAI
+
+The reply prompt used to be the system prompt plus up to six raw prior
+messages plus the new message, however long they were. PromptBuilder keeps
+the history and the new message within a token budget: the newest messages
+that fit are sent verbatim, over-long messages are clipped, and everything
+older is folded into a short rolling summary sent ahead of them.
+
+The summary is extractive and incremental: each message that leaves the
+verbatim window adds one clipped line to it, and the oldest lines drop off
+once it exceeds its own budget. Folding costs no model call and never
+re-reads the whole conversation. ContextStore folds the messages it trims
+into the stored summary with the same function, so the summary covers the
+conversation from its start.
+
+Token counts are estimates (about four characters per token for English);
+the exact counts Gemini reports are logged next to them.
+"""
+import logging
+import threading
+import time
+
+# Sender used for the rolling summary entry in a conversation context list
+SUMMARY_SENDER = 'summary'
+
+
+def estimate_tokens(text):
+    """Approximate Gemini token count of text"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def clip_text(text, max_tokens):
+    """Shorten text to about max_tokens, keeping its start and end"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head - 5
+    return f"{text[:head].rstrip()} ... {text[-tail:].lstrip()}" if tail > 0 else text[:max_chars]
+
+
+def fold_summary(summary, messages, max_tokens, line_tokens=40):
+    """
+    Fold messages leaving the verbatim window into the rolling summary
+
+    Args:
+        summary (str): Current summary, one line per folded message (may be empty)
+        messages (list): {"sender", "text"} dicts, oldest first
+        max_tokens (int): Budget of the whole summary; the oldest lines go first
+        line_tokens (int): Budget of each new line
+
+    Returns:
+        str: The updated summary
+    """
+    lines = summary.splitlines() if summary else []
+    for message in messages:
+        if message.get('sender') == SUMMARY_SENDER:
+            lines.extend(message.get('text', '').splitlines())
+            continue
+        text = ' '.join(message.get('text', '').split())
+        if not text:
+            continue
+        speaker = 'User' if message.get('sender') == 'user' else 'You'
+        lines.append(f"- {speaker}: {clip_text(text, line_tokens)}")
+
+    total = sum(estimate_tokens(line) + 1 for line in lines)
+    while lines and total > max_tokens:
+        total -= estimate_tokens(lines.pop(0)) + 1
+    return '\n'.join(lines)
+
+
+class PromptBuilder:
+    """
+    Builds the Gemini contents list for a reply within a token budget
+    """
+
+    def __init__(self, budget_tokens=1500, message_tokens=600, summary_tokens=200, max_messages=6):
+        """
+        Args:
+            budget_tokens (int): Budget for summary, prior messages and the new message
+            message_tokens (int): Longest any single message may be
+            summary_tokens (int): Budget of the rolling summary
+            max_messages (int): Most prior messages sent verbatim
+        """
+        self.budget_tokens = budget_tokens
+        self.message_tokens = message_tokens
+        self.summary_tokens = summary_tokens
+        self.max_messages = max_messages
+
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.estimated_tokens = 0
+        self.unbudgeted_tokens = 0
+        self.clipped_messages = 0
+        self.folded_messages = 0
+        self.reported_turns = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+
+    def build(self, user_message, conversation_context=None):
+        """
+        Assemble the contents for one reply
+
+        Args:
+            user_message (str): The user's current message
+            conversation_context (list): Prior {"sender", "text"} messages, oldest
+                first, optionally led by a rolling summary entry
+
+        Returns:
+            tuple: (contents list, estimated input tokens excluding the system prompt)
+        """
+        from google.genai import types
+
+        conversation_context = conversation_context or []
+        summary = ''
+        history = []
+        for message in conversation_context:
+            if message.get('sender') == SUMMARY_SENDER:
+                summary = message.get('text', '')
+            else:
+                history.append(message)
+
+        clipped = 0
+        current = clip_text(user_message, self.message_tokens)
+        clipped += current != user_message
+        remaining = self.budget_tokens - estimate_tokens(current) - self.summary_tokens
+
+        # Newest first: keep what fits, fold the rest into the summary
+        kept = []
+        for index in range(len(history) - 1, -1, -1):
+            if len(kept) == self.max_messages:
+                break
+            text = history[index].get('text', '')
+            clipped_text = clip_text(text, self.message_tokens)
+            cost = estimate_tokens(clipped_text)
+            if cost > remaining:
+                break
+            clipped += clipped_text != text
+            remaining -= cost
+            kept.append((history[index], clipped_text))
+        kept.reverse()
+        folded = history[:len(history) - len(kept)]
+        if folded:
+            summary = fold_summary(summary, folded, self.summary_tokens)
+
+        contents = []
+        if summary:
+            contents.append(types.Content(role="user", parts=[types.Part(
+                text=f"(Summary of our earlier conversation, for context)\n{summary}"
+            )]))
+        for message, text in kept:
+            role = "user" if message.get("sender") == "user" else "model"
+            contents.append(types.Content(role=role, parts=[types.Part(text=text)]))
+        contents.append(types.Content(role="user", parts=[types.Part(text=current)]))
+
+        estimated = sum(estimate_tokens(part.text) for content in contents for part in content.parts)
+        # What the previous builder sent: the last six raw messages plus the message
+        unbudgeted = estimate_tokens(user_message) + sum(estimate_tokens(message.get('text', '')) for message in history[-6:])
+        with self._lock:
+            self.turns += 1
+            self.estimated_tokens += estimated
+            self.unbudgeted_tokens += unbudgeted
+            self.clipped_messages += clipped
+            self.folded_messages += len(folded)
+        return contents, estimated
+
+    def record_usage(self, input_tokens, cached_tokens):
+        """Add the input token counts Gemini reported for one reply call"""
+        with self._lock:
+            self.reported_turns += 1
+            self.input_tokens += input_tokens or 0
+            self.cached_tokens += cached_tokens or 0
+
+    def stats(self):
+        """Average estimated input tokens per turn against the unbudgeted prompt, plus reported usage"""
+        with self._lock:
+            return {
+                'budget_tokens': self.budget_tokens,
+                'turns': self.turns,
+                'avg_estimated_tokens': round(self.estimated_tokens / self.turns, 1) if self.turns else None,
+                'avg_unbudgeted_tokens': round(self.unbudgeted_tokens / self.turns, 1) if self.turns else None,
+                'clipped_messages': self.clipped_messages,
+                'folded_messages': self.folded_messages,
+                'avg_input_tokens': round(self.input_tokens / self.reported_turns, 1) if self.reported_turns else None,
+                'avg_cached_tokens': round(self.cached_tokens / self.reported_turns, 1) if self.reported_turns else None
+            }
+
+
+class SystemPromptCache:
+    """
+    Gemini context caches holding the static system prompts
+
+    A cached system prompt is billed at the cached rate and is not
+    re-processed on every call. Instructions shorter than the model's
+    minimum cacheable size (min_tokens) are never sent to the cache API, as
+    creation would only fail. When creation fails for another reason (e.g.
+    the API key's tier has no caching) the cache backs off for retry_after
+    seconds, and callers send system_instruction inline as before.
+    """
+
+    def __init__(self, model, ttl=3600, retry_after=3600, enabled=True, min_tokens=1024):
+        self.model = model
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.enabled = enabled
+        self.min_tokens = min_tokens
+        self._caches = {}  # system instruction -> (cache name, expires_at)
+        self._unavailable_until = 0.0
+        self._lock = threading.Lock()
+
+    def is_fresh(self, instruction):
+        """True when cache_name(instruction) will return without calling the API"""
+        entry = self._caches.get(instruction)
+        now = time.monotonic()
+        return (not self.cacheable(instruction) or now < self._unavailable_until
+                or (entry is not None and entry[1] > now))
+
+    def cacheable(self, instruction):
+        """Whether instruction is long enough for an explicit context cache"""
+        return self.enabled and estimate_tokens(instruction) >= self.min_tokens
+
+    def cache_name(self, client, instruction):
+        """
+        Name of a live cache holding instruction, creating one if needed
+
+        Args:
+            client (genai.Client): Client to create the cache with
+            instruction (str): System instruction to cache
+
+        Returns:
+            str: Cached content name, or None to send the instruction inline
+        """
+        if not self.cacheable(instruction):
+            return None
+        now = time.monotonic()
+        entry = self._caches.get(instruction)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+        if now < self._unavailable_until:
+            return None
+        with self._lock:
+            entry = self._caches.get(instruction)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            from google.genai import types
+
+            try:
+                cache = client.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=instruction,
+                        display_name="moodmorph-system-prompt",
+                        ttl=f"{int(self.ttl)}s"
+                    )
+                )
+            except Exception as e:
+                self._unavailable_until = now + self.retry_after
+                logging.info(f"Gemini context caching unavailable, sending the system prompt inline: {str(e)}")
+                return None
+            # Recreate a minute early so a request never references an expiring cache
+            self._caches[instruction] = (cache.name, now + self.ttl - 60)
+            logging.info(f"Cached Gemini system prompt as {cache.name}")
+            return cache.name
+
+    def invalidate(self, name):
+        """Forget a cache the API no longer accepts"""
+        with self._lock:
+            for instruction, entry in list(self._caches.items()):
+                if entry[0] == name:
+                    del self._caches[instruction]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'min_tokens': self.min_tokens,
+                'caches': len(self._caches),
+                'available': self.enabled and time.monotonic() >= self._unavailable_until
+            }
@@ -0,0 +1,267 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process, so the thread lock is enough
+    fcntl = None
+
+
+class EmotionRecordWriter:
+    """
+    Write-behind writer for EmotionRecord rows
+
+    Chat requests enqueue rows and return; a background thread inserts them
+    in bulk, one executemany INSERT per batch, once batch_size rows are
+    queued or flush_interval has passed. If the database is down, or slow
+    enough that the queue reaches max_queue, rows are appended to a local
+    JSONL spool file instead and replayed once the database accepts writes
+    again. Pending rows are drained at interpreter exit. The spool is shared
+    by every worker process; appends and replays hold an exclusive flock on
+    a sidecar lock file, so one worker cannot replay rows another is still
+    writing, or replay them a second time.
+
+    Rows are timestamped when their batch is inserted, not when they are
+    queued, so a row held back by a slow flush or a spool replay does not
+    land behind a /api/history sync cursor a client already has. Only the
+    insert transaction itself is left as a window (two workers committing at
+    the same moment). The cost is that a replayed row is bucketed in
+    analytics at its replay time.
+
+    Delivery is at-least-once: a crash between a replayed batch committing and
+    the spool file being removed can insert that batch twice.
+    """
+
+    def __init__(self, app, batch_size=None, flush_interval=None, max_queue=None, spool_path=None):
+        """
+        Args:
+            app (Flask): App whose database receives the rows
+            batch_size (int): Rows per INSERT; reaching it triggers a flush (RECORD_WRITER_BATCH_SIZE)
+            flush_interval (float): Max seconds a row waits in memory (RECORD_WRITER_FLUSH_INTERVAL)
+            max_queue (int): Queued rows beyond which new rows go to the spool (RECORD_WRITER_MAX_QUEUE)
+            spool_path (str): Spool file (RECORD_WRITER_SPOOL_PATH, default in the instance folder)
+        """
+        self.app = app
+        self.batch_size = batch_size or int(os.environ.get("RECORD_WRITER_BATCH_SIZE", 100))
+        self.flush_interval = flush_interval or float(os.environ.get("RECORD_WRITER_FLUSH_INTERVAL", 1.0))
+        self.max_queue = max_queue or int(os.environ.get("RECORD_WRITER_MAX_QUEUE", 10000))
+        self.spool_path = spool_path or os.environ.get("RECORD_WRITER_SPOOL_PATH") or os.path.join(
+            app.instance_path, 'emotion-records.spool.jsonl')
+
+        self._queue = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._closed = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self._avg_flush_ms = None
+
+        atexit.register(self.close)
+
+    def enqueue(self, row):
+        """
+        Queue one EmotionRecord row for insertion
+
+        Args:
+            row (dict): Column values; `timestamp` is set when the row is inserted
+        """
+        row = {column: value for column, value in row.items() if column != 'timestamp'}
+        with self._lock:
+            self.enqueued += 1
+            backlog = len(self._queue) >= self.max_queue
+            if not backlog:
+                self._queue.append(row)
+                full = len(self._queue) >= self.batch_size
+        if backlog:
+            # The database is not keeping up; keep memory bounded
+            self._spool([row])
+            return
+        self._start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Insert every queued row now, then replay the spool if there is one
+
+        Returns:
+            int: Rows inserted from the queue
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._queue = self._queue, []
+            written = 0
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                if self._insert(batch):
+                    written += len(batch)
+                else:
+                    # Keep the rest of this flush together with the failed batch
+                    self._spool(rows[start:])
+                    return written
+            self._replay_spool()
+            return written
+
+    def _insert(self, rows):
+        """Insert one batch and its rollup increments in a single transaction; returns False if it failed"""
+        from app import db
+        from models import EmotionRecord
+        from rollups import apply_rollups
+
+        if not rows:
+            return True
+        start_time = time.perf_counter()
+        with self.app.app_context():
+            try:
+                # Stamped at write time; the rows themselves stay unstamped in case this batch is spooled
+                now = datetime.utcnow()
+                rows = [{**row, 'timestamp': now} for row in rows]
+                db.session.execute(EmotionRecord.__table__.insert(), rows)
+                # Analytics rollups move in the same transaction as the records
+                apply_rollups(db.session, rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                with self._lock:
+                    self.failed_flushes += 1
+                logging.error(f"Error writing {len(rows)} emotion records: {str(e)}")
+                return False
+
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        with self._lock:
+            self.written += len(rows)
+            self.flushes += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._avg_flush_ms = elapsed_ms if self._avg_flush_ms is None else self._avg_flush_ms + 0.1 * (elapsed_ms - self._avg_flush_ms)
+        return True
+
+    @contextmanager
+    def _locked_spool(self):
+        """Hold the spool against other threads and, via flock on <spool>.lock, other processes"""
+        with self._spool_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spool_path)), exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.spool_path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _spool(self, rows):
+        """Append rows to the spool file and fsync it"""
+        with self._locked_spool():
+            with open(self.spool_path, 'a', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        with self._lock:
+            self.spooled += len(rows)
+        logging.warning(f"Spooled {len(rows)} emotion records to {self.spool_path}")
+
+    def _replay_spool(self):
+        """Insert spooled rows; the spool is only removed once all of them are committed"""
+        replaying_path = f"{self.spool_path}.replaying"
+        with self._locked_spool():
+            # A .replaying file is left by a replay that failed part-way; finish it first
+            if not os.path.exists(replaying_path):
+                if not os.path.exists(self.spool_path):
+                    return
+                os.replace(self.spool_path, replaying_path)
+            with open(replaying_path, encoding='utf-8') as f:
+                # Spools written by older versions carry a queue-time timestamp; it is replaced at insert
+                rows = [json.loads(line) for line in f if line.strip()]
+
+            for start in range(0, len(rows), self.batch_size):
+                if not self._insert(rows[start:start + self.batch_size]):
+                    # Keep only what is still unwritten for the next attempt
+                    remaining = rows[start:]
+                    with open(replaying_path, 'w', encoding='utf-8') as f:
+                        for row in remaining:
+                            f.write(json.dumps(row) + '\n')
+                        f.flush()
+                        os.fsync(f.fileno())
+                    return
+                with self._lock:
+                    self.replayed += len(rows[start:start + self.batch_size])
+            os.remove(replaying_path)
+        logging.info(f"Replayed {len(rows)} spooled emotion records")
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._closed or (self._thread is not None and self._thread.is_alive()):
+                    return
+                self._thread = threading.Thread(target=self._run, name="record-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error in emotion record writer: {str(e)}")
+
+    def close(self):
+        """Stop the background thread and write out (or spool) everything queued"""
+        with self._lock:
+            self._closed = True
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Error draining emotion record writer: {str(e)}")
+            with self._lock:
+                rows, self._queue = self._queue, []
+            if rows:
+                self._spool(rows)
+
+    def stats(self):
+        """Queue depth, write counters and flush latency"""
+        with self._spool_lock:
+            spool_bytes = sum(
+                os.path.getsize(path) for path in (self.spool_path, f"{self.spool_path}.replaying")
+                if os.path.exists(path)
+            )
+        with self._lock:
+            return {
+                'queue_depth': len(self._queue),
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'spooled': self.spooled,
+                'replayed': self.replayed,
+                'spool_bytes': spool_bytes,
+                'last_flush_ms': round(self.last_flush_ms, 1) if self.last_flush_ms is not None else None,
+                'avg_flush_ms': round(self._avg_flush_ms, 1) if self._avg_flush_ms is not None else None,
+                'max_flush_ms': round(self.max_flush_ms, 1),
+                'batch_size': self.batch_size,
+                'flush_interval': self.flush_interval
+            }
@@ -0,0 +1,241 @@
+"""
+Hourly and daily EmotionRecord rollups
+
+EmotionRollup keeps one row per (granularity, bucket, detected_emotion,
+opposite_emotion) with a record count and an intensity sum. Rows are added
+to it incrementally, in the same transaction that inserts the records, with
+a dialect-native upsert; /api/analytics then reads one small row set per
+bucket instead of grouping over all of EmotionRecord. rebuild_rollups
+recomputes any time range from the records themselves, e.g. after a
+backfill changed their emotions.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import db
+from models import EmotionRecord, EmotionRollup
+
+GRANULARITIES = ('hour', 'day')
+
+BUCKET_STEP = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+
+def bucket_start(timestamp, granularity):
+    """
+    Start of the hour or day containing timestamp
+
+    Args:
+        timestamp (datetime): Naive UTC timestamp
+        granularity (str): 'hour' or 'day'
+
+    Returns:
+        datetime: Bucket start
+    """
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate(records):
+    """
+    Sum records into rollup rows
+
+    Args:
+        records (iterable): Dicts with timestamp, detected_emotion,
+            opposite_emotion and sentiment_score
+
+    Returns:
+        list: Rollup row dicts, one per (granularity, bucket, emotion pair)
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for record in records:
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(record['timestamp'], granularity),
+                   record['detected_emotion'], record['opposite_emotion'])
+            total = totals[key]
+            total[0] += 1
+            total[1] += record.get('sentiment_score') or 0.0
+    return [
+        {
+            'granularity': granularity,
+            'bucket': bucket,
+            'detected_emotion': detected_emotion,
+            'opposite_emotion': opposite_emotion,
+            'count': count,
+            'intensity_sum': intensity_sum
+        }
+        for (granularity, bucket, detected_emotion, opposite_emotion), (count, intensity_sum) in totals.items()
+    ]
+
+
+def _upsert_statement(dialect_name):
+    """INSERT that adds to count and intensity_sum on conflict, or None if the dialect has no upsert"""
+    table = EmotionRollup.__table__
+    if dialect_name in ('sqlite', 'postgresql'):
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=['granularity', 'bucket', 'detected_emotion', 'opposite_emotion'],
+            set_={
+                'count': table.c.count + statement.excluded['count'],
+                'intensity_sum': table.c.intensity_sum + statement.excluded.intensity_sum
+            }
+        )
+    if dialect_name in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        statement = dialect_insert(table)
+        return statement.on_duplicate_key_update(
+            count=table.c.count + statement.inserted['count'],
+            intensity_sum=table.c.intensity_sum + statement.inserted.intensity_sum
+        )
+    return None
+
+
+def apply_rollups(session, records):
+    """
+    Add records to the rollups in the session's current transaction
+
+    Args:
+        session (Session): Session that is inserting the records
+        records (list): Record dicts, as passed to the EmotionRecord insert
+    """
+    rows = aggregate(records)
+    if not rows:
+        return
+    statement = _upsert_statement(session.get_bind().dialect.name)
+    if statement is not None:
+        session.execute(statement, rows)
+        return
+
+    # Generic fallback: update existing rows, insert the rest
+    table = EmotionRollup.__table__
+    for row in rows:
+        updated = session.execute(
+            table.update()
+            .where(table.c.granularity == row['granularity'], table.c.bucket == row['bucket'],
+                   table.c.detected_emotion == row['detected_emotion'],
+                   table.c.opposite_emotion == row['opposite_emotion'])
+            .values(count=table.c.count + row['count'], intensity_sum=table.c.intensity_sum + row['intensity_sum'])
+        )
+        if updated.rowcount == 0:
+            session.execute(insert(table), row)
+
+
+def rebuild_rollups(start=None, end=None, batch_size=5000):
+    """
+    Recompute the rollups for [start, end) from EmotionRecord
+
+    The range is widened to whole days so that every hourly and daily bucket
+    it touches is rebuilt completely. Runs in one transaction; needs an app
+    context.
+
+    Args:
+        start (datetime): First timestamp to include (default: oldest record)
+        end (datetime): Timestamp to stop before (default: after the newest record)
+        batch_size (int): Records fetched per round trip
+
+    Returns:
+        dict: start, end, records and rollup rows written
+    """
+    if start is None or end is None:
+        oldest, newest = db.session.query(db.func.min(EmotionRecord.timestamp),
+                                          db.func.max(EmotionRecord.timestamp)).one()
+        start = start or oldest or datetime.utcnow()
+        end = end or (newest + timedelta(microseconds=1) if newest else datetime.utcnow())
+    start = bucket_start(start, 'day')
+    if bucket_start(end, 'day') != end:
+        end = bucket_start(end, 'day') + BUCKET_STEP['day']
+
+    table = EmotionRollup.__table__
+    db.session.execute(table.delete().where(table.c.bucket >= start, table.c.bucket < end))
+
+    records = (
+        db.session.query(EmotionRecord.timestamp, EmotionRecord.detected_emotion,
+                         EmotionRecord.opposite_emotion, EmotionRecord.sentiment_score)
+        .filter(EmotionRecord.timestamp >= start, EmotionRecord.timestamp < end)
+        .execution_options(yield_per=batch_size)
+    )
+    rows = aggregate(record._asdict() for record in records)
+    if rows:
+        db.session.execute(insert(table), rows)
+    db.session.commit()
+
+    record_count = sum(row['count'] for row in rows if row['granularity'] == 'day')
+    logging.info(f"Rebuilt emotion rollups {start} - {end}: {record_count} records, {len(rows)} rows")
+    return {'start': start, 'end': end, 'records': record_count, 'rows': len(rows)}
+
+
+def _summarize(rows):
+    """Group rollup rows (dicts, sorted by bucket) into per-bucket summaries"""
+    buckets = {}
+    for row in rows:
+        bucket = buckets.setdefault(row['bucket'], {'bucket': row['bucket'].isoformat(), 'total': 0,
+                                                    'intensity_sum': 0.0, 'mix': []})
+        bucket['total'] += row['count']
+        bucket['intensity_sum'] += row['intensity_sum']
+        bucket['mix'].append({
+            'detected_emotion': row['detected_emotion'],
+            'opposite_emotion': row['opposite_emotion'],
+            'count': row['count'],
+            'avg_intensity': round(row['intensity_sum'] / row['count'], 4) if row['count'] else None
+        })
+    for bucket in buckets.values():
+        intensity_sum = bucket.pop('intensity_sum')
+        bucket['avg_intensity'] = round(intensity_sum / bucket['total'], 4) if bucket['total'] else None
+    return list(buckets.values())
+
+
+def query_rollups(granularity, start, end):
+    """
+    Rollups for the buckets in [start, end), oldest first
+
+    Args:
+        granularity (str): 'hour' or 'day'
+        start (datetime): First bucket (rounded down to a bucket start)
+        end (datetime): Bucket to stop before
+
+    Returns:
+        list: One dict per bucket with records: bucket, total, avg_intensity and
+            mix (per emotion pair count and average intensity)
+    """
+    table = EmotionRollup.__table__
+    rows = db.session.execute(
+        table.select()
+        .where(table.c.granularity == granularity,
+               table.c.bucket >= bucket_start(start, granularity), table.c.bucket < end)
+        .order_by(table.c.bucket, table.c['count'].desc())
+    ).mappings()
+    return _summarize(rows)
+
+
+def session_rollups(session_key, granularity, start, end):
+    """
+    Same as query_rollups, computed from one session's records
+
+    Rollups are not kept per session; a session's records are few and are
+    read with a range scan of the (session_key, timestamp) index.
+
+    Args:
+        session_key (str): EmotionRecord.session_key
+        granularity (str): 'hour' or 'day'
+        start (datetime): First bucket (rounded down to a bucket start)
+        end (datetime): Bucket to stop before
+
+    Returns:
+        list: Per-bucket summaries, as query_rollups
+    """
+    records = (
+        db.session.query(EmotionRecord.timestamp, EmotionRecord.detected_emotion,
+                         EmotionRecord.opposite_emotion, EmotionRecord.sentiment_score)
+        .filter(EmotionRecord.session_key == session_key,
+                EmotionRecord.timestamp >= bucket_start(start, granularity), EmotionRecord.timestamp < end)
+    )
+    rows = [row for row in aggregate(record._asdict() for record in records) if row['granularity'] == granularity]
+    rows.sort(key=lambda row: (row['bucket'], -row['count']))
+    return _summarize(rows)
@@ -1,83 +1,146 @@
-from flask import render_template, request, jsonify, flash, redirect, url_for, session
-from app import app, db
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, session, Response, stream_with_context
+from app import db
 from models import EmotionRecord, ContentTemplate
-from gemini_conversation import GeminiConversationAI
-from giphy_service import GiphyService
+from services import get_conversation_ai, get_context_store, get_gif_catalog, get_giphy_service, get_gif_warmer, get_record_writer
+from sqlalchemy import and_, or_
+from datetime import datetime, timedelta, timezone
+import base64
+import csv
+import io
+import json
 import logging
+import os
+import secrets
 
-# Initialize services
-conversation_ai = GeminiConversationAI()
-giphy_service = GiphyService()
+bp = Blueprint('main', __name__)
 
-@app.route('/')
+# Upper bound on /api/history page size
+HISTORY_MAX_LIMIT = int(os.environ.get("HISTORY_MAX_LIMIT", 100))
+
+# Upper bound on /api/analytics range, in buckets (31 days of hours)
+ANALYTICS_MAX_BUCKETS = int(os.environ.get("ANALYTICS_MAX_BUCKETS", 744))
+
+@bp.route('/')
 def index():
     """Main page of the MoodMorph application"""
     return render_template('index.html')
 
-@app.route('/api/chat', methods=['POST'])
+def _get_user_input():
+    """Validate the chat request body; returns (user_input, error_response)"""
+    data = request.get_json(silent=True)
+    if not data or 'message' not in data:
+        return None, (jsonify({'error': 'No message provided'}), 400)
+    
+    user_input = data['message'].strip()
+    if not user_input:
+        return None, (jsonify({'error': 'Empty message provided'}), 400)
+    
+    return user_input, None
+
+def _select_gif(ai_result):
+    """Pick a contextually relevant GIF using the AI-generated keywords"""
+    best_gif_keyword = get_conversation_ai().get_contextual_gif_search(
+        ai_result['detected_emotion'], ai_result['gif_keywords'], ai_result['context']
+    )
+    gif_url = get_giphy_service().search_contextual_gif(
+        best_gif_keyword, ai_result['detected_emotion'], ai_result['gif_keywords'], ai_result['context']
+    )
+    logging.info(f"GIF keywords: {ai_result['gif_keywords']}, selected: {best_gif_keyword}")
+    return gif_url
+
+def _conversation_context(session_key, session_data=None):
+    """
+    Recent messages of the session's conversation from the server-side context store
+    
+    Context saved in the session cookie by earlier versions is moved into the
+    store (and dropped from the cookie) the first time it is seen.
+    
+    Args:
+        session_key (str): Key of the conversation
+        session_data (dict): Session to migrate from (default: Flask's session)
+    
+    Returns:
+        list: {"sender", "text"} dicts, oldest first
+    """
+    if session_data is None:
+        session_data = session
+    legacy_context = session_data.pop('conversation_context', None)
+    if legacy_context:
+        get_context_store().seed(session_key, legacy_context)
+    return get_context_store().get(session_key)
+
+def _append_context(session_key, user_input, ai_response):
+    """Append one turn to the session's conversation context"""
+    get_context_store().append(session_key, [
+        {'sender': 'user', 'text': user_input},
+        {'sender': 'bot', 'text': ai_response}
+    ])
+
+def _session_key(session_data=None):
+    """
+    Stable key identifying the browser session, created on first use
+    
+    Args:
+        session_data (dict): Session to read and update (default: Flask's session)
+    
+    Returns:
+        str: Session key stored on the session's EmotionRecords
+    """
+    if session_data is None:
+        session_data = session
+    if 'session_key' not in session_data:
+        session_data['session_key'] = secrets.token_urlsafe(16)
+    return session_data['session_key']
+
+def _record_turn(user_input, ai_result, gif_url, session_key):
+    """Queue the turn for the write-behind record writer and save it in the AI's conversation memory"""
+    get_record_writer().enqueue({
+        'session_key': session_key,
+        'user_input': user_input,
+        'detected_emotion': ai_result['detected_emotion'],
+        'sentiment_score': ai_result['emotion_intensity'],
+        'opposite_emotion': ai_result['opposite_emotion'],
+        'gif_url': gif_url,
+        'therapeutic_tool': f"Gemini AI: {ai_result['conversation_tone']}"
+    })
+    
+    # Save conversation context in AI memory
+    get_conversation_ai().save_conversation_context(session_key, user_input, ai_result['response'], ai_result)
+
+def _sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@bp.route('/api/chat', methods=['POST'])
 def chat():
     """
     Process chat message using Gemini AI for natural conversation and mood transformation
     """
     try:
-        data = request.get_json()
-        if not data or 'message' not in data:
-            return jsonify({'error': 'No message provided'}), 400
-        
-        user_input = data['message'].strip()
-        if not user_input:
-            return jsonify({'error': 'Empty message provided'}), 400
+        user_input, error_response = _get_user_input()
+        if error_response:
+            return error_response
         
-        # Get conversation context from session
-        conversation_context = session.get('conversation_context', [])
+        # Get conversation context from the server-side store
+        session_key = _session_key()
+        conversation_context = _conversation_context(session_key)
         
         # Use Gemini AI for emotion analysis and natural response generation
-        ai_result = conversation_ai.analyze_emotion_and_respond(user_input, conversation_context)
+        ai_result = get_conversation_ai().analyze_emotion_and_respond(user_input, conversation_context)
         
         detected_emotion = ai_result['detected_emotion']
         emotion_intensity = ai_result['emotion_intensity']
         opposite_emotion = ai_result['opposite_emotion']
-        gif_keywords = ai_result['gif_keywords']
         ai_response = ai_result['response']
         
         # Get contextually relevant GIF using AI-generated keywords
-        best_gif_keyword = conversation_ai.get_contextual_gif_search(
-            detected_emotion, gif_keywords, ai_result['context']
-        )
-        gif_url = giphy_service.search_contextual_gif(best_gif_keyword, detected_emotion)
-        
-        # Store conversation context in session for continuity
-        conversation_context.append({
-            'sender': 'user',
-            'text': user_input,
-            'timestamp': 'now'
-        })
-        conversation_context.append({
-            'sender': 'bot',
-            'text': ai_response,
-            'timestamp': 'now'
-        })
-        
-        # Keep only last 10 messages for context
-        if len(conversation_context) > 10:
-            conversation_context = conversation_context[-10:]
+        gif_url = _select_gif(ai_result)
         
-        session['conversation_context'] = conversation_context
+        # Store conversation context for continuity
+        _append_context(session_key, user_input, ai_response)
         
         # Store in database
-        record = EmotionRecord(
-            user_input=user_input,
-            detected_emotion=detected_emotion,
-            sentiment_score=emotion_intensity,
-            opposite_emotion=opposite_emotion,
-            gif_url=gif_url,
-            therapeutic_tool=f"Gemini AI: {ai_result['conversation_tone']}"
-        )
-        db.session.add(record)
-        db.session.commit()
-        
-        # Save conversation context in AI memory
-        conversation_ai.save_conversation_context(user_input, ai_response, ai_result)
+        _record_turn(user_input, ai_result, gif_url, session_key)
         
         response = {
             'success': True,
@@ -86,13 +149,12 @@ def chat():
             'emotion_intensity': emotion_intensity,
             'opposite_emotion': opposite_emotion,
             'gif_url': gif_url,
-            'gif_keywords': gif_keywords,
+            'gif_keywords': ai_result['gif_keywords'],
             'conversation_tone': ai_result['conversation_tone'],
             'context': ai_result['context']
         }
         
         logging.info(f"Gemini AI analysis: {detected_emotion} -> {opposite_emotion} (intensity: {emotion_intensity})")
-        logging.info(f"GIF keywords: {gif_keywords}, selected: {best_gif_keyword}")
         
         return jsonify(response)
         
@@ -104,7 +166,67 @@ def chat():
             'error': str(e)
         }), 500
 
-@app.route('/api/suggestions', methods=['GET'])
+@bp.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat using Server-Sent Events
+    
+    Emits `token` events with reply text as Gemini generates it, then an
+    `emotion` event with the analysis, a `gif` event with the GIF URL and a
+    final `done` event once the turn has been stored.
+    """
+    user_input, error_response = _get_user_input()
+    if error_response:
+        return error_response
+    
+    session_key = _session_key()
+    conversation_context = _conversation_context(session_key)
+    
+    def generate():
+        try:
+            ai_result = None
+            for event in get_conversation_ai().stream_emotion_and_respond(user_input, conversation_context):
+                if event['type'] == 'token':
+                    yield _sse('token', {'text': event['text']})
+                else:
+                    ai_result = event['result']
+            
+            yield _sse('emotion', {
+                'detected_emotion': ai_result['detected_emotion'],
+                'emotion_intensity': ai_result['emotion_intensity'],
+                'opposite_emotion': ai_result['opposite_emotion'],
+                'gif_keywords': ai_result['gif_keywords'],
+                'conversation_tone': ai_result['conversation_tone'],
+                'context': ai_result['context']
+            })
+            
+            gif_url = _select_gif(ai_result)
+            yield _sse('gif', {'gif_url': gif_url, 'opposite_emotion': ai_result['opposite_emotion']})
+            
+            # The context lives server-side, so the full turn can be stored
+            # even though the response headers went out before the reply existed
+            _append_context(session_key, user_input, ai_result['response'])
+            _record_turn(user_input, ai_result, gif_url, session_key)
+            
+            logging.info(f"Gemini AI analysis (stream): {ai_result['detected_emotion']} -> {ai_result['opposite_emotion']} (intensity: {ai_result['emotion_intensity']})")
+            yield _sse('done', {'success': True})
+            
+        except Exception as e:
+            logging.error(f"Error in Gemini chat stream: {str(e)}")
+            db.session.rollback()
+            yield _sse('error', {
+                'success': False,
+                'response': "I'm here for you, and I want to help. Could you try sharing that with me again?",
+                'error': str(e)
+            })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@bp.route('/api/suggestions', methods=['GET'])
 def get_suggestions():
     """
     Retrieve suggestions based on recent conversation
@@ -130,31 +252,232 @@ def get_suggestions():
         logging.error(f"Error in get_suggestions: {str(e)}")
         return jsonify({'error': 'Unable to retrieve suggestions'}), 500
 
-@app.route('/api/history', methods=['GET'])
+def _encode_cursor(record):
+    """Opaque pagination cursor for a record's (timestamp, id) position"""
+    raw = json.dumps([record.timestamp.isoformat(), record.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    """(timestamp, id) from a cursor; raises ValueError if it is malformed"""
+    try:
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+@bp.route('/api/history', methods=['GET'])
 def get_history():
     """
-    Get recent emotion records
+    Get the current session's emotion records, newest first, with keyset
+    pagination over (timestamp, id)
+    
+    Served by range scans of the (session_key, timestamp, id) index, so page
+    latency does not grow with the total number of records.
+    
+    Query parameters:
+        limit: Page size, capped at HISTORY_MAX_LIMIT
+        cursor: `next_cursor` of the previous page, for older records
+        since: A `sync_cursor`, for only the records newer than it
+    
+    Returns `records`, plus `next_cursor` (null on the last page),
+    `sync_cursor` (pass back as `since` to fetch only newer records) and
+    `has_more`.
+    
+    `since` relies on records being timestamped as they are committed (see
+    RecordWriter); a record whose insert is still in flight in another worker
+    when the cursor is taken can carry a slightly older timestamp, so a full
+    reload is still the way to be certain nothing was missed.
     """
     try:
-        limit = request.args.get('limit', 10, type=int)
-        records = EmotionRecord.query.order_by(EmotionRecord.timestamp.desc()).limit(limit).all()
-        return jsonify([record.to_dict() for record in records])
+        limit = max(1, min(request.args.get('limit', 10, type=int), HISTORY_MAX_LIMIT))
+        cursor = request.args.get('cursor')
+        since = request.args.get('since')
+        try:
+            position = _decode_cursor(since or cursor) if (since or cursor) else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        query = EmotionRecord.query.filter(EmotionRecord.session_key == _session_key())
+        if since:
+            # Oldest new records first, so a client that falls behind catches up in order
+            timestamp, record_id = position
+            records = query.filter(or_(
+                EmotionRecord.timestamp > timestamp,
+                and_(EmotionRecord.timestamp == timestamp, EmotionRecord.id > record_id)
+            )).order_by(EmotionRecord.timestamp.asc(), EmotionRecord.id.asc()).limit(limit + 1).all()
+            has_more = len(records) > limit
+            records = records[:limit][::-1]
+            return jsonify({
+                'records': [record.to_dict() for record in records],
+                'next_cursor': None,
+                'sync_cursor': _encode_cursor(records[0]) if records else since,
+                'has_more': has_more
+            })
+        
+        if position:
+            timestamp, record_id = position
+            query = query.filter(or_(
+                EmotionRecord.timestamp < timestamp,
+                and_(EmotionRecord.timestamp == timestamp, EmotionRecord.id < record_id)
+            ))
+        records = query.order_by(EmotionRecord.timestamp.desc(), EmotionRecord.id.desc()).limit(limit + 1).all()
+        has_more = len(records) > limit
+        records = records[:limit]
+        return jsonify({
+            'records': [record.to_dict() for record in records],
+            'next_cursor': _encode_cursor(records[-1]) if has_more else None,
+            'sync_cursor': _encode_cursor(records[0]) if records and not cursor else None,
+            'has_more': has_more
+        })
     except Exception as e:
         logging.error(f"Error in get_history: {str(e)}")
         return jsonify({'error': 'Unable to retrieve history'}), 500
 
-@app.route('/api/upload', methods=['POST'])
+def _parse_utc(value):
+    """Naive UTC datetime from an ISO timestamp, the form EmotionRecord timestamps are stored in"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@bp.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """
+    Emotion mix and average intensity per hour or day
+    
+    Query parameters:
+        granularity: `hour` (default) or `day`
+        start, end: ISO timestamps (UTC); default to the last 24 hours or 30 days
+        scope: `all` (default) reads the EmotionRollup tables; `session`
+            aggregates the current session's records from an index range scan
+    
+    Returns `buckets`, oldest first; buckets without records are omitted.
+    """
+    from rollups import BUCKET_STEP, GRANULARITIES, query_rollups, session_rollups
+    
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    scope = request.args.get('scope', 'all')
+    if scope not in ('all', 'session'):
+        return jsonify({'error': 'scope must be one of all, session'}), 400
+    try:
+        end = _parse_utc(request.args['end']) if request.args.get('end') else datetime.utcnow()
+        start = _parse_utc(request.args['start']) if request.args.get('start') else \
+            end - (timedelta(hours=24) if granularity == 'hour' else timedelta(days=30))
+    except ValueError as e:
+        return jsonify({'error': f"Invalid timestamp: {str(e)}"}), 400
+    if start >= end:
+        return jsonify({'error': 'start must be before end'}), 400
+    if (end - start) / BUCKET_STEP[granularity] > ANALYTICS_MAX_BUCKETS:
+        return jsonify({'error': f"Range too large: at most {ANALYTICS_MAX_BUCKETS} {granularity} buckets"}), 400
+    
+    try:
+        if scope == 'session':
+            buckets = session_rollups(_session_key(), granularity, start, end)
+        else:
+            buckets = query_rollups(granularity, start, end)
+        return jsonify({
+            'granularity': granularity,
+            'scope': scope,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'buckets': buckets
+        })
+    except Exception as e:
+        logging.error(f"Error in get_analytics: {str(e)}")
+        return jsonify({'error': 'Unable to retrieve analytics'}), 500
+
+EXPORT_FIELDS = ['id', 'timestamp', 'user_input', 'detected_emotion', 'sentiment_score',
+                 'opposite_emotion', 'gif_url', 'therapeutic_tool']
+
+def _session_records(session_key, batch_size=500):
+    """The session's records, oldest first, fetched in keyset batches over (timestamp, id)"""
+    position = None
+    while True:
+        query = EmotionRecord.query.filter(EmotionRecord.session_key == session_key)
+        if position:
+            query = query.filter(or_(
+                EmotionRecord.timestamp > position[0],
+                and_(EmotionRecord.timestamp == position[0], EmotionRecord.id > position[1])
+            ))
+        records = query.order_by(EmotionRecord.timestamp.asc(), EmotionRecord.id.asc()).limit(batch_size).all()
+        yield from records
+        if len(records) < batch_size:
+            return
+        position = (records[-1].timestamp, records[-1].id)
+
+@bp.route('/api/export', methods=['GET'])
+def export_history():
+    """
+    Download every record of the current session, oldest first
+    
+    Query parameters:
+        format: `json` (default, one JSON object per line) or `csv`
+    
+    Streamed in batches, so memory use does not depend on the session's size.
+    """
+    export_format = request.args.get('format', 'json')
+    if export_format not in ('json', 'csv'):
+        return jsonify({'error': 'format must be one of json, csv'}), 400
+    session_key = _session_key()
+    
+    def generate():
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            for record in _session_records(session_key):
+                writer.writerow(record.to_dict())
+                if buffer.tell() > 65536:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for record in _session_records(session_key):
+                yield json.dumps(record.to_dict()) + '\n'
+    
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    extension = 'csv' if export_format == 'csv' else 'jsonl'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=moodmorph-history.{extension}'}
+    )
+
+@bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Cache and service counters for monitoring and capacity planning
+    """
+    return jsonify({
+        'giphy_cache': get_giphy_service().cache_stats(),
+        'emotion_analysis_cache': get_conversation_ai().analysis_cache_stats(),
+        'conversation_memory': get_conversation_ai().conversation_memory.stats(),
+        'prompt': get_conversation_ai().prompt_stats(),
+        'gif_warmer': get_gif_warmer().stats(),
+        'gif_catalog': get_gif_catalog().stats(),
+        'record_writer': get_record_writer().stats(),
+        'context_store': get_context_store().stats(),
+        'circuit_breakers': {
+            'gemini': get_conversation_ai().breaker_stats(),
+            'giphy': get_giphy_service().breaker_stats()
+        }
+    })
+
+@bp.route('/api/upload', methods=['POST'])
 def upload_custom_content():
     """
     Handle custom image uploads (for future use)
     """
     return jsonify({'message': 'Custom upload feature coming soon!'}), 501
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(error):
     return render_template('index.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return jsonify({'error': 'Internal server error'}), 500
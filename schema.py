@@ -0,0 +1,49 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from app import db
+
+
+def init_db():
+    """
+    Create missing tables, then add missing columns and indexes to existing ones
+
+    create_all only creates whole tables, so columns and indexes added to
+    a model later are brought in here. New columns are added as nullable
+    (SQLite and most databases cannot add a NOT NULL column without a
+    default). Needs an app context.
+
+    Returns:
+        list: Descriptions of the changes made
+    """
+    import models  # noqa: F401
+
+    db.create_all()
+
+    engine = db.engine
+    preparer = engine.dialect.identifier_preparer
+    inspector = inspect(engine)
+    changes = []
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {column_type}"
+                ))
+                changes.append(f"added column {table.name}.{column.name}")
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    changes.append(f"added index {index.name}")
+
+    for change in changes:
+        logging.info(f"Schema: {change}")
+    return changes
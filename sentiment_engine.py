@@ -0,0 +1,232 @@
+import importlib.util
+import os
+import re
+import threading
+from xml.etree import ElementTree
+
+import numpy as np
+
+# Token codes besides lexicon word ids. Like TextBlob, negation carries
+# across one-letter words ("not a good") and intensifiers across words of up
+# to two letters ("really is good"); longer unknown words end both.
+UNKNOWN = -1
+SHORT = -2
+TINY = -3
+NEGATION = -4
+EXCLAMATION = -5
+
+NEGATIONS = ('no', 'not', "n't", 'never')
+
+TOKEN_RE = re.compile(r"[a-z0-9]+|'[a-z]+|!")
+
+
+def default_lexicon_path():
+    """
+    Path of TextBlob's English sentiment lexicon, found without importing TextBlob
+
+    SENTIMENT_LEXICON_PATH overrides it.
+    """
+    path = os.environ.get("SENTIMENT_LEXICON_PATH")
+    if path:
+        return path
+    spec = importlib.util.find_spec('textblob')
+    if spec is None or not spec.submodule_search_locations:
+        raise FileNotFoundError("No sentiment lexicon: set SENTIMENT_LEXICON_PATH or install textblob")
+    return os.path.join(list(spec.submodule_search_locations)[0], 'en', 'en-sentiment.xml')
+
+
+def load_lexicon(path):
+    """
+    Read a pattern/TextBlob sentiment XML lexicon
+
+    Scores are averaged over a word's senses per part of speech, then over
+    parts of speech, as TextBlob does for untagged text. Adjectives also get
+    their "-ly" adverb ("terrible" -> "terribly"), which replaces any
+    listed score for that adverb, also as TextBlob does.
+
+    Args:
+        path (str): Path to an en-sentiment.xml style file
+
+    Returns:
+        dict: word -> (polarity, intensity, is_modifier)
+    """
+    senses = {}
+    for node in ElementTree.parse(path).getroot().iter('word'):
+        word = node.get('form')
+        if word:
+            senses.setdefault(word, {}).setdefault(node.get('pos'), []).append((
+                float(node.get('polarity', 0.0)),
+                float(node.get('intensity', 1.0))
+            ))
+
+    lexicon = {}
+    for word, by_pos in senses.items():
+        per_pos = {pos: np.mean(scores, axis=0) for pos, scores in by_pos.items()}
+        polarity, intensity = np.mean(list(per_pos.values()), axis=0)
+        lexicon[word] = (float(polarity), float(intensity), 'RB' in per_pos)
+
+    for word, by_pos in senses.items():
+        if 'JJ' not in by_pos:
+            continue
+        stem = word[:-1] + 'i' if word.endswith('y') else word
+        stem = stem[:-2] if stem.endswith('le') else stem
+        polarity, intensity = np.mean(by_pos['JJ'], axis=0)
+        lexicon[stem + 'ly'] = (float(polarity), float(intensity), True)
+    return lexicon
+
+
+class LexiconSentiment:
+    """
+    Vectorized lexicon sentiment scorer, a fast stand-in for TextBlob polarity
+
+    The lexicon is loaded once into NumPy arrays indexed by word id. Scoring
+    tokenizes each text, maps tokens to ids with one dict lookup each and
+    does the rest - intensifiers ("very sad"), negation ("not happy"),
+    exclamation marks and the per-text average - as array operations over
+    the whole batch. Results are in [-1.0, 1.0] like TextBlob polarity.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Lexicon XML file, defaults to TextBlob's English lexicon
+        """
+        lexicon = load_lexicon(path or default_lexicon_path())
+        words = sorted(lexicon)
+        self.codes = {word: index for index, word in enumerate(words)}
+        self.polarity = np.array([lexicon[word][0] for word in words], dtype=np.float64)
+        self.intensity = np.array([lexicon[word][1] for word in words], dtype=np.float64)
+        self.is_modifier = np.array([lexicon[word][2] for word in words], dtype=bool)
+
+        # Negations and "!" get their own codes even if the lexicon lists them
+        self.codes.update(dict.fromkeys(NEGATIONS, NEGATION))
+        self.codes['!'] = EXCLAMATION
+
+    def __len__(self):
+        return len(self.polarity)
+
+    def tokenize(self, text):
+        """Lowercase word tokens plus "!", with contractions split off ("don't" -> "do", "n't")"""
+        tokens = []
+        for token in TOKEN_RE.findall(text.lower().replace('’', "'")):
+            if token == "'t" and tokens and tokens[-1].endswith('n'):
+                tokens[-1] = tokens[-1][:-1]
+                token = "n't"
+            tokens.append(token)
+        return tokens
+
+    def _encode(self, tokens):
+        codes = self.codes
+        return [
+            code if code is not None else
+            TINY if len(token.strip("'")) <= 1 else
+            SHORT if len(token) <= 2 else
+            UNKNOWN
+            for token, code in zip(tokens, map(codes.get, tokens))
+        ]
+
+    def score(self, text):
+        """
+        Polarity of one text
+
+        Returns:
+            float: -1.0 (negative) to 1.0 (positive), 0.0 if no lexicon words
+        """
+        return float(self.score_many([text])[0])
+
+    def score_many(self, texts):
+        """
+        Polarity of a batch of texts
+
+        Args:
+            texts (iterable): Texts to score
+
+        Returns:
+            np.ndarray: One polarity per text
+        """
+        flat = []
+        lengths = []
+        for text in texts:
+            codes = self._encode(self.tokenize(text))
+            flat.extend(codes)
+            lengths.append(len(codes))
+
+        n_docs = len(lengths)
+        if not flat:
+            return np.zeros(n_docs)
+
+        codes = np.array(flat, dtype=np.int64)
+        doc = np.repeat(np.arange(n_docs), lengths)
+
+        n_tokens = len(codes)
+        positions = np.arange(n_tokens)
+
+        def last_before(mask):
+            """Index of the closest True before each token in the same text, else -1"""
+            last = np.maximum.accumulate(np.where(mask, positions, -1))
+            found = np.concatenate(([-1], last[:-1]))
+            found[(found >= 0) & (doc[found] != doc)] = -1
+            return found
+
+        def first_after(mask):
+            """Index of the closest True after each token in the same text, else n_tokens"""
+            first = np.minimum.accumulate(np.where(mask, positions, n_tokens)[::-1])[::-1]
+            found = np.concatenate((first[1:], [n_tokens]))
+            found[(found < n_tokens) & (doc[np.minimum(found, n_tokens - 1)] != doc)] = n_tokens
+            return found
+
+        def padded(values, fill):
+            """values with one extra slot, so index -1 and n_tokens both read fill"""
+            return np.append(values, fill)
+
+        known = codes >= 0
+        word = np.where(known, codes, 0)
+        modifier = known & self.is_modifier[word]
+        negation = codes == NEGATION
+        intensifier_gap = (codes == SHORT) | (codes == TINY)
+        negation_gap = (codes == TINY) | modifier
+
+        # An intensifier before a known word scales it ("very sad", "really is sad")
+        source = last_before(~intensifier_gap)
+        intensified = known & padded(modifier, False)[source]
+        factor = np.where(intensified, padded(self.intensity[word], 1.0)[source], 1.0)
+        polarity = np.clip(self.polarity[word] * factor, -1.0, 1.0)
+
+        # Each "!" boosts the closest known word before it ("great day!!")
+        exclamations = np.flatnonzero(codes == EXCLAMATION)
+        if len(exclamations):
+            targets = last_before(known)[exclamations]
+            boosts = np.bincount(targets[targets >= 0], minlength=n_tokens)
+            polarity = np.clip(polarity * 1.25 ** boosts, -1.0, 1.0)
+
+        # "not sad", "not a sad", "not very sad"; like TextBlob, "not good" is
+        # slightly bad and "not bad" slightly good
+        negated = known & padded(negation, False)[last_before(~negation_gap)]
+        polarity = np.where(negated, polarity * -0.5, polarity)
+
+        # Intensifiers merged into the next known word ("very sad", "really not
+        # good") are not assessed on their own
+        target = first_after(~intensifier_gap)
+        after_negation = padded(target, n_tokens)[target]
+        merged = modifier & (
+            padded(known, False)[target]
+            | (padded(negation, False)[target] & padded(known, False)[after_negation])
+        )
+        assessed = known & ~merged
+        totals = np.bincount(doc, weights=np.where(assessed, polarity, 0.0), minlength=n_docs)
+        counts = np.bincount(doc, weights=assessed, minlength=n_docs)
+        return np.divide(totals, counts, out=np.zeros(n_docs), where=counts > 0)
+
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def default_sentiment():
+    """Shared LexiconSentiment over the default lexicon, loaded on first use"""
+    global _default_engine
+    if _default_engine is None:
+        with _default_engine_lock:
+            if _default_engine is None:
+                _default_engine = LexiconSentiment()
+    return _default_engine
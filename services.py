@@ -0,0 +1,101 @@
+"""
+Process-wide services, built on first use
+
+Constructing the Gemini client, the Giphy service and the GIF catalog (and
+importing google-genai, pydantic, httpx and NumPy for them) dominates
+startup, so none of it happens when the app is imported. Each getter builds
+its service once, under a lock, the first time a request needs it.
+"""
+import os
+import threading
+
+from flask import current_app
+
+_services = {}
+_lock = threading.RLock()
+
+
+def _service(name, factory):
+    """Return the named service, building it with factory on first use"""
+    service = _services.get(name)
+    if service is None:
+        with _lock:
+            service = _services.get(name)
+            if service is None:
+                service = _services[name] = factory()
+    return service
+
+
+def _build_conversation_ai():
+    from gemini_conversation import GeminiConversationAI
+    return GeminiConversationAI()
+
+
+def _build_gif_catalog():
+    from gif_catalog import LocalGifCatalog
+    return LocalGifCatalog(current_app._get_current_object())
+
+
+def _build_giphy_service():
+    from giphy_service import GiphyService
+    from gif_warmer import GifPoolWarmer
+
+    service = GiphyService(catalog=get_gif_catalog())
+
+    # Keep GIF result pools for every known emotion term warm in the background.
+    # On by default only when a real Giphy key is configured.
+    warmer = _services['gif_warmer'] = GifPoolWarmer(service)
+    if not service.offline and os.environ.get("GIF_WARMER_ENABLED", "true" if os.environ.get("GIPHY_API_KEY") else "false").lower() in ("1", "true", "yes"):
+        warmer.start()
+    return service
+
+
+def _build_record_writer():
+    from record_writer import EmotionRecordWriter
+    return EmotionRecordWriter(current_app._get_current_object())
+
+
+def _build_context_store():
+    from context_store import create_context_store
+    return create_context_store(current_app.instance_path)
+
+
+def get_conversation_ai():
+    """Shared GeminiConversationAI"""
+    return _service('conversation_ai', _build_conversation_ai)
+
+
+def get_gif_catalog():
+    """Shared LocalGifCatalog; needs an app context on first use"""
+    return _service('gif_catalog', _build_gif_catalog)
+
+
+def get_giphy_service():
+    """Shared GiphyService; building it also starts the GIF pool warmer when enabled"""
+    return _service('giphy_service', _build_giphy_service)
+
+
+def get_gif_warmer():
+    """GifPoolWarmer of the shared GiphyService"""
+    get_giphy_service()
+    return _services['gif_warmer']
+
+
+def get_record_writer():
+    """Shared EmotionRecordWriter; needs an app context on first use"""
+    return _service('record_writer', _build_record_writer)
+
+
+def get_context_store():
+    """Shared conversation ContextStore; needs an app context on first use"""
+    return _service('context_store', _build_context_store)
+
+
+def start_services():
+    """Build every service now, e.g. at worker boot, instead of on the first request"""
+    get_conversation_ai()
+    get_giphy_service()
+    # Load the GIF catalog on its own thread rather than in the first request that harvests GIFs
+    get_gif_catalog().start()
+    get_record_writer()
+    get_context_store()
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+
+
+class _Call:
+    """One in-flight call and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one
+
+    While a call for a key is in flight, further callers with the same key
+    wait for it and get its result (or its exception) instead of making their
+    own. Nothing is cached: once the call finishes the next caller runs a new
+    one. `do` serves threads; `do_async` serves coroutines on an event loop.
+    Keeps counters of calls made and calls coalesced.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> _Call
+        self._tasks = {}  # key -> [asyncio.Task, waiters]
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs), or wait for the identical call already in flight
+
+        Args:
+            key: Identity of the call; callers with equal keys share one call
+            fn (callable): The call to make
+
+        Returns:
+            fn's result, shared by every coalesced caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, coroutine_fn, *args, **kwargs):
+        """
+        Await coroutine_fn(*args, **kwargs), or join the identical call already in flight
+
+        The call runs as its own task, so a caller that is cancelled (e.g. a
+        losing hedge request) does not cancel it for the others; it is only
+        cancelled once every caller waiting on it has been.
+
+        Args:
+            key: Identity of the call; callers with equal keys share one call
+            coroutine_fn (callable): Returns the awaitable to run
+
+        Returns:
+            The awaitable's result, shared by every coalesced caller
+        """
+        with self._lock:
+            entry = self._tasks.get(key)
+            if entry is None or entry[0].get_loop() is not asyncio.get_running_loop():
+                task = asyncio.ensure_future(coroutine_fn(*args, **kwargs))
+                entry = self._tasks[key] = [task, 0]
+                task.add_done_callback(lambda done: self._task_done(key, done))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+            entry[1] += 1
+
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            with self._lock:
+                entry[1] -= 1
+                abandoned = entry[1] == 0
+                if abandoned and self._tasks.get(key) is entry:
+                    # Forget it now, so a caller arriving before the task finishes cancelling starts a new call
+                    del self._tasks[key]
+            if abandoned:
+                entry[0].cancel()
+            raise
+
+    def _task_done(self, key, task):
+        with self._lock:
+            entry = self._tasks.get(key)
+            if entry is not None and entry[0] is task:
+                del self._tasks[key]
+        # Mark the exception retrieved; the callers that are still waiting re-raise it
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """Return calls made, calls coalesced and calls in flight"""
+        with self._lock:
+            requests = self.executions + self.coalesced
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls) + len(self._tasks),
+                'coalesced_ratio': round(self.coalesced / requests, 4) if requests else 0.0
+            }
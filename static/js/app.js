@@ -5,6 +5,8 @@ class MoodMorphApp {
         this.currentEmotion = null;
         this.currentOppositeEmotion = null;
         this.isAnalyzing = false;
+        this.historyRecords = [];
+        this.historySyncCursor = null;
         
         this.initializeElements();
         this.bindEvents();
@@ -114,7 +116,7 @@ class MoodMorphApp {
             
             const data = await response.json();
             this.displayResults(data);
-            this.loadRecentHistory(); // Refresh history
+            this.syncHistory(); // Fetch the new record
             
         } catch (error) {
             console.error('Error analyzing emotion:', error);
@@ -279,14 +281,41 @@ class MoodMorphApp {
         try {
             const response = await fetch('/api/history?limit=5');
             if (response.ok) {
-                const history = await response.json();
-                this.displayHistory(history);
+                const page = await response.json();
+                this.historyRecords = page.records;
+                this.historySyncCursor = page.sync_cursor;
+                this.displayHistory(this.historyRecords);
             }
         } catch (error) {
             console.error('Error loading history:', error);
         }
     }
     
+    async syncHistory() {
+        // Only download records newer than the ones already shown
+        if (!this.historySyncCursor) {
+            return this.loadRecentHistory();
+        }
+        try {
+            const response = await fetch(`/api/history?limit=5&since=${encodeURIComponent(this.historySyncCursor)}`);
+            if (!response.ok) {
+                return this.loadRecentHistory();
+            }
+            const page = await response.json();
+            if (page.has_more) {
+                // Too far behind to patch in; start over from the newest page
+                return this.loadRecentHistory();
+            }
+            this.historySyncCursor = page.sync_cursor;
+            if (page.records.length > 0) {
+                this.historyRecords = page.records.concat(this.historyRecords || []).slice(0, 5);
+                this.displayHistory(this.historyRecords);
+            }
+        } catch (error) {
+            console.error('Error syncing history:', error);
+        }
+    }
+    
     displayHistory(history) {
         if (!history || history.length === 0) {
             this.recentHistory.innerHTML = '<p class="text-muted">Your recent mood transformations will appear here.</p>';
@@ -389,7 +418,7 @@ document.addEventListener('DOMContentLoaded', () => {
 // Handle page visibility for better user experience
 document.addEventListener('visibilitychange', () => {
     if (!document.hidden && window.moodMorphApp) {
-        // Refresh history when user returns to the page
-        window.moodMorphApp.loadRecentHistory();
+        // Fetch records added while the page was hidden
+        window.moodMorphApp.syncHistory();
     }
 });
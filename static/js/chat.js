@@ -5,6 +5,9 @@ class MoodMorphChat {
         this.isTyping = false;
         this.messageHistory = [];
         
+        // Render replies token by token via /api/chat/stream
+        this.useStreaming = true;
+        
         this.initializeElements();
         this.bindEvents();
         this.loadChatHistory();
@@ -66,29 +69,11 @@ class MoodMorphChat {
         this.showTyping();
         
         try {
-            // Send to backend
-            const response = await fetch('/api/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ message: message })
-            });
-            
-            if (!response.ok) {
-                throw new Error('Failed to get response');
+            if (this.useStreaming && window.ReadableStream && window.TextDecoder) {
+                await this.streamMessage(message);
+            } else {
+                await this.fetchMessage(message);
             }
-            
-            const data = await response.json();
-            
-            // Hide typing indicator
-            this.hideTyping();
-            
-            // Add bot response with delay for natural feel
-            setTimeout(() => {
-                this.addBotResponse(data);
-            }, 500);
-            
         } catch (error) {
             this.hideTyping();
             this.addMessage("Sorry, I'm having trouble connecting right now. Please try again!", 'bot', true);
@@ -96,6 +81,140 @@ class MoodMorphChat {
         }
     }
     
+    async fetchMessage(message) {
+        // Send to backend
+        const response = await fetch('/api/chat', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message: message })
+        });
+        
+        if (!response.ok) {
+            throw new Error('Failed to get response');
+        }
+        
+        const data = await response.json();
+        
+        // Hide typing indicator
+        this.hideTyping();
+        
+        // Add bot response with delay for natural feel
+        setTimeout(() => {
+            this.addBotResponse(data);
+        }, 500);
+    }
+    
+    async streamMessage(message) {
+        // Read Server-Sent Events from the POST response body
+        const response = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify({ message: message })
+        });
+        
+        if (!response.ok || !response.body) {
+            throw new Error('Failed to get response');
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let replyEl = null;
+        let replyText = '';
+        
+        const finishReply = () => {
+            if (replyEl) {
+                this.messageHistory.push({
+                    content: replyText,
+                    sender: 'bot',
+                    timestamp: new Date().toISOString()
+                });
+                this.saveChatHistory();
+                replyEl = null;
+            }
+        };
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            
+            events.forEach(raw => {
+                const parsed = this.parseEvent(raw);
+                if (!parsed) return;
+                
+                if (parsed.event === 'token') {
+                    if (!replyEl) {
+                        this.hideTyping();
+                        replyEl = this.addStreamingMessage();
+                    }
+                    replyText += parsed.data.text;
+                    replyEl.textContent = replyText;
+                    this.scrollToBottom();
+                } else if (parsed.event === 'gif') {
+                    finishReply();
+                    if (parsed.data.gif_url) {
+                        this.addGifMessage(parsed.data.gif_url, parsed.data.opposite_emotion);
+                    }
+                } else if (parsed.event === 'error' && !replyEl) {
+                    this.hideTyping();
+                    this.addMessage(parsed.data.response, 'bot', true);
+                }
+            });
+        }
+        
+        finishReply();
+        this.hideTyping();
+    }
+    
+    parseEvent(raw) {
+        let event = 'message';
+        const dataLines = [];
+        raw.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        if (dataLines.length === 0) return null;
+        
+        try {
+            return { event, data: JSON.parse(dataLines.join('\n')) };
+        } catch (error) {
+            console.error('Error parsing stream event:', error);
+            return null;
+        }
+    }
+    
+    addStreamingMessage() {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'message bot-message';
+        
+        const now = new Date();
+        const timeString = now.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+        
+        messageDiv.innerHTML = `
+            <div class="message-content">
+                <p></p>
+            </div>
+            <div class="message-time">${timeString}</div>
+        `;
+        
+        this.chatMessages.appendChild(messageDiv);
+        this.scrollToBottom();
+        
+        return messageDiv.querySelector('p');
+    }
+    
     addMessage(content, sender, isError = false) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
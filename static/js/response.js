@@ -9,9 +9,18 @@ class ChatInterface {
         this.messageHistory = this.loadChatHistory();
         this.isProcessing = false;
         
+        // /api/history sync cursor, so turns sent from other tabs are fetched without reloading everything
+        this.historySyncCursor = localStorage.getItem('moodmorph_sync_cursor');
+        this.pendingInputs = [];
+        this.isSyncing = false;
+        
+        // Render replies token by token via /api/chat/stream
+        this.useStreaming = true;
+        
         this.initializeEventListeners();
         this.displayChatHistory();
         this.autoResizeTextarea();
+        this.syncHistory();
     }
     
     initializeEventListeners() {
@@ -65,7 +74,8 @@ class ChatInterface {
         this.isProcessing = true;
         this.updateSendButton(true);
         
-        // Add user message to chat
+        // Add user message to chat; its record is skipped when the sync fetches it
+        this.pendingInputs.push(message);
         this.addMessage(message, 'user');
         this.messageInput.value = '';
         this.updateCharCount();
@@ -75,34 +85,10 @@ class ChatInterface {
         this.showTypingIndicator();
         
         try {
-            // Send message to backend
-            const response = await fetch('/api/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ message: message })
-            });
-            
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            
-            const data = await response.json();
-            
-            // Hide typing indicator
-            this.hideTypingIndicator();
-            
-            if (data.success) {
-                // Add bot response
-                this.addMessage(data.response, 'bot');
-                
-                // Add GIF if available
-                if (data.gif_url) {
-                    this.addGifMessage(data.gif_url);
-                }
+            if (this.useStreaming && window.ReadableStream && window.TextDecoder) {
+                await this.sendStreamingMessage(message);
             } else {
-                this.addMessage("I'm having trouble right now, but I'm still here for you. Can you try telling me again?", 'bot');
+                await this.sendJsonMessage(message);
             }
             
         } catch (error) {
@@ -114,6 +100,161 @@ class ChatInterface {
             this.updateSendButton(false);
             this.messageInput.focus();
         }
+        
+        this.syncHistory();
+    }
+    
+    async sendJsonMessage(message) {
+        // Send message to backend
+        const response = await fetch('/api/chat', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message: message })
+        });
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const data = await response.json();
+        
+        // Hide typing indicator
+        this.hideTypingIndicator();
+        
+        if (data.success) {
+            // Add bot response
+            this.addMessage(data.response, 'bot');
+            
+            // Add GIF if available
+            if (data.gif_url) {
+                this.addGifMessage(data.gif_url);
+            }
+        } else {
+            this.addMessage("I'm having trouble right now, but I'm still here for you. Can you try telling me again?", 'bot');
+        }
+    }
+    
+    async sendStreamingMessage(message) {
+        // Server-Sent Events over a POST body, so read the stream by hand
+        const response = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify({ message: message })
+        });
+        
+        if (!response.ok || !response.body) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let botMessage = null;
+        let replyText = '';
+        
+        const handleEvent = (event, data) => {
+            if (event === 'token') {
+                if (!botMessage) {
+                    this.hideTypingIndicator();
+                    botMessage = this.startStreamingMessage();
+                }
+                replyText += data.text;
+                botMessage.textContent = replyText;
+                this.scrollToBottom();
+            } else if (event === 'gif') {
+                // Save the finished reply before the GIF so history keeps the order
+                if (botMessage) {
+                    this.finishStreamingMessage(replyText);
+                    botMessage = null;
+                }
+                if (data.gif_url) {
+                    this.addGifMessage(data.gif_url);
+                }
+            } else if (event === 'error') {
+                this.hideTypingIndicator();
+                if (!botMessage) {
+                    this.addMessage("I'm having trouble right now, but I'm still here for you. Can you try telling me again?", 'bot');
+                }
+            }
+        };
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const messages = buffer.split('\n\n');
+            buffer = messages.pop();
+            
+            messages.forEach(raw => {
+                const parsed = this.parseSseMessage(raw);
+                if (parsed) {
+                    handleEvent(parsed.event, parsed.data);
+                }
+            });
+        }
+        
+        if (botMessage) {
+            this.finishStreamingMessage(replyText);
+        }
+        this.hideTypingIndicator();
+    }
+    
+    parseSseMessage(raw) {
+        let event = 'message';
+        const dataLines = [];
+        raw.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        if (dataLines.length === 0) return null;
+        
+        try {
+            return { event, data: JSON.parse(dataLines.join('\n')) };
+        } catch (error) {
+            console.error('Error parsing stream event:', error);
+            return null;
+        }
+    }
+    
+    startStreamingMessage() {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'message bot-message';
+        
+        const contentDiv = document.createElement('div');
+        contentDiv.className = 'message-content';
+        const textEl = document.createElement('p');
+        contentDiv.appendChild(textEl);
+        
+        const timeDiv = document.createElement('div');
+        timeDiv.className = 'message-time';
+        timeDiv.textContent = this.formatTime(new Date());
+        
+        messageDiv.appendChild(contentDiv);
+        messageDiv.appendChild(timeDiv);
+        
+        this.chatMessages.appendChild(messageDiv);
+        this.scrollToBottom();
+        
+        return textEl;
+    }
+    
+    finishStreamingMessage(text) {
+        // Save the completed reply to history
+        this.messageHistory.push({
+            text: text,
+            sender: 'bot',
+            timestamp: new Date().toISOString()
+        });
+        this.saveChatHistory();
     }
     
     addMessage(text, sender) {
@@ -264,6 +405,96 @@ class ChatInterface {
         this.scrollToBottom();
     }
     
+    async syncHistory() {
+        if (this.isSyncing) return;
+        this.isSyncing = true;
+        try {
+            if (!this.historySyncCursor) {
+                // First visit: start from the newest record; older ones are in the local history already
+                const page = await this.fetchHistory('/api/history?limit=1');
+                if (page) {
+                    this.setSyncCursor(page.sync_cursor);
+                }
+                return;
+            }
+            
+            // Pages of newer records, oldest page first, until has_more says we have caught up
+            let hasMore = true;
+            while (hasMore) {
+                const page = await this.fetchHistory(
+                    `/api/history?limit=20&since=${encodeURIComponent(this.historySyncCursor)}`);
+                if (!page) return;
+                
+                // Records come newest first within the page
+                page.records.slice().reverse().forEach(record => this.addRecordFromHistory(record));
+                if (page.records.length > 0) {
+                    this.saveChatHistory();
+                    this.scrollToBottom();
+                }
+                this.setSyncCursor(page.sync_cursor);
+                hasMore = page.has_more;
+            }
+        } finally {
+            this.isSyncing = false;
+        }
+    }
+    
+    async fetchHistory(url) {
+        // Returns the {records, next_cursor, sync_cursor, has_more} page, or null
+        try {
+            const response = await fetch(url);
+            if (response.status === 400) {
+                // The stored cursor is not one this server understands; take a fresh one next time
+                this.setSyncCursor(null);
+                return null;
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return await response.json();
+        } catch (error) {
+            console.error('Error syncing chat history:', error);
+            return null;
+        }
+    }
+    
+    setSyncCursor(cursor) {
+        this.historySyncCursor = cursor;
+        if (cursor) {
+            localStorage.setItem('moodmorph_sync_cursor', cursor);
+        } else {
+            localStorage.removeItem('moodmorph_sync_cursor');
+        }
+    }
+    
+    addRecordFromHistory(record) {
+        // A turn sent from this tab is already on screen
+        const pending = this.pendingInputs.indexOf(record.user_input);
+        if (pending !== -1) {
+            this.pendingInputs.splice(pending, 1);
+            return;
+        }
+        
+        // Record timestamps are UTC without an offset
+        const timestamp = /(Z|[+-]\d\d:\d\d)$/.test(record.timestamp) ? record.timestamp : `${record.timestamp}Z`;
+        this.addMessageFromHistory(record.user_input, 'user', timestamp);
+        this.messageHistory.push({
+            text: record.user_input,
+            sender: 'user',
+            timestamp: timestamp
+        });
+        if (record.gif_url) {
+            this.addGifMessageFromHistory(record.gif_url, timestamp);
+            this.messageHistory.push({
+                text: `[GIF: ${record.gif_url}]`,
+                sender: 'bot',
+                timestamp: timestamp,
+                isGif: true,
+                gifUrl: record.gif_url
+            });
+        }
+    }
+    
     addMessageFromHistory(text, sender, timestamp) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
@@ -328,6 +559,13 @@ document.addEventListener('DOMContentLoaded', () => {
     window.chatInterface = new ChatInterface();
 });
 
+// Fetch turns sent from other tabs while this one was hidden
+document.addEventListener('visibilitychange', () => {
+    if (!document.hidden && window.chatInterface) {
+        window.chatInterface.syncHistory();
+    }
+});
+
 // Keyboard shortcuts
 document.addEventListener('keydown', (e) => {
     // Ctrl/Cmd + K to clear chat
@@ -0,0 +1,45 @@
+"""
+Shared fixtures
+
+The app is built when `app` is imported, from environment variables, so the
+environment is pointed at a scratch directory before anything imports it:
+a fresh SQLite database, offline GIFs, no background GIF warmer.
+"""
+import importlib
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_workdir = tempfile.mkdtemp(prefix='moodmorph-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ['GIF_WARMER_ENABLED'] = 'false'
+os.environ['GIPHY_MODE'] = 'offline'
+os.environ.setdefault('GEMINI_API_KEY', 'test')
+os.environ['RECORD_WRITER_SPOOL_PATH'] = os.path.join(_workdir, 'emotion-records.spool.jsonl')
+os.environ['CONTEXT_STORE_PATH'] = os.path.join(_workdir, 'conversation-context.db')
+
+# Build the app first: models imports it, and it imports models while it is built
+importlib.import_module('app')
+
+
+@pytest.fixture
+def app():
+    """The Flask app inside an app context, with empty tables"""
+    from app import app as flask_app, db
+    from schema import init_db
+
+    with flask_app.app_context():
+        init_db()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def db_session(app):
+    from app import db
+    return db.session
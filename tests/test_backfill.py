@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from backfill import EmotionBackfill
+from gemini_conversation import OPPOSITE_EMOTIONS
+from models import EmotionRecord
+
+
+def test_backfilled_rows_keep_live_value_ranges_and_vocabulary(db_session, tmp_path):
+    # As stored by a live turn: Gemini's 0..1 intensity, the Gemini opposite vocabulary
+    record = EmotionRecord('I feel so sad and depressed today', 'neutral', 0.8, 'positive')
+    record.timestamp = datetime(2026, 1, 1, 12, 0)
+    db_session.add(record)
+    db_session.commit()
+
+    state = EmotionBackfill(db_session, str(tmp_path / 'checkpoint.json'), workers=1).run(resume=False)
+
+    db_session.expire_all()
+    row = db_session.get(EmotionRecord, record.id)
+    assert state['changed'] == 1
+    assert row.detected_emotion == 'sad'
+    assert row.opposite_emotion == OPPOSITE_EMOTIONS['sad'] == 'joyful'
+    # Intensity is not overwritten with a -1..1 polarity
+    assert row.sentiment_score == 0.8
+
+
+def test_backfill_skips_rows_that_already_match(db_session, tmp_path):
+    record = EmotionRecord('I feel so sad and depressed today', 'sad', 0.6, 'joyful')
+    record.timestamp = datetime(2026, 1, 1, 12, 0)
+    db_session.add(record)
+    db_session.commit()
+
+    state = EmotionBackfill(db_session, str(tmp_path / 'checkpoint.json'), workers=1).run(resume=False)
+
+    assert state['processed'] == 1
+    assert state['changed'] == 0
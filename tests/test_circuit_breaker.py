@@ -0,0 +1,91 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', clock)
+    return clock
+
+
+def fail():
+    raise RuntimeError('upstream down')
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+
+
+def test_breaker_opens_when_too_many_calls_fail(clock):
+    breaker = CircuitBreaker('test', failure_rate=0.5, window=4, min_calls=4, open_seconds=30)
+    breaker.call(lambda: 'ok')
+    breaker.call(lambda: 'ok')
+    breaker.call(lambda: 'ok')
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.state == CLOSED
+
+    # The window now holds two failures out of four calls
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+    assert not breaker.available()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 'ok')
+    assert breaker.short_circuited == 2
+
+
+def test_successful_half_open_probe_closes_the_breaker(clock):
+    breaker = CircuitBreaker('test', window=4, min_calls=4, open_seconds=30)
+    trip(breaker)
+
+    clock.now += 30
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only the probe is admitted while it is in flight
+    assert not breaker.closed()
+    assert not breaker.allow()
+
+    breaker.record(0.1, False)
+    assert breaker.state == CLOSED
+    assert breaker.closed()
+    assert breaker.call(lambda: 'ok') == 'ok'
+
+
+def test_failed_half_open_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker('test', window=4, min_calls=4, open_seconds=30)
+    trip(breaker)
+
+    clock.now += 30
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+
+    clock.now += 29
+    assert not breaker.available()
+    clock.now += 1
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_open_the_breaker(clock):
+    breaker = CircuitBreaker('test', slow_seconds=2.0, slow_rate=0.5, window=4, min_calls=4)
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record(2.5, False)
+    assert breaker.state == OPEN
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from context_store import MemoryContextStore, SqliteContextStore
+from prompt_builder import SUMMARY_SENDER
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(max_messages, summary_tokens=200):
+        if request.param == 'memory':
+            return MemoryContextStore(max_messages, summary_tokens=summary_tokens)
+        return SqliteContextStore(str(tmp_path / 'context.db'), max_messages, summary_tokens=summary_tokens)
+    return make
+
+
+def turn(index):
+    return [{'sender': 'user', 'text': f"question {index}", 'emotion': 'sad'},
+            {'sender': 'bot', 'text': f"answer {index}"}]
+
+
+def test_each_conversation_keeps_its_last_messages(make_store):
+    store = make_store(max_messages=4, summary_tokens=0)
+    for index in range(3):
+        store.append('a', turn(index))
+    store.append('b', turn(9))
+
+    assert store.get('a') == [
+        {'sender': 'user', 'text': 'question 1'}, {'sender': 'bot', 'text': 'answer 1'},
+        {'sender': 'user', 'text': 'question 2'}, {'sender': 'bot', 'text': 'answer 2'}
+    ]
+    assert [message['text'] for message in store.get('b')] == ['question 9', 'answer 9']
+    assert store.get('unknown') == []
+
+
+def test_trimmed_messages_are_folded_into_the_summary(make_store):
+    store = make_store(max_messages=2)
+    for index in range(3):
+        store.append('a', turn(index))
+
+    messages = store.get('a')
+    assert messages[0] == {'sender': SUMMARY_SENDER,
+                           'text': '- User: question 0\n- You: answer 0\n- User: question 1\n- You: answer 1'}
+    assert messages[1:] == [{'sender': 'user', 'text': 'question 2'}, {'sender': 'bot', 'text': 'answer 2'}]
+
+
+def test_summary_drops_its_oldest_lines_over_budget(make_store):
+    store = make_store(max_messages=2, summary_tokens=12)
+    for index in range(6):
+        store.append('a', turn(index))
+
+    summary = store.get('a')[0]['text'].splitlines()
+    assert 0 < len(summary) < 10
+    assert summary[-1] == '- You: answer 4'
+
+
+def test_seed_only_fills_an_empty_conversation(make_store):
+    store = make_store(max_messages=4)
+    store.seed('a', turn(0))
+    store.seed('a', turn(1))
+    assert [message['text'] for message in store.get('a')] == ['question 0', 'answer 0']
+
+
+def test_concurrent_appends_are_all_kept(make_store):
+    store = make_store(max_messages=100)
+    threads = [threading.Thread(target=store.append, args=('a', turn(index))) for index in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store.get('a')) == 40
+    assert store.stats()['appends'] == 20
@@ -0,0 +1,38 @@
+from conversation_memory import ConversationMemory
+
+
+def test_each_conversation_keeps_its_last_turns():
+    memory = ConversationMemory(max_turns=3, max_conversations=10)
+    for index in range(5):
+        memory.append('a', {'turn': index})
+    memory.append('b', {'turn': 'b0'})
+
+    assert memory.get('a') == [{'turn': 2}, {'turn': 3}, {'turn': 4}]
+    assert memory.get('b') == [{'turn': 'b0'}]
+    assert memory.get('unknown') == []
+    assert memory.stats()['turns'] == 4
+
+
+def test_least_recently_active_conversation_is_evicted():
+    memory = ConversationMemory(max_turns=2, max_conversations=2)
+    memory.append('a', {'turn': 1})
+    memory.append('b', {'turn': 1})
+    # 'a' becomes the most recently active, so 'b' goes first
+    memory.append('a', {'turn': 2})
+    memory.append('c', {'turn': 1})
+
+    assert memory.get('b') == []
+    assert memory.get('a') == [{'turn': 1}, {'turn': 2}]
+    stats = memory.stats()
+    assert (stats['conversations'], stats['turns'], stats['evictions']) == (2, 3, 1)
+
+
+def test_forget_drops_a_conversation():
+    memory = ConversationMemory(max_turns=2)
+    memory.append('a', {'turn': 1})
+    memory.forget('a')
+    memory.forget('never seen')
+
+    assert memory.get('a') == []
+    assert len(memory) == 0
+    assert memory.stats()['turns'] == 0
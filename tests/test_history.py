@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import EmotionRecord
+
+SESSION_KEY = 's' * 22
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['session_key'] = SESSION_KEY
+    return client
+
+
+def add_records(db_session, count, start=datetime(2026, 1, 1, 12, 0), session_key=SESSION_KEY):
+    records = []
+    for index in range(count):
+        record = EmotionRecord(f"message {index}", 'sad', 0.5, 'joyful', session_key=session_key)
+        # Pairs share a timestamp, so the id has to break ties
+        record.timestamp = start + timedelta(seconds=index // 2)
+        records.append(record)
+    db_session.add_all(records)
+    db_session.commit()
+    return records
+
+
+def messages(page):
+    return [record['user_input'] for record in page['records']]
+
+
+def test_cursor_pages_walk_every_record_newest_first(client, db_session):
+    add_records(db_session, 7)
+    add_records(db_session, 3, session_key='another session')
+
+    first = client.get('/api/history?limit=3').get_json()
+    assert messages(first) == ['message 6', 'message 5', 'message 4']
+    assert first['has_more'] and first['next_cursor'] and first['sync_cursor']
+
+    seen = messages(first)
+    page = first
+    while page['has_more']:
+        page = client.get(f"/api/history?limit=3&cursor={page['next_cursor']}").get_json()
+        # Only the first page hands out a sync cursor
+        assert page['sync_cursor'] is None
+        seen += messages(page)
+
+    assert seen == [f"message {index}" for index in reversed(range(7))]
+    assert page['next_cursor'] is None
+
+
+def test_since_returns_only_newer_records_oldest_page_first(client, db_session):
+    add_records(db_session, 2)
+    sync_cursor = client.get('/api/history').get_json()['sync_cursor']
+
+    add_records(db_session, 5, start=datetime(2026, 1, 1, 13, 0))
+    page = client.get(f"/api/history?limit=3&since={sync_cursor}").get_json()
+    assert messages(page) == ['message 2', 'message 1', 'message 0']
+    assert page['has_more'] and page['next_cursor'] is None
+
+    page = client.get(f"/api/history?limit=3&since={page['sync_cursor']}").get_json()
+    assert messages(page) == ['message 4', 'message 3']
+    assert not page['has_more']
+
+    # Caught up: nothing new, and the cursor stays put
+    caught_up = client.get(f"/api/history?limit=3&since={page['sync_cursor']}").get_json()
+    assert caught_up['records'] == []
+    assert caught_up['sync_cursor'] == page['sync_cursor']
+
+
+@pytest.mark.parametrize('parameter', ['cursor', 'since'])
+def test_malformed_cursor_is_rejected(client, parameter):
+    response = client.get(f"/api/history?{parameter}=not-a-cursor")
+    assert response.status_code == 400
+    assert 'Invalid cursor' in response.get_json()['error']
@@ -0,0 +1,51 @@
+import random
+
+from emotion_analyzer import EmotionAnalyzer
+from keyword_matcher import KeywordMatcher
+
+
+def substring_scan(emotion_keywords, text):
+    """The per-keyword scan KeywordMatcher replaced in EmotionAnalyzer._detect_emotion_keywords"""
+    emotion_scores = {}
+    for emotion, keywords in emotion_keywords.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in text:
+                score += 2 if f" {keyword} " in f" {text} " else 1
+        emotion_scores[emotion] = score
+    if emotion_scores and max(emotion_scores.values()) > 0:
+        return max(emotion_scores, key=emotion_scores.get)
+    return 'neutral'
+
+
+def test_find_all_reports_overlapping_matches():
+    matcher = KeywordMatcher(['let down', 'down', 'own', 'let down'])
+    assert matcher.keywords == ['let down', 'down', 'own']
+
+    found = sorted((matcher.keywords[index], start, end) for index, start, end in matcher.find_all('so let down'))
+    assert found == [('down', 7, 11), ('let down', 3, 11), ('own', 8, 11)]
+
+
+def test_match_scores_whole_words_score_two():
+    matcher = KeywordMatcher(['sad', 'tired'])
+    assert matcher.match_scores('sad and tiredness') == {0: 2, 1: 1}
+    assert matcher.match_scores('saddest') == {0: 1}
+    assert matcher.match_scores('nothing here') == {}
+
+
+def test_analyzer_matches_the_substring_scan():
+    analyzer = EmotionAnalyzer()
+    keywords = [keyword for words in analyzer.emotion_keywords.values() for keyword in words]
+    filler = 'i today just feel so really work my boss friend the a and but it is was this week again'.split()
+    rng = random.Random(3)
+
+    texts = ['', 'hello there', 'i am sad', 'so lonely and sad', 'feeling let down today']
+    for _ in range(500):
+        words = rng.choices(filler, k=rng.randint(1, 15))
+        for _ in range(rng.randint(0, 3)):
+            # Sometimes glued into a longer word, for partial matches
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords) + rng.choice(['', '', 'ness', 'ly']))
+        texts.append(' '.join(words))
+
+    for text in texts:
+        assert analyzer._detect_emotion_keywords(text) == substring_scan(analyzer.emotion_keywords, text), text
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from models import EmotionRecord, EmotionRollup
+from record_writer import EmotionRecordWriter
+
+
+@pytest.fixture
+def writer(app, tmp_path):
+    # Flushed by hand: the background thread only wakes on a full batch
+    writer = EmotionRecordWriter(app, batch_size=100, flush_interval=3600,
+                                 spool_path=str(tmp_path / 'records.spool.jsonl'))
+    yield writer
+    writer.close()
+
+
+def row(index):
+    return {
+        'session_key': 'k' * 22,
+        'user_input': f"message {index}",
+        'detected_emotion': 'sad',
+        'sentiment_score': 0.5,
+        'opposite_emotion': 'joyful'
+    }
+
+
+def test_failed_flush_is_spooled_and_replayed(writer, db_session, monkeypatch):
+    for index in range(3):
+        writer.enqueue(row(index))
+
+    def database_down(*args, **kwargs):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(db_session, 'execute', database_down)
+    assert writer.flush() == 0
+    monkeypatch.undo()
+
+    with open(writer.spool_path) as spool:
+        spooled = [json.loads(line) for line in spool]
+    assert [entry['user_input'] for entry in spooled] == ['message 0', 'message 1', 'message 2']
+    # Spooled rows are stamped when they are finally inserted, not when queued
+    assert all('timestamp' not in entry for entry in spooled)
+    assert EmotionRecord.query.count() == 0
+
+    writer.enqueue(row(3))
+    assert writer.flush() == 1
+
+    db_session.expire_all()
+    records = EmotionRecord.query.order_by(EmotionRecord.id).all()
+    assert [record.user_input for record in records] == ['message 3', 'message 0', 'message 1', 'message 2']
+    assert all(record.timestamp is not None for record in records)
+    assert not os.path.exists(writer.spool_path)
+    assert not os.path.exists(f"{writer.spool_path}.replaying")
+
+    stats = writer.stats()
+    assert (stats['enqueued'], stats['written'], stats['spooled'], stats['replayed']) == (4, 4, 3, 3)
+    # Rollups were written in the same transactions as the records
+    day_rows = EmotionRollup.query.filter_by(granularity='day').all()
+    assert sum(rollup.count for rollup in day_rows) == 4
+
+
+def test_partly_failed_replay_keeps_only_the_unwritten_rows(writer, db_session, monkeypatch):
+    writer.batch_size = 2
+    writer._spool([row(index) for index in range(5)])
+
+    inserts = []
+    real_insert = writer._insert
+
+    def second_batch_fails(rows):
+        inserts.append(len(rows))
+        return False if len(inserts) == 2 else real_insert(rows)
+
+    monkeypatch.setattr(writer, '_insert', second_batch_fails)
+    writer.flush()
+
+    with open(f"{writer.spool_path}.replaying") as spool:
+        assert [json.loads(line)['user_input'] for line in spool] == ['message 2', 'message 3', 'message 4']
+    assert EmotionRecord.query.count() == 2
+
+    monkeypatch.undo()
+    writer.flush()
+    assert EmotionRecord.query.count() == 5
+    assert not os.path.exists(f"{writer.spool_path}.replaying")
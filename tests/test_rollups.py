@@ -0,0 +1,75 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import EmotionRecord, EmotionRollup
+from rollups import apply_rollups, query_rollups, rebuild_rollups
+
+EMOTION_PAIRS = [('sad', 'joyful'), ('anxious', 'calm'), ('angry', 'peaceful')]
+
+
+def rollup_table(db_session):
+    table = EmotionRollup.__table__
+    return sorted(
+        (row.granularity, row.bucket, row.detected_emotion, row.opposite_emotion, row.count,
+         round(row.intensity_sum, 6))
+        for row in db_session.execute(table.select())
+    )
+
+
+def generated_records(count, seed=5):
+    rng = random.Random(seed)
+    start = datetime(2026, 3, 1, 22, 0)
+    records = []
+    for _ in range(count):
+        detected_emotion, opposite_emotion = rng.choice(EMOTION_PAIRS)
+        records.append({
+            'user_input': 'a message',
+            'detected_emotion': detected_emotion,
+            'opposite_emotion': opposite_emotion,
+            'sentiment_score': round(rng.random(), 3),
+            # Spans several hours across a day boundary
+            'timestamp': start + timedelta(minutes=rng.randrange(6 * 60))
+        })
+    return records
+
+
+def test_incremental_rollups_match_a_rebuild(db_session):
+    records = generated_records(200)
+    # As the record writer does: insert each batch and its rollups in one transaction
+    for offset in range(0, len(records), 30):
+        batch = records[offset:offset + 30]
+        db_session.execute(EmotionRecord.__table__.insert(), batch)
+        apply_rollups(db_session, batch)
+        db_session.commit()
+    incremental = rollup_table(db_session)
+
+    summary = rebuild_rollups()
+
+    assert summary['records'] == 200
+    assert rollup_table(db_session) == incremental
+    assert sum(row[4] for row in incremental if row[0] == 'day') == 200
+
+
+def test_query_rollups_summarizes_buckets(db_session):
+    records = [
+        {'user_input': 'x', 'detected_emotion': 'sad', 'opposite_emotion': 'joyful', 'sentiment_score': 0.2,
+         'timestamp': datetime(2026, 3, 1, 9, 15)},
+        {'user_input': 'x', 'detected_emotion': 'sad', 'opposite_emotion': 'joyful', 'sentiment_score': 0.6,
+         'timestamp': datetime(2026, 3, 1, 9, 45)},
+        {'user_input': 'x', 'detected_emotion': 'angry', 'opposite_emotion': 'peaceful', 'sentiment_score': 1.0,
+         'timestamp': datetime(2026, 3, 1, 10, 5)},
+    ]
+    db_session.execute(EmotionRecord.__table__.insert(), records)
+    apply_rollups(db_session, records)
+    db_session.commit()
+
+    hours = query_rollups('hour', datetime(2026, 3, 1), datetime(2026, 3, 2))
+    assert [(bucket['bucket'], bucket['total']) for bucket in hours] == [
+        ('2026-03-01T09:00:00', 2), ('2026-03-01T10:00:00', 1)]
+    assert hours[0]['avg_intensity'] == pytest.approx(0.4)
+
+    days = query_rollups('day', datetime(2026, 3, 1), datetime(2026, 3, 2))
+    assert days[0]['total'] == 3
+    assert [pair['detected_emotion'] for pair in days[0]['mix']] == ['sad', 'angry']
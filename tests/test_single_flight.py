@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_lookup(term):
+        calls.append(term)
+        started.set()
+        release.wait(5)
+        return f"result for {term}"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('cats', slow_lookup, 'cats')))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('cats', slow_lookup, 'cats')))
+                 for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    # Let the followers reach the wait before the leader finishes
+    deadline = time.monotonic() + 5
+    while flight.stats()['coalesced'] < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert calls == ['cats']
+    assert results == ['result for cats'] * 4
+    assert flight.stats()['executions'] == 1
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_coalesced_callers_get_the_exception():
+    flight = SingleFlight()
+
+    async def main():
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError('upstream down')
+
+        return await asyncio.gather(flight.do_async('k', failing), flight.do_async('k', failing),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert [str(error) for error in errors] == ['upstream down', 'upstream down']
+    assert flight.stats()['executions'] == 1
+
+
+def test_cancelling_one_caller_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+
+    async def main():
+        release = asyncio.Event()
+
+        async def lookup():
+            await release.wait()
+            return 'gif'
+
+        first = asyncio.ensure_future(flight.do_async('k', lookup))
+        second = asyncio.ensure_future(flight.do_async('k', lookup))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == 'gif'
+
+
+def test_call_abandoned_by_every_caller_is_cancelled_and_forgotten():
+    flight = SingleFlight()
+
+    async def main():
+        cancelled = asyncio.Event()
+
+        async def lookup():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        caller = asyncio.ensure_future(flight.do_async('k', lookup))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        # A caller arriving right after starts its own call instead of joining the cancelled one
+        assert flight.stats()['in_flight'] == 0
+
+        async def fresh():
+            return 'new'
+
+        result = await flight.do_async('k', fresh)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return result
+
+    assert asyncio.run(main()) == 'new'
+    assert flight.stats()['executions'] == 2